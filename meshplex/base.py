@@ -1,29 +1,86 @@
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
 import meshio
 import numpy as np
 
+from .helpers import (
+    csr_from_rows,
+    get_index_dtype,
+    is_memory_mapped,
+    load_npz,
+    morton_codes,
+    unique_rows,
+)
+
 __all__ = ["_SimplexMesh"]
 
 
 class _SimplexMesh:
-    def __init__(self, points, cells, sort_cells=False):
+    # The attributes (arrays or dicts of arrays) which are stored by save_state() in
+    # addition to the points and cells, and, optionally, the geometric ones
+    _topology_attributes = (
+        "_points_cells",
+        "_points_edges",
+        "_points_points",
+        "_cells_neighbors",
+    )
+    _geometry_attributes = ()
+
+    def __init__(
+        self, points, cells, sort_cells=False, index_dtype=None, float_dtype=None
+    ):
         if sort_cells:
             # Sort cells, first every row, then the rows themselves. This helps in many
             # downstream applications, e.g., when constructing linear systems with the
             # cells/edges. (When converting to CSR format, the I/J entries must be
-            # sorted.) Don't use cells.sort(axis=1) to avoid
-            # ```
-            # ValueError: sort array is read-only
-            # ```
-            cells = np.sort(cells, axis=1)
-            cells = cells[cells[:, 0].argsort()]
+            # sorted.) Since the first entry of each sorted row is its minimum, the
+            # rows can be ordered first; this way, cells are copied only once (and
+            # the input, which may be read-only, isn't touched).
+            cells = np.asarray(cells)
+            cells = cells[np.min(cells, axis=1).argsort()]
+            cells.sort(axis=1)
 
         points = np.asarray(points)
         cells = np.asarray(cells)
-        assert len(points.shape) == 2, f"Illegal point coordinates shape {points.shape}"
+        assert len(points.shape) in [
+            2,
+            3,
+        ], f"Illegal point coordinates shape {points.shape}"
         assert len(cells.shape) == 2, f"Illegal cells shape {cells.shape}"
         self.n = cells.shape[1]
         assert self.n in [3, 4], f"Illegal cells shape {cells.shape}"
 
+        # All connectivity arrays (cells, edges, faces, and the relations between them)
+        # use the same integer type. Unless specified, take int32 if the indices fit,
+        # which halves the memory footprint and speeds up fancy indexing. Memory-mapped
+        # cells keep their (signed, wide enough) integer type, though; casting would
+        # read them into memory.
+        if index_dtype is None:
+            index_dtype = get_index_dtype(points.shape[-2], len(cells), self.n)
+            if (
+                is_memory_mapped(cells)
+                and np.issubdtype(cells.dtype, np.signedinteger)
+                and cells.dtype.itemsize >= index_dtype.itemsize
+            ):
+                index_dtype = cells.dtype
+        self.index_dtype = np.dtype(index_dtype)
+        cells = cells.astype(self.index_dtype, copy=False)
+
+        # All geometric quantities (half-edge coordinates, dot products, volumes,
+        # ce-ratios, circumcenters, control volumes etc.) are computed in the floating
+        # point type of the points. float64 is the default; float32 halves the memory
+        # footprint. Compared with float64, the float32 errors are of the order of
+        # 1.0e-7 * (coordinate magnitude / edge length), relative to the largest
+        # value of each quantity, i.e., they grow as the mesh is refined.
+        if float_dtype is None:
+            float_dtype = np.float64
+        self.float_dtype = np.dtype(float_dtype)
+        assert np.issubdtype(
+            self.float_dtype, np.floating
+        ), f"Illegal float dtype {self.float_dtype}"
+        points = points.astype(self.float_dtype, copy=False)
+
         # Assert that all vertices are used.
         # If there are vertices which do not appear in the cells list, this
         # ```
@@ -38,12 +95,24 @@ class _SimplexMesh:
         #     np.sum(~is_used)
         # )
 
-        self._points = np.asarray(points)
-        # prevent accidental override of parts of the array
+        # The points can carry a leading batch axis, i.e., have the shape (B,
+        # num_points, dim), for B states of the same mesh (e.g., time steps or
+        # ensemble members). The geometric quantities then get an axis of length B
+        # right in front of the cell axis (or the point axis for control volumes), and
+        # are computed for all states in one pass. Only the per-cell geometric
+        # quantities and the control volumes support this; mesh manipulation, point
+        # location, circumcenters etc. assert that there's no batch axis.
+        self.num_batches = points.shape[0] if len(points.shape) == 3 else None
+
+        # The input arrays aren't copied if their dtypes already fit, so, e.g.,
+        # memory-mapped arrays stay memory-mapped. Prevent accidental override of parts
+        # of the array, but don't change the flags of the caller's array: take a view.
+        self._points = points.view()
         self._points.setflags(write=False)
+        # incremented whenever the points change; see transfer()
+        self._points_version = 0
 
-        self.cells = {"points": np.asarray(cells)}
-        nds = self.cells["points"].T
+        self.cells = {"points": cells}
 
         if cells.shape[1] == 3:
             # Create the idx_hierarchy (points->edges->cells), i.e., the value of
@@ -54,11 +123,6 @@ class _SimplexMesh:
             self.local_idx = np.array([[1, 2], [2, 0], [0, 1]]).T
         else:
             assert cells.shape[1] == 4
-            # Arrange the point_face_cells such that point k is opposite of face k in
-            # each cell.
-            idx = np.array([[1, 2, 3], [2, 3, 0], [3, 0, 1], [0, 1, 2]]).T
-            self.point_face_cells = nds[idx]
-
             # Arrange the idx_hierarchy (point->edge->face->cells) such that
             #
             #   * point k is opposite of edge k in each face,
@@ -83,8 +147,9 @@ class _SimplexMesh:
             ).T
 
         # Map idx back to the points. This is useful if quantities which are in idx
-        # shape need to be added up into points (e.g., equation system rhs).
-        self.idx_hierarchy = nds[self.local_idx]
+        # shape need to be added up into points (e.g., equation system rhs). Computed
+        # on first access; see idx_hierarchy.
+        self._idx_hierarchy = None
 
         # The inverted local index.
         # This array specifies for each of the three points which edge endpoints
@@ -99,6 +164,93 @@ class _SimplexMesh:
 
         self._edge_lengths = None
 
+        # Cells which have been removed but are still present in the cell arrays (see
+        # MeshTri.remove_cells()), likewise for edges; None if there are no such cells.
+        self._is_cell_dead = None
+        self._is_edge_dead = None
+
+        self._points_cells = None
+        self._points_edges = None
+        self._points_points = None
+        self._cells_neighbors = None
+        # the sparsity pattern of matrices over the points (all P1 couplings); see
+        # get_laplacian() and assemble()
+        self._matrix_pattern = None
+
+        # Arrays which were allocated with spare capacity for appending entries; see
+        # _grow().
+        self._growth_buffers = {}
+
+        # Upper bound (in bytes) for the temporary arrays of the per-cell computations.
+        # If set, quantities like the half-edge coordinates are computed over blocks
+        # of cells into preallocated output arrays. Useful for very large meshes.
+        self.memory_budget = None
+        # Number of threads for the per-cell computations. If set, the cells are split
+        # into blocks which are processed concurrently. (NumPy releases the GIL in most
+        # array operations.) The results are bitwise identical to the serial ones with
+        # the same memory_budget. (The per-cell quantities don't even depend on the
+        # memory budget; sums over cells like the control volume centroids do.)
+        self.num_workers = None
+
+    def save_state(self, filename, geometry=False):
+        """Write the points, the cells, and all topological data computed so far
+        (edges, faces, the relations between them, boundary flags etc.) to an
+        uncompressed .npz file. With `geometry=True`, the cached geometric quantities
+        are stored as well. See `load_state()`.
+        """
+        assert self._is_cell_dead is None or not np.any(
+            self._is_cell_dead
+        ), "The mesh has removed cells. Call compact_cells() first."
+        arrays = {"class": np.array(type(self).__name__), "points": self.points}
+        names = ["cells", *self._topology_attributes]
+        if geometry:
+            names += self._geometry_attributes
+        for name in names:
+            value = vars(self).get(name)
+            if isinstance(value, dict):
+                for key, a in value.items():
+                    arrays[f"{name}/{key}"] = a
+            elif value is not None:
+                arrays[name] = value
+        # Don't compress; load_state() memory-maps the arrays.
+        np.savez(filename, **arrays)
+
+    @classmethod
+    def load_state(cls, filename, mmap_mode="r"):
+        """Restore a mesh written by `save_state()`. The arrays are memory-mapped (with
+        `mmap_mode` as in `np.load()`), so loading is almost instant, and the data is
+        shared between processes through the page cache. Use `mmap_mode="c"`
+        (copy-on-write) if the mesh is modified in place, e.g., by flipping edges, and
+        `None` to read everything into memory.
+        """
+        data = load_npz(filename, mmap_mode)
+        class_name = str(data.pop("class"))
+        assert class_name == cls.__name__, f"Illegal mesh type {class_name}"
+        points = data.pop("points")
+        cells = data.pop("cells/points")
+        mesh = cls(points, cells, index_dtype=cells.dtype, float_dtype=points.dtype)
+        for key, value in data.items():
+            name, _, subkey = key.partition("/")
+            if not subkey:
+                vars(mesh)[name] = value
+            elif name == "cells":
+                mesh.cells[subkey] = value
+            else:
+                if vars(mesh).get(name) is None:
+                    vars(mesh)[name] = {}
+                vars(mesh)[name][subkey] = value
+        return mesh
+
+    @property
+    def idx_hierarchy(self):
+        if self._idx_hierarchy is None:
+            self._idx_hierarchy = self.cells["points"].T[self.local_idx]
+        return self._idx_hierarchy
+
+    @idx_hierarchy.setter
+    def idx_hierarchy(self, value):
+        self._idx_hierarchy = value
+
     # prevent overriding points without adapting the other mesh data
     @property
     def points(self):
@@ -106,40 +258,169 @@ class _SimplexMesh:
 
     @points.setter
     def points(self, new_points):
-        new_points = np.asarray(new_points)
+        new_points = np.asarray(new_points, dtype=self.float_dtype)
         assert new_points.shape == self._points.shape
         self._points = new_points
+        self._points_version += 1
         # reset all computed values
         self._reset_point_data()
 
     def set_points(self, new_points, idx=slice(None)):
+        """Set the coordinates of all points or, if `idx` is given, of a subset of the
+        points. In the latter case, only the data of the cells adjacent to the moved
+        points is recomputed.
+        """
+        if isinstance(idx, slice) and idx == slice(None):
+            self._write_points(new_points, idx)
+            self._reset_point_data()
+            return
+
+        # find the cells which contain at least one of the moved points
+        is_moved = np.zeros(self.points.shape[-2], dtype=bool)
+        is_moved[idx] = True
+        is_adjacent = np.any(is_moved[self.cells["points"]], axis=1)
+        if self._is_cell_dead is not None:
+            is_adjacent &= ~self._is_cell_dead
+        cell_ids = np.where(is_adjacent)[0]
+        self._update_point_data(new_points, idx, cell_ids)
+        # the cell bounding boxes have changed
+        self._cell_grid = None
+
+    def _grow(self, key, a, num_new, axis=0):
+        """Return the array `a` with `num_new` (uninitialized) entries appended along
+        `axis`. The memory is allocated with spare capacity, so repeated appending to
+        the same array (identified by `key`) only reallocates every now and then. The
+        returned array is a view into that memory.
+        """
+        axis %= a.ndim
+        n = a.shape[axis]
+        ref = self._growth_buffers.get(key)
+        buf = None if ref is None else ref()
+        # Only reuse the memory if `a` is still the leading part of the buffer.
+        if (
+            buf is None
+            or a.base is not buf
+            or a.ctypes.data != buf.ctypes.data
+            or a.strides != buf.strides
+            or np.any(np.delete(a.shape, axis) != np.delete(buf.shape, axis))
+            or buf.shape[axis] < n + num_new
+        ):
+            shape = list(a.shape)
+            shape[axis] = max(n + num_new, 2 * n)
+            buf = np.empty(shape, dtype=a.dtype)
+            idx = [slice(None)] * a.ndim
+            idx[axis] = slice(0, n)
+            buf[tuple(idx)] = a
+            self._growth_buffers[key] = weakref.ref(buf)
+
+        idx = [slice(None)] * a.ndim
+        idx[axis] = slice(0, n + num_new)
+        return buf[tuple(idx)]
+
+    def _write_points(self, new_points, idx):
         self.points.setflags(write=True)
         self.points[idx] = new_points
         self.points.setflags(write=False)
-        self._reset_point_data()
+        self._points_version += 1
+
+    def _cell_blocks(self, bytes_per_cell=None, concurrent=True):
+        """Slices of cell blocks such that the temporaries needed for all blocks which
+        are processed at the same time, given their size per cell, fit into the memory
+        budget. With `concurrent=False`, the blocks are for serial processing and don't
+        depend on `num_workers`. Use this for accumulations over the blocks; their
+        result depends on the partition.
+        """
+        num_cells = self.cells["points"].shape[0]
+        block_size = num_cells
+        num_concurrent = 1
+        if concurrent and self.num_workers is not None:
+            # A few blocks per worker for load balancing, but not too small; otherwise
+            # the overhead dominates.
+            num_concurrent = self.num_workers
+            block_size = max(-(-num_cells // (4 * num_concurrent)), 2 ** 14)
+        if self.memory_budget is not None and bytes_per_cell is not None:
+            if self.num_batches is not None:
+                bytes_per_cell *= self.num_batches
+            block_size = min(
+                block_size, self.memory_budget // (num_concurrent * bytes_per_cell)
+            )
+        if block_size >= num_cells:
+            return [slice(None)]
+        # Use multiples of 64 cells. That way, the vectorized inner loops of NumPy
+        # work on the same chunks of data as in the serial case (which matters for
+        # transcendental functions).
+        block_size = max(64, block_size // 64 * 64)
+        return [slice(k, k + block_size) for k in range(0, num_cells, block_size)]
+
+    def _run_cell_blocks(self, kernel, bytes_per_cell=None):
+        """Calls `kernel(blk)` for all blocks of cells, concurrently if `num_workers` is
+        set. The kernel writes its results into preallocated output arrays.
+        """
+        blocks = self._cell_blocks(bytes_per_cell)
+        if self.num_workers is None or len(blocks) == 1:
+            for blk in blocks:
+                kernel(blk)
+            return
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            # Exhaust the iterator to get exceptions raised in the workers.
+            list(executor.map(kernel, blocks))
 
     @property
     def half_edge_coords(self):
         if self._half_edge_coords is None:
-            p = self.points[self.idx_hierarchy]
-            self._half_edge_coords = p[1] - p[0]
+            dim = self.points.shape[-1]
+            out = np.empty(
+                self.local_idx.shape[1:]
+                + self.points.shape[:-2]
+                + (len(self.cells["points"]), dim),
+                dtype=self.points.dtype,
+            )
+
+            def _compute(blk):
+                # Take the point indices from the cells rather than from idx_hierarchy;
+                # that way, the latter needn't be stored.
+                idx = self.cells["points"][blk].T[self.local_idx]
+                p = self.points[..., idx, :]
+                if self.num_batches is not None:
+                    # move the batch axis in front of the cell axis
+                    p = np.moveaxis(p, 0, -3)
+                np.subtract(p[1], p[0], out=out[..., blk, :])
+
+            # The temporaries are the coordinates of all edge end points and (for fancy
+            # indexing) the point indices as intp.
+            bytes_per_cell = self.local_idx.size * (dim * self.points.itemsize + 8)
+            self._run_cell_blocks(_compute, bytes_per_cell)
+            self._half_edge_coords = out
         return self._half_edge_coords
 
     @property
     def ei_dot_ei(self):
         if self._ei_dot_ei is None:
-            # einsum is faster if the tail survives, e.g., ijk,ijk->jk.
-            # <https://gist.github.com/nschloe/8bc015cc1a9e5c56374945ddd711df7b>
-            # TODO reorganize the data?
-            self._ei_dot_ei = np.einsum(
-                "...k, ...k->...", self.half_edge_coords, self.half_edge_coords
-            )
+            h = self.half_edge_coords
+            out = np.empty(h.shape[:-1], dtype=h.dtype)
+
+            def _compute(blk):
+                # einsum is faster if the tail survives, e.g., ijk,ijk->jk.
+                # <https://gist.github.com/nschloe/8bc015cc1a9e5c56374945ddd711df7b>
+                # TODO reorganize the data?
+                hb = h[..., blk, :]
+                np.einsum("...k, ...k->...", hb, hb, out=out[..., blk])
+
+            self._run_cell_blocks(_compute)
+            self._ei_dot_ei = out
         return self._ei_dot_ei
 
     @property
     def ei_dot_ej(self):
         if self._ei_dot_ej is None:
-            self._ei_dot_ej = self.ei_dot_ei - np.sum(self.ei_dot_ei, axis=0) / 2
+            e = self.ei_dot_ei
+            out = np.empty_like(e)
+
+            def _compute(blk):
+                out[..., blk] = e[..., blk] - np.sum(e[..., blk], axis=0) / 2
+
+            self._run_cell_blocks(_compute, 2 * e.itemsize * np.prod(e.shape[:-1]))
+            self._ei_dot_ej = out
             # An alternative is
             # ```
             # self._ei_dot_ej = np.einsum(
@@ -153,6 +434,9 @@ class _SimplexMesh:
         return self._ei_dot_ej
 
     def compute_centroids(self, idx=slice(None)):
+        assert (
+            self.points.ndim == 2
+        ), "compute_centroids() does not support batched points"
         return np.sum(self.points[self.cells["points"][idx]], axis=1) / self.n
 
     @property
@@ -179,10 +463,663 @@ class _SimplexMesh:
         # ```
         # helps.
         if self._is_point_used is None:
-            self._is_point_used = np.zeros(len(self.points), dtype=bool)
-            self._is_point_used[self.cells["points"]] = True
+            self._is_point_used = np.zeros(self.points.shape[-2], dtype=bool)
+            self._is_point_used[self._live_cells("points")] = True
         return self._is_point_used
 
+    @property
+    def points_cells(self):
+        """The cells adjacent to each point as a CSR-like structure: The cells of point
+        k are `ids[offsets[k] : offsets[k] + counts[k]]` (in no particular order).
+        """
+        if self._points_cells is None:
+            cell_ids = np.arange(len(self.cells["points"]), dtype=self.index_dtype)
+            if self._is_cell_dead is not None:
+                cell_ids = cell_ids[~self._is_cell_dead]
+            offsets, counts, (ids,) = csr_from_rows(
+                self.cells["points"][cell_ids].reshape(-1),
+                self.points.shape[-2],
+                [np.repeat(cell_ids, self.n)],
+            )
+            self._points_cells = {"offsets": offsets, "counts": counts, "ids": ids}
+        return self._points_cells
+
+    @property
+    def points_edges(self):
+        """The edges adjacent to each point; see points_cells."""
+        if self._points_edges is None:
+            self._compute_points_edges()
+        return self._points_edges
+
+    @property
+    def points_points(self):
+        """The neighbors of each point (i.e., the points which share an edge with it);
+        see points_cells. The entries are aligned with those of points_edges.
+        """
+        if self._points_points is None:
+            self._compute_points_edges()
+        return self._points_points
+
+    def _compute_points_edges(self):
+        if self.edges is None:
+            self.create_edges()
+        edge_ids = np.arange(len(self.edges["points"]), dtype=self.index_dtype)
+        if self._is_edge_dead is not None:
+            edge_ids = edge_ids[~self._is_edge_dead]
+        edge_points = self.edges["points"][edge_ids]
+        offsets, counts, (ids, neighbors) = csr_from_rows(
+            edge_points.reshape(-1),
+            self.points.shape[-2],
+            [np.repeat(edge_ids, 2), edge_points[:, ::-1].reshape(-1)],
+        )
+        # points_edges and points_points share the offsets and counts
+        self._points_edges = {"offsets": offsets, "counts": counts, "ids": ids}
+        self._points_points = {"offsets": offsets, "counts": counts, "ids": neighbors}
+
+    @property
+    def cells_neighbors(self):
+        """The neighbors of each cell: Entry k of cell i is the cell across the facet
+        opposite of point k, or -1 if the facet is on the boundary.
+        """
+        if self._cells_neighbors is None:
+            self._compute_cells_neighbors()
+        return self._cells_neighbors
+
+    def _compute_cells_neighbors(self):
+        # Facet k of a cell is opposite of its point k.
+        if self.n == 3:
+            if "edges" not in self.cells:
+                self.create_edges()
+            cells_facets = self.cells["edges"]
+        else:
+            if "faces" not in self.cells:
+                self.create_cell_face_relationships()
+            cells_facets = self.cells["faces"]
+
+        num_cells = len(self.cells["points"])
+        cell_ids = np.arange(num_cells, dtype=self.index_dtype)
+        if self._is_cell_dead is not None:
+            cell_ids = cell_ids[~self._is_cell_dead]
+
+        # Interior facets appear twice; after sorting, those two are adjacent.
+        facets = cells_facets[cell_ids].reshape(-1)
+        order = np.argsort(facets, kind="stable")
+        is_pair = facets[order[1:]] == facets[order[:-1]]
+        k0 = order[:-1][is_pair]
+        k1 = order[1:][is_pair]
+        c0 = cell_ids[k0 // self.n]
+        c1 = cell_ids[k1 // self.n]
+
+        neighbors = np.full((num_cells, self.n), -1, dtype=self.index_dtype)
+        neighbors[c0, k0 % self.n] = c1
+        neighbors[c1, k1 % self.n] = c0
+        self._cells_neighbors = neighbors
+
+    def _get_cell_grid(self):
+        """A uniform grid over the bounding box of the mesh for point location. Every
+        grid bucket holds the cells whose bounding boxes intersect it (as a CSR
+        structure). The bucket size is chosen such that there's about one cell per
+        bucket.
+        """
+        if self._cell_grid is not None:
+            return self._cell_grid
+
+        cell_ids = np.arange(len(self.cells["points"]), dtype=self.index_dtype)
+        if self._is_cell_dead is not None:
+            cell_ids = cell_ids[~self._is_cell_dead]
+        x = self.points[self.cells["points"][cell_ids]]
+        bb_min = np.min(x, axis=1)
+        bb_max = np.max(x, axis=1)
+
+        origin = np.min(bb_min, axis=0)
+        extent = np.max(bb_max, axis=0) - origin
+        dim = len(origin)
+        h = (np.prod(extent) / len(cell_ids)) ** (1.0 / dim)
+        shape = np.maximum(np.ceil(extent / h).astype(int), 1)
+        h = extent / shape
+
+        # the range of buckets intersected by each cell
+        lo = np.clip(((bb_min - origin) / h).astype(int), 0, shape - 1)
+        hi = np.clip(((bb_max - origin) / h).astype(int), 0, shape - 1)
+        ext = hi - lo + 1
+        counts = np.prod(ext, axis=1)
+        # enumerate all (cell, bucket) pairs
+        rank = np.arange(np.sum(counts)) - np.repeat(np.cumsum(counts) - counts, counts)
+        lo = np.repeat(lo, counts, axis=0)
+        ext = np.repeat(ext, counts, axis=0)
+        idx = np.empty_like(lo)
+        for k in reversed(range(dim)):
+            idx[:, k] = lo[:, k] + rank % ext[:, k]
+            rank //= ext[:, k]
+        buckets = np.ravel_multi_index(idx.T, shape)
+
+        num_buckets = np.prod(shape)
+        offsets = np.zeros(num_buckets + 1, dtype=int)
+        np.cumsum(np.bincount(buckets, minlength=num_buckets), out=offsets[1:])
+        ids = np.repeat(cell_ids, counts)[np.argsort(buckets, kind="stable")]
+
+        self._cell_grid = {
+            "origin": origin,
+            "h": h,
+            "shape": shape,
+            "offsets": offsets,
+            "ids": ids,
+        }
+        return self._cell_grid
+
+    def compute_barycentric_coordinates(self, x, cell_ids):
+        """The barycentric coordinates of the points `x` with respect to the cells
+        `cell_ids` (one cell per point), shape `(len(x), n)`.
+        """
+        p = self.points[self.cells["points"][cell_ids]]
+        # solve for the coordinates of the points 1, ..., n-1
+        a = np.swapaxes(p[:, 1:] - p[:, :1], 1, 2)
+        lmbda = np.linalg.solve(a, (x - p[:, 0])[..., None])[..., 0]
+        return np.column_stack([1.0 - np.sum(lmbda, axis=1), lmbda])
+
+    def locate(self, points, tol=None):
+        """Find the cells containing `points` (in the same dimension as the mesh, i.e.,
+        2D for triangles and 3D for tetrahedra). Returns the cell ids (-1 for points
+        outside of the mesh) and the barycentric coordinates (NaN outside) of the
+        points. Points on facets are attributed to any of the adjacent cells.
+
+        The first call builds a bucket index of the cells which is reused by all
+        subsequent calls (until the mesh changes).
+        """
+        assert self.points.ndim == 2, "locate() does not support batched points"
+        x = np.asarray(points, dtype=self.float_dtype)
+        assert (
+            self.points.shape[1] == self.n - 1
+        ), "Point location only works for triangles in 2D and tetrahedra in 3D."
+        assert x.shape[1:] == self.points.shape[1:]
+        if tol is None:
+            tol = 1.0e3 * np.finfo(self.float_dtype).eps
+
+        grid = self._get_cell_grid()
+        b = np.floor((x - grid["origin"]) / grid["h"]).astype(int)
+        # Points on the upper end of the bounding box belong to the last bucket.
+        b[b == grid["shape"]] -= 1
+        is_in_grid = np.all((b >= 0) & (b < grid["shape"]), axis=1)
+        bucket = np.ravel_multi_index(b[is_in_grid].T, grid["shape"])
+        first = grid["offsets"][bucket]
+        counts = grid["offsets"][bucket + 1] - first
+
+        cell_ids = np.full(len(x), -1, dtype=self.index_dtype)
+        bary = np.full((len(x), self.n), np.nan, dtype=self.float_dtype)
+
+        # In round k, test the k-th cell of the bucket of all points which haven't
+        # been found yet. Most points are found in the first few rounds.
+        active = np.where(is_in_grid)[0]
+        k = 0
+        while len(active) > 0:
+            is_left = counts > k
+            active = active[is_left]
+            first = first[is_left]
+            counts = counts[is_left]
+
+            cand = grid["ids"][first + k]
+            lmbda = self.compute_barycentric_coordinates(x[active], cand)
+            is_inside = np.all(lmbda >= -tol, axis=1)
+            if self._is_cell_dead is not None:
+                is_inside &= ~self._is_cell_dead[cand]
+            cell_ids[active[is_inside]] = cand[is_inside]
+            bary[active[is_inside]] = lmbda[is_inside]
+
+            active = active[~is_inside]
+            first = first[~is_inside]
+            counts = counts[~is_inside]
+            k += 1
+
+        return cell_ids, bary
+
+    def interpolate(self, point_data, x):
+        """Evaluate the piecewise linear function given by its values `point_data` at
+        the points `x`. The result is NaN for points outside of the mesh.
+        `point_data` can have trailing dimensions, e.g., for several fields at once.
+        """
+        assert self.points.ndim == 2, "interpolate() does not support batched points"
+        point_data = np.asarray(point_data)
+        assert len(point_data) == len(self.points)
+        cell_ids, bary = self.locate(x)
+        is_found = cell_ids >= 0
+        out = np.full(
+            (len(cell_ids),) + point_data.shape[1:],
+            np.nan,
+            dtype=np.result_type(point_data, bary),
+        )
+        out[is_found] = np.einsum(
+            "ij,ij...->i...",
+            bary[is_found],
+            point_data[self.cells["points"][cell_ids[is_found]]],
+        )
+        return out
+
+    def get_interpolation_matrix(self, x):
+        """The sparse matrix (scipy CSR) which maps point data of the mesh to their
+        piecewise linear interpolant at the points `x`. The rows of points outside of
+        the mesh are zero.
+        """
+        from scipy.sparse import csr_matrix
+
+        cell_ids, bary = self.locate(x)
+        is_found = cell_ids >= 0
+        indptr = np.zeros(len(cell_ids) + 1, dtype=int)
+        np.cumsum(np.where(is_found, self.n, 0), out=indptr[1:])
+        return csr_matrix(
+            (
+                bary[is_found].reshape(-1),
+                self.cells["points"][cell_ids[is_found]].reshape(-1),
+                indptr,
+            ),
+            shape=(len(cell_ids), len(self.points)),
+        )
+
+    def transfer(self, point_data, target):
+        """Interpolate point data to the points of the mesh `target`. The result is NaN
+        at target points outside of the mesh.
+
+        The interpolation matrix is cached (until either of the meshes changes), so
+        repeated transfers are just sparse matrix-vector products. To transfer many
+        fields, pass them all at once as the columns of `point_data`.
+        """
+        assert self.points.ndim == 2, "transfer() does not support batched points"
+        # The cache lives in the point location grid; it's invalidated along with it.
+        grid = self._get_cell_grid()
+        cache = grid.setdefault("transfer", weakref.WeakKeyDictionary())
+        entry = cache.get(target)
+        if (
+            entry is None
+            or entry[0] != target._points_version
+            or entry[1].shape[1] != len(self.points)
+        ):
+            matrix = self.get_interpolation_matrix(target.points)
+            is_outside = np.diff(matrix.indptr) == 0
+            entry = (target._points_version, matrix, is_outside)
+            cache[target] = entry
+        _, matrix, is_outside = entry
+
+        point_data = np.asarray(point_data)
+        assert len(point_data) == len(self.points)
+        # Integer or boolean data is interpolated in floating point (it needs the NaNs
+        # anyway).
+        dtype = np.result_type(point_data, matrix.dtype, np.float32)
+        out = matrix @ point_data.reshape(len(point_data), -1).astype(dtype, copy=False)
+        out[is_outside] = np.nan
+        return out.reshape((len(out),) + point_data.shape[1:])
+
+    def reorder(self, method="morton"):
+        """Renumber the points and cells such that adjacent points and cells are close
+        in memory. This speeds up the gathers and scatters of the per-cell computations
+        considerably if the input comes in no particular order. The points are sorted
+        along a Morton curve (`method="morton"`) or with reverse Cuthill-McKee on the
+        point graph (`method="rcm"`, requires SciPy). The cells are then sorted by their
+        points.
+
+        All computed data is permuted along. Returns the permutations `point_order`,
+        `cell_order` of the old point and cell indices, i.e., point k is now what was
+        point `point_order[k]` before.
+        """
+        assert self.points.ndim == 2, "reorder() does not support batched points"
+        assert method in ["morton", "rcm"], f"Illegal reorder method {method}"
+        if self._is_cell_dead is not None:
+            self.compact_cells()
+
+        if method == "morton":
+            point_order = np.argsort(morton_codes(self.points), kind="stable")
+        else:
+            from scipy.sparse import coo_matrix
+            from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+            num_points = len(self.points)
+            i, j = self.idx_hierarchy.reshape(2, -1)
+            graph = coo_matrix(
+                (np.ones(len(i), dtype=np.int8), (i, j)), shape=(num_points, num_points)
+            ).tocsr()
+            point_order = reverse_cuthill_mckee(graph, symmetric_mode=False)
+        point_order = point_order.astype(self.index_dtype)
+        new_index_points = np.empty_like(point_order)
+        new_index_points[point_order] = np.arange(len(point_order))
+
+        # sort the cells lexicographically by their sorted new point indices
+        c = np.sort(new_index_points[self.cells["points"]], axis=1)
+        cell_order = np.lexsort(c.T[::-1]).astype(self.index_dtype)
+        new_index_cells = np.empty_like(cell_order)
+        new_index_cells[cell_order] = np.arange(len(cell_order))
+
+        self._permute(point_order, new_index_points, cell_order, new_index_cells)
+        return point_order, cell_order
+
+    def compact_points(self):
+        """Remove the points which don't belong to any cell, e.g., after
+        remove_cells(), and renumber the others (keeping their order). Return the map
+        from old to new point indices, -1 for the removed points. Removed cells are
+        compacted first. The cached point data (control volumes, boundary flags,
+        subdomains, point adjacency etc.) is remapped, not recomputed.
+        """
+        assert self.points.ndim == 2, "compact_points() does not support batched points"
+        if self._is_cell_dead is not None:
+            self.compact_cells()
+
+        # Renumber in O(n); np.unique() would sort all point references of the cells.
+        num_points = len(self.points)
+        is_used = (
+            np.bincount(self.cells["points"].reshape(-1), minlength=num_points) > 0
+        )
+        new_index = np.arange(num_points, dtype=self.index_dtype) - np.cumsum(
+            ~is_used, dtype=self.index_dtype
+        )
+        new_index[~is_used] = -1
+        if np.all(is_used):
+            return new_index
+
+        point_order = np.where(is_used)[0]
+        self._permute_points(point_order, new_index)
+        if self._idx_hierarchy is not None:
+            self._idx_hierarchy = new_index[self._idx_hierarchy]
+
+        for subdomain in self.subdomains.values():
+            subdomain["vertices"] = subdomain["vertices"][point_order]
+
+        # Drop the rows of the removed points from the point adjacency (they're
+        # empty); the entries are kept. points_edges and points_points share the
+        # offsets and counts.
+        for names in [["_points_cells"], ["_points_edges", "_points_points"]]:
+            csr = vars(self)[names[0]]
+            if csr is None:
+                continue
+            offsets = csr["offsets"][point_order]
+            counts = csr["counts"][point_order]
+            for name in names:
+                vars(self)[name]["offsets"] = offsets
+                vars(self)[name]["counts"] = counts
+        if self._points_points is not None:
+            ids = self._points_points["ids"]
+            is_set = ids >= 0
+            ids[is_set] = new_index[ids[is_set]]
+
+        # the pattern is over the points; the cell grid doesn't depend on them
+        self._matrix_pattern = None
+        return new_index
+
+    def _permute_points(self, point_order, new_index_points):
+        """Take the points `point_order` (a permutation or a subset of the points) and
+        adapt the cells, edges, faces, and the cached point data. `new_index_points`
+        maps the old point indices to the new ones.
+        """
+        self._points = self._points[point_order]
+        self._points.setflags(write=False)
+        self._points_version += 1
+
+        self.cells["points"] = new_index_points[self.cells["points"]]
+        if "opposing vertex" in self.cells:
+            self.cells["opposing vertex"] = self.cells["points"]
+        if "_point_face_cells" in vars(self):
+            self._point_face_cells = None
+
+        for entities in [vars(self).get("edges"), vars(self).get("faces")]:
+            if entities is not None:
+                entities["points"] = new_index_points[entities["points"]]
+
+        # The cached point data. (Use vars() here; getattr() would compute properties
+        # of the same name.)
+        for name in [
+            "_control_volumes",
+            "_cv_centroids",
+            "_is_point_used",
+            "_is_boundary_point",
+            "_is_interior_point",
+            "_num_point_cells",
+            "is_boundary_point",
+        ]:
+            a = vars(self).get(name)
+            if a is not None:
+                setattr(self, name, a[point_order])
+
+    def _permute(self, point_order, new_index_points, cell_order, new_index_cells):
+        for key, value in self.cells.items():
+            self.cells[key] = value[cell_order]
+        self._idx_hierarchy = None
+        self._permute_points(point_order, new_index_points)
+
+        # the cached cell data, along with the axis of the cell index
+        for name, axis in [
+            ("_half_edge_coords", -2),
+            ("_ei_dot_ei", -1),
+            ("_ei_dot_ej", -1),
+            ("_edge_lengths", -1),
+            ("_cell_volumes", -1),
+            ("_ce_ratios", -1),
+            ("_cell_partitions", -1),
+            ("_cell_circumcenters", 0),
+            ("_circumcenters", 0),
+            ("_cell_centroids", 0),
+            ("_signed_cell_areas", 0),
+            ("_zeta", -1),
+            ("_circumcenter_face_distances", -1),
+            ("_is_boundary_cell", 0),
+            ("_is_boundary_edge_local", -1),
+            ("is_boundary_facet_local", -1),
+            ("_cv_cell_mask", 0),
+            ("_cvc_cell_mask", 0),
+        ]:
+            a = vars(self).get(name)
+            if a is not None:
+                setattr(self, name, np.take(a, cell_order, axis=axis))
+
+        if self._cells_neighbors is not None:
+            neighbors = self._cells_neighbors[cell_order]
+            is_set = neighbors >= 0
+            neighbors[is_set] = new_index_cells[neighbors[is_set]]
+            self._cells_neighbors = neighbors
+
+        # The edges (and faces) keep their numbers; only the cell references change.
+        ec = vars(self).get("_edges_cells")
+        if ec is not None:
+            ec["boundary"][1] = new_index_cells[ec["boundary"][1]]
+            ec["interior"][1:3] = new_index_cells[ec["interior"][1:3]]
+        inv_faces = vars(self).get("_inv_faces")
+        if inv_faces is not None:
+            self._inv_faces = inv_faces.reshape(self.n, -1)[:, cell_order].reshape(-1)
+
+        # simply reset the data which is cheap to recompute
+        self.subdomains = {}
+        self._points_cells = None
+        self._points_edges = None
+        self._points_points = None
+        self._cell_grid = None
+        self._matrix_pattern = None
+
+    def get_laplacian(self):
+        """The finite-volume Laplacian as a scipy CSR matrix: Row i of `L @ u` is the
+        sum of `ce_ij * (u_i - u_j)` over all neighbors j of point i, where `ce_ij` is
+        the ratio of the covolume and the length of the edge ij. Divide the rows by the
+        control volumes to get a pointwise approximation of -Δu.
+
+        The sparsity pattern (and the map from the edge contributions into it) is
+        computed once and reused until the connectivity of the mesh changes. After
+        moving points, only the matrix entries are recomputed.
+        """
+        assert self.points.ndim == 2, "get_laplacian() does not support batched points"
+        from scipy.sparse import csr_matrix
+
+        pattern = self._get_matrix_pattern()
+        ce = self.ce_ratios.astype(float)
+        if self._is_cell_dead is not None:
+            ce = ce * ~self._is_cell_dead
+        w = ce.reshape(-1)
+        num_points = len(self.points)
+
+        # sum up the contributions per edge, fill in the off-diagonal entries and
+        # their (negative) row sums on the diagonal
+        w_edges = np.bincount(pattern["inv"], w, minlength=len(pattern["edges"]))
+        data = np.empty(len(pattern["indices"]))
+        data[pattern["slots_upper"]] = -w_edges
+        data[pattern["slots_lower"]] = -w_edges
+        data[pattern["slots_diag"]] = np.bincount(
+            pattern["edges"].reshape(-1), np.repeat(w_edges, 2), minlength=num_points
+        )
+        return csr_matrix(
+            (data, pattern["indices"].copy(), pattern["indptr"].copy()),
+            shape=(num_points, num_points),
+        )
+
+    def _get_matrix_pattern(self):
+        """The sparsity pattern of matrices over the points, i.e., with an entry for
+        every point and every edge (in both directions).
+        """
+        if self._matrix_pattern is not None:
+            return self._matrix_pattern
+
+        # The matrix has entries for all points and edges (in both directions). Their
+        # keys `row * num_points + col` are sorted individually; a stable sort of the
+        # concatenation merges them.
+        num_points = len(self.points)
+        pairs = np.sort(self.idx_hierarchy.reshape(2, -1).T, axis=1)
+        edges, inv, _ = unique_rows(pairs)
+        a = edges[:, 0].astype(np.int64)
+        b = edges[:, 1].astype(np.int64)
+        p = np.arange(num_points, dtype=np.int64)
+        keys_lower = b * num_points + a
+        lower_order = np.argsort(keys_lower)
+        keys = np.concatenate(
+            [p * num_points + p, a * num_points + b, keys_lower[lower_order]]
+        )
+        order = np.argsort(keys, kind="stable")
+        slots = np.empty(len(keys), dtype=int)
+        slots[order] = np.arange(len(keys))
+
+        num_edges = len(edges)
+        slots_lower = np.empty(num_edges, dtype=int)
+        slots_lower[lower_order] = slots[num_points + num_edges :]
+
+        # one diagonal entry per row plus one entry per adjacent edge
+        row_lengths = 1 + np.bincount(edges.reshape(-1), minlength=num_points)
+        indptr = np.zeros(num_points + 1, dtype=int)
+        np.cumsum(row_lengths, out=indptr[1:])
+        self._matrix_pattern = {
+            "indptr": indptr,
+            "indices": keys[order] % num_points,
+            "edges": edges,
+            "inv": inv,
+            "slots_diag": slots[:num_points],
+            "slots_upper": slots[num_points : num_points + num_edges],
+            "slots_lower": slots_lower,
+        }
+        return self._matrix_pattern
+
+    def assemble(self, local_matrices):
+        """Assemble the element matrices `local_matrices`, shape `(num_cells, n, n)`,
+        into a scipy CSR matrix over the points. Entry `(k, i, j)` goes to the row of
+        point i and the column of point j of cell k.
+
+        The positions of all entries in the CSR data array are computed once and reused
+        until the connectivity of the mesh changes, so repeated assemblies are just one
+        scatter-add.
+        """
+        from scipy.sparse import csr_matrix
+
+        local_matrices = np.asarray(local_matrices)
+        num_cells = len(self.cells["points"])
+        assert local_matrices.shape == (num_cells, self.n, self.n)
+        if self._is_cell_dead is not None:
+            local_matrices = local_matrices * ~self._is_cell_dead[:, None, None]
+
+        pattern = self._get_matrix_pattern()
+        if "scatter" not in pattern:
+            # Find the data position of all (cell, i, j) in the CSR pattern, sorted by
+            # row * num_points + col.
+            num_points = len(self.points)
+            rows = np.repeat(np.arange(num_points), np.diff(pattern["indptr"]))
+            keys = rows * num_points + pattern["indices"]
+            c = self.cells["points"].astype(np.int64)
+            pattern["scatter"] = np.searchsorted(
+                keys, c[:, :, None] * num_points + c[:, None, :]
+            ).reshape(-1)
+
+        data = np.bincount(
+            pattern["scatter"],
+            local_matrices.reshape(-1),
+            minlength=len(pattern["indices"]),
+        )
+        num_points = len(self.points)
+        return csr_matrix(
+            (data, pattern["indices"].copy(), pattern["indptr"].copy()),
+            shape=(num_points, num_points),
+        )
+
+    def compute_stiffness_matrices(self, idx=None):
+        """The element stiffness matrices of linear (P1) finite elements, i.e., the
+        integrals of `dot(grad(phi_i), grad(phi_j))` over the cells `idx` (default: all
+        cells).
+        """
+        assert (
+            self.points.ndim == 2
+        ), "compute_stiffness_matrices() does not support batched points"
+        if idx is None:
+            idx = slice(None)
+        # The gradients of the barycentric coordinates 1, ..., n-1 are given by the
+        # inverse of the Gram matrix of the edges from point 0. That of coordinate 0 is
+        # minus the sum of all others.
+        p = self.points[self.cells["points"][idx]]
+        e = p[:, 1:] - p[:, :1]
+        ginv = np.linalg.inv(np.einsum("cik,cjk->cij", e, e))
+        row_sums = np.sum(ginv, axis=2)
+
+        out = np.empty((len(ginv), self.n, self.n), dtype=ginv.dtype)
+        out[:, 1:, 1:] = ginv
+        out[:, 0, 1:] = -row_sums
+        out[:, 1:, 0] = -row_sums
+        out[:, 0, 0] = np.sum(row_sums, axis=1)
+        return out * self.cell_volumes[idx, None, None]
+
+    def compute_mass_matrices(self, idx=None):
+        """The element mass matrices of linear (P1) finite elements, i.e., the
+        integrals of `phi_i * phi_j` over the cells `idx` (default: all cells).
+        """
+        assert (
+            self.points.ndim == 2
+        ), "compute_mass_matrices() does not support batched points"
+        if idx is None:
+            idx = slice(None)
+        vols = self.cell_volumes[idx]
+        # vol / ((d + 1) * (d + 2)) * (1 + delta_ij) with d = n - 1
+        out = np.ones((len(vols), self.n, self.n), dtype=vols.dtype)
+        out[:, np.arange(self.n), np.arange(self.n)] = 2.0
+        return out * (vols / (self.n * (self.n + 1)))[:, None, None]
+
+    def get_stiffness_matrix(self):
+        """The stiffness matrix of linear finite elements (scipy CSR)."""
+        return self.assemble(self.compute_stiffness_matrices())
+
+    def get_mass_matrix(self, lumped=False):
+        """The mass matrix of linear finite elements (scipy CSR). If `lumped`, the
+        diagonal matrix of its row sums, i.e., `cell volume / n` from every adjacent
+        cell.
+        """
+        assert (
+            self.points.ndim == 2
+        ), "get_mass_matrix() does not support batched points"
+        if not lumped:
+            return self.assemble(self.compute_mass_matrices())
+
+        from scipy.sparse import diags
+
+        vols = self.cell_volumes.astype(float)
+        if self._is_cell_dead is not None:
+            vols = vols * ~self._is_cell_dead
+        d = np.bincount(
+            self.cells["points"].reshape(-1),
+            np.repeat(vols / self.n, self.n),
+            minlength=len(self.points),
+        )
+        return diags(d, format="csr")
+
+    def _live_cells(self, key):
+        """The rows of `self.cells[key]` without those of removed cells."""
+        if self._is_cell_dead is None:
+            return self.cells[key]
+        return self.cells[key][~self._is_cell_dead]
+
     def write(self, filename, point_data=None, cell_data=None, field_data=None):
         if self.points.shape[1] == 2:
             n = len(self.points)
@@ -198,10 +1135,17 @@ class _SimplexMesh:
             ), "Only triangles/tetrahedra supported"
             cell_type = "tetra"
 
+        if cell_data is not None and self._is_cell_dead is not None:
+            # one array per cell block
+            cell_data = {
+                key: [np.asarray(v)[~self._is_cell_dead] for v in value]
+                for key, value in cell_data.items()
+            }
+
         meshio.write_points_cells(
             filename,
             a,
-            {cell_type: self.cells["points"]},
+            {cell_type: self._live_cells("points")},
             point_data=point_data,
             cell_data=cell_data,
             field_data=field_data,
@@ -210,7 +1154,14 @@ class _SimplexMesh:
     @property
     def edge_lengths(self):
         if self._edge_lengths is None:
-            self._edge_lengths = np.sqrt(self.ei_dot_ei)
+            e = self.ei_dot_ei
+            out = np.empty_like(e)
+
+            def _compute(blk):
+                np.sqrt(e[..., blk], out=out[..., blk])
+
+            self._run_cell_blocks(_compute)
+            self._edge_lengths = out
         return self._edge_lengths
 
     def get_vertex_mask(self, subdomain=None):
@@ -240,6 +1191,9 @@ class _SimplexMesh:
             # Filter for boundary
             is_inside = is_inside & self.is_boundary_edge
 
+        if self._is_cell_dead is not None:
+            is_inside &= ~self._is_cell_dead
+
         return is_inside
 
     def get_face_mask(self, subdomain):
@@ -262,6 +1216,9 @@ class _SimplexMesh:
             # Filter for boundary
             is_inside = is_inside & self.is_boundary_facet_local
 
+        if self._is_cell_dead is not None:
+            is_inside &= ~self._is_cell_dead
+
         return is_inside
 
     def get_cell_mask(self, subdomain=None):
@@ -279,7 +1236,12 @@ class _SimplexMesh:
         is_in = self.subdomains[subdomain]["vertices"][self.idx_hierarchy]
         # Take `all()` over all axes except the last one (cell_ids).
         n = len(is_in.shape)
-        return np.all(is_in, axis=tuple(range(n - 1)))
+        is_inside = np.all(is_in, axis=tuple(range(n - 1)))
+
+        if self._is_cell_dead is not None:
+            is_inside &= ~self._is_cell_dead
+
+        return is_inside
 
     def _mark_vertices(self, subdomain):
         """Mark faces/edges which are fully in subdomain."""
@@ -1,4 +1,7 @@
 import math
+import mmap
+import struct
+import zipfile
 
 import numpy as np
 
@@ -17,6 +20,27 @@ def get_signed_simplex_volumes(cells, pts):
     return np.linalg.det(p) / math.factorial(n)
 
 
+def get_index_dtype(num_points, num_cells, num_points_per_cell):
+    """The smallest signed integer type which can hold the point, cell, edge, and face
+    indices of a mesh with the given sizes.
+    """
+    # Every cell has at most six edges (tetrahedra); the number of edges and faces is
+    # bounded by that.
+    max_index = max(num_points, num_cells * max(num_points_per_cell, 6))
+    if max_index < np.iinfo(np.int32).max:
+        return np.dtype(np.int32)
+    return np.dtype(np.int64)
+
+
+def is_memory_mapped(a):
+    """Whether the array `a` is (a view into) a memory map."""
+    while a is not None:
+        if isinstance(a, (np.memmap, mmap.mmap)):
+            return True
+        a = getattr(a, "base", None)
+    return False
+
+
 def grp_start_len(a):
     """Given a sorted 1D input array `a`, e.g., [0 0, 1, 2, 3, 4, 4, 4], this routine
     returns the indices where the blocks of equal integers start and how long the blocks
@@ -29,12 +53,62 @@ def grp_start_len(a):
 
 
 def unique_rows(a):
+    """Given a 2D array `a` of nonnegative integers, e.g., the sorted point indices of
+    edges or faces, this routine returns the unique rows (in lexicographical order),
+    the inverse indices, and the counts.
+    """
     # The numpy alternative `np.unique(a, axis=0)` is slow; cf.
-    # <https://github.com/numpy/numpy/issues/11136>.
-    b = np.ascontiguousarray(a).view(np.dtype((np.void, a.dtype.itemsize * a.shape[1])))
-    a_unique, inv, cts = np.unique(b, return_inverse=True, return_counts=True)
-    a_unique = a_unique.view(a.dtype).reshape(-1, a.shape[1])
-    return a_unique, inv, cts
+    # <https://github.com/numpy/numpy/issues/11136>. Sorting a np.void view of the rows
+    # is better, but the byte-wise comparisons are still expensive. Instead, pack each
+    # row into one integer key, `((a0 * n) + a1) * n + a2`, and let numpy sort those.
+    a = np.asarray(a)
+    num_rows, k = a.shape
+    if num_rows == 0:
+        return a.copy(), np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+    assert np.issubdtype(a.dtype, np.integer)
+    assert np.all(a >= 0)
+    n = int(a.max()) + 1
+
+    if n ** k <= 2 ** 64:
+        keys = _pack_rows(a, n)
+        keys_unique, inv, cts = np.unique(keys, return_inverse=True, return_counts=True)
+        a_unique = np.empty((len(keys_unique), k), dtype=a.dtype)
+        for j in reversed(range(k)):
+            a_unique[:, j] = keys_unique % n
+            keys_unique //= n
+        return a_unique, inv.reshape(-1), cts
+
+    # The keys don't fit into 64 bits. Split them into two 64-bit halves (a
+    # poor-man's 128-bit integer) and sort lexicographically.
+    m = 1
+    while n ** (k - m) > 2 ** 64:
+        m += 1
+    assert n ** m <= 2 ** 64, "Rows too long for 128-bit keys."
+    hi = _pack_rows(a[:, :m], n)
+    lo = _pack_rows(a[:, m:], n)
+
+    order = np.lexsort((lo, hi))
+    hi = hi[order]
+    lo = lo[order]
+    is_first = np.empty(num_rows, dtype=bool)
+    is_first[0] = True
+    is_first[1:] = (hi[1:] != hi[:-1]) | (lo[1:] != lo[:-1])
+
+    inv = np.empty(num_rows, dtype=int)
+    inv[order] = np.cumsum(is_first) - 1
+    idx_first = np.flatnonzero(is_first)
+    cts = np.diff(np.append(idx_first, num_rows))
+    return a[order[idx_first]], inv, cts
+
+
+def _pack_rows(a, n):
+    keys = a[:, 0].astype(np.uint64)
+    n = np.uint64(n)
+    for j in range(1, a.shape[1]):
+        keys *= n
+        keys += a[:, j].astype(np.uint64)
+    return keys
 
 
 def compute_tri_areas(ei_dot_ej):
@@ -58,8 +132,10 @@ def compute_tri_areas(ei_dot_ej):
         + ei_dot_ej[1] * ei_dot_ej[2]
     )
     # vol2 is the squared volume, but can be slightly negative if it comes to round-off
-    # errors. Correct those.
-    assert np.all(vol2 > -1.0e-14)
+    # errors. Correct those. The admissible round-off scales with the machine precision
+    # (1.0e-14 for float64).
+    tol = 1.0e-14 * np.finfo(vol2.dtype).eps / np.finfo(np.float64).eps
+    assert np.all(vol2 > -tol)
     vol2[vol2 < 0] = 0.0
     return np.sqrt(vol2)
 
@@ -192,3 +268,133 @@ def compute_triangle_circumcenters(X, cell_partitions):
 
     a = X * alpha[..., None]
     return a[0] + a[1] + a[2]
+
+
+def csr_from_rows(rows, num_rows, values):
+    """Group the entries of the arrays `values` (all of the same length as `rows`) by
+    `rows`. Returns the row offsets and counts, and the grouped values: The entries of
+    row k are `v[offsets[k] : offsets[k] + counts[k]]`. Every row has some spare room
+    (filled with -1) such that entries can be added later on; see csr_update().
+    """
+    counts = np.bincount(rows, minlength=num_rows)
+    capacity = counts + 2 + counts // 4
+    offsets = np.zeros(num_rows + 1, dtype=int)
+    np.cumsum(capacity, out=offsets[1:])
+
+    # The stable sort keeps the entries of each row in their original order.
+    order = np.argsort(rows, kind="stable")
+    rank = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    pos = offsets[rows[order]] + rank
+
+    grouped = []
+    for v in values:
+        a = np.full(offsets[-1], -1, dtype=v.dtype)
+        a[pos] = v[order]
+        grouped.append(a)
+    return offsets, counts, grouped
+
+
+def csr_update(offsets, counts, values, remove_rows, remove_keys, add_rows, add_values):
+    """Update a CSR structure as created by csr_from_rows() in place: Remove the entries
+    with `values[0] == remove_keys` from the rows `remove_rows` and append the entries
+    `add_values` to the rows `add_rows`. Only the affected rows are touched. Returns
+    False (and doesn't change anything) if some row runs out of room.
+    """
+    remove_rows = np.asarray(remove_rows, dtype=int)
+    remove_keys = np.asarray(remove_keys, dtype=np.int64)
+    add_rows = np.asarray(add_rows, dtype=int)
+    rows = np.unique(np.concatenate([remove_rows, add_rows]))
+    c = counts[rows]
+    rank = np.arange(np.sum(c)) - np.repeat(np.cumsum(c) - c, c)
+    pos = np.repeat(offsets[rows], c) + rank
+    old_rows = np.repeat(rows, c)
+
+    # Identify the entries to remove via (unique) integer keys.
+    keys = values[0][pos]
+    m = max(keys.max(initial=0), np.max(remove_keys, initial=0)) + 1
+    is_kept = ~np.isin(
+        old_rows.astype(np.int64) * m + keys,
+        remove_rows.astype(np.int64) * m + remove_keys,
+    )
+
+    new_rows = np.concatenate([old_rows[is_kept], add_rows])
+    order = np.argsort(new_rows, kind="stable")
+    new_rows = new_rows[order]
+    new_counts = np.bincount(np.searchsorted(rows, new_rows), minlength=len(rows))
+    if np.any(new_counts > offsets[rows + 1] - offsets[rows]):
+        return False
+
+    new_values = [
+        np.concatenate([v[pos][is_kept], add_values[k]])[order]
+        for k, v in enumerate(values)
+    ]
+    rank = np.arange(len(new_rows)) - np.repeat(
+        np.cumsum(new_counts) - new_counts, new_counts
+    )
+    new_pos = offsets[new_rows] + rank
+    for k, v in enumerate(values):
+        v[pos] = -1
+        v[new_pos] = new_values[k]
+    counts[rows] = new_counts
+    return True
+
+
+def morton_codes(x):
+    """Positions of the points `x` along a Morton (Z-order) curve through their
+    bounding box, as uint64.
+    """
+    x = np.asarray(x)
+    dim = x.shape[1]
+    num_bits = 64 // dim
+    x_min = np.min(x, axis=0)
+    extent = np.max(x, axis=0) - x_min
+    extent[extent == 0.0] = 1.0
+    # integer coordinates in [0, 2 ** num_bits)
+    ix = ((x - x_min) / extent * (2 ** num_bits - 1)).astype(np.uint64)
+
+    # interleave the bits of the coordinates
+    codes = np.zeros(len(x), dtype=np.uint64)
+    for b in range(num_bits):
+        for k in range(dim):
+            bit = (ix[:, k] >> np.uint64(b)) & np.uint64(1)
+            codes |= bit << np.uint64(b * dim + k)
+    return codes
+
+
+def load_npz(filename, mmap_mode=None):
+    """Read all arrays from an uncompressed .npz file (as written by `np.savez()`)
+    into a dict. As opposed to `np.load()`, which ignores `mmap_mode` for .npz files,
+    the arrays are memory-mapped if `mmap_mode` is given.
+    """
+    out = {}
+    with zipfile.ZipFile(filename) as zf, open(filename, "rb") as f:
+        for info in zf.infolist():
+            key = info.filename[: -len(".npy")]
+            if mmap_mode is None or info.compress_type != zipfile.ZIP_STORED:
+                with zf.open(info) as member:
+                    out[key] = np.lib.format.read_array(member)
+                continue
+            # The array data follows the local file header (30 bytes plus the file
+            # name and the extra field) and the .npy header.
+            f.seek(info.header_offset)
+            header = f.read(30)
+            name_len, extra_len = struct.unpack("<HH", header[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject or len(shape) == 0 or 0 in shape:
+                f.seek(info.header_offset + 30 + name_len + extra_len)
+                out[key] = np.lib.format.read_array(f)
+                continue
+            out[key] = np.memmap(
+                filename,
+                dtype=dtype,
+                mode=mmap_mode,
+                shape=shape,
+                order="F" if fortran_order else "C",
+                offset=f.tell(),
+            ).view(np.ndarray)
+    return out
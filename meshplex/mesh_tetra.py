@@ -1,7 +1,7 @@
 import numpy as np
 
 from .base import _SimplexMesh
-from .helpers import compute_tri_areas, compute_triangle_circumcenters
+from .helpers import compute_tri_areas, compute_triangle_circumcenters, unique_rows
 
 __all__ = ["MeshTetra"]
 
@@ -9,34 +9,141 @@ __all__ = ["MeshTetra"]
 class MeshTetra(_SimplexMesh):
     """Class for handling tetrahedral meshes."""
 
-    def __init__(self, points, cells, sort_cells=False):
-        super().__init__(points, cells, sort_cells=sort_cells)
+    _topology_attributes = _SimplexMesh._topology_attributes + (
+        "edges",
+        "faces",
+        "is_boundary_point",
+        "is_boundary_facet",
+        "is_boundary_facet_local",
+        "_inv_faces",
+    )
+    _geometry_attributes = (
+        "_half_edge_coords",
+        "_edge_lengths",
+        "_ei_dot_ei",
+        "_ei_dot_ej",
+        "_zeta",
+        "_cell_volumes",
+        "_ce_ratios",
+        "_circumcenter_face_distances",
+        "_circumcenters",
+        "_control_volumes",
+        "_cell_centroids",
+    )
+
+    def __init__(
+        self, points, cells, sort_cells=False, index_dtype=None, float_dtype=None
+    ):
+        super().__init__(
+            points,
+            cells,
+            sort_cells=sort_cells,
+            index_dtype=index_dtype,
+            float_dtype=float_dtype,
+        )
 
-        self._half_edge_coords = None
-        self._ei_dot_ei = None
-        self._ei_dot_ej = None
-        self._control_volumes = None
-        self._circumcenters = None
-        self.subdomains = {}
+        # reset all data that changes when point coordinates change
+        self._reset_point_data()
 
-        self.ce_ratios = self._compute_ce_ratios_geometric()
-        # self.ce_ratios = self._compute_ce_ratios_algebraic()
+        self.subdomains = {}
 
         self.is_boundary_point = None
+        self._point_face_cells = None
         self._inv_faces = None
         self.edges = None
         self.is_boundary_facet = None
         self.is_boundary_facet_local = None
         self.faces = None
 
-        self._cell_centroids = None
-
     def __repr__(self):
         num_points = len(self.points)
         num_cells = len(self.cells["points"])
         string = f"<meshplex tetra mesh, {num_points} points, {num_cells} cells>"
         return string
 
+    def _reset_point_data(self):
+        """Reset all data that changes when point coordinates changes."""
+        self._half_edge_coords = None
+        self._edge_lengths = None
+        self._ei_dot_ei = None
+        self._ei_dot_ej = None
+        self._zeta = None
+        self._cell_volumes = None
+        self._ce_ratios = None
+        self._circumcenter_face_distances = None
+        self._circumcenters = None
+        self._control_volumes = None
+        self._cell_centroids = None
+        self._cell_grid = None
+
+    def _update_point_data(self, new_points, idx, cell_ids):
+        """Set the points `idx` to `new_points` and update all cached data of the
+        adjacent cells `cell_ids` in place.
+        """
+        assert (
+            self.points.ndim == 2
+        ), "set_points() with idx does not support batched points"
+        ids = self.cells["points"][cell_ids].reshape(-1)
+        if self._control_volumes is not None:
+            np.subtract.at(
+                self._control_volumes,
+                ids,
+                self._compute_cv_contributions(cell_ids).reshape(-1),
+            )
+
+        self._write_points(new_points, idx)
+        self._update_cell_values(cell_ids)
+
+        if self._control_volumes is not None:
+            np.add.at(
+                self._control_volumes,
+                ids,
+                self._compute_cv_contributions(cell_ids).reshape(-1),
+            )
+
+    def _update_cell_values(self, cell_ids):
+        """Updates all cached cell information for the given cell IDs."""
+        p = self.points[self.cells["points"][cell_ids].T[self.local_idx]]
+        half_edge_coords = p[1] - p[0]
+        ei_dot_ei = np.einsum("...k, ...k->...", half_edge_coords, half_edge_coords)
+        ei_dot_ej = ei_dot_ei - np.sum(ei_dot_ei, axis=0) / 2
+
+        if self._half_edge_coords is not None:
+            self._half_edge_coords[..., cell_ids, :] = half_edge_coords
+
+        if self._ei_dot_ei is not None:
+            self._ei_dot_ei[..., cell_ids] = ei_dot_ei
+
+        if self._ei_dot_ej is not None:
+            self._ei_dot_ej[..., cell_ids] = ei_dot_ej
+
+        if self._edge_lengths is not None:
+            self._edge_lengths[..., cell_ids] = np.sqrt(ei_dot_ei)
+
+        if self._zeta is not None:
+            zeta, cell_volumes, ce_ratios, cfd = self._compute_geometric(ei_dot_ej)
+            self._zeta[:, cell_ids] = zeta
+            self._cell_volumes[cell_ids] = cell_volumes
+            self._ce_ratios[..., cell_ids] = ce_ratios
+            self._circumcenter_face_distances[:, cell_ids] = cfd
+
+            if self._circumcenters is not None:
+                self._circumcenters[cell_ids] = self._compute_cell_circumcenters(
+                    zeta, cell_ids
+                )
+
+        if self._cell_centroids is not None:
+            self._cell_centroids[cell_ids] = self.compute_centroids(cell_ids)
+
+    @property
+    def point_face_cells(self):
+        if self._point_face_cells is None:
+            # Arrange the point_face_cells such that point k is opposite of face k in
+            # each cell.
+            idx = np.array([[1, 2, 3], [2, 3, 0], [3, 0, 1], [0, 1, 2]]).T
+            self._point_face_cells = self.cells["points"].T[idx]
+        return self._point_face_cells
+
     def mark_boundary(self):
         if "faces" not in self.cells:
             self.create_cell_face_relationships()
@@ -53,12 +160,8 @@ class MeshTetra(_SimplexMesh):
         a = np.sort(a[:, :, 0])
 
         # Find the unique faces
-        b = np.ascontiguousarray(a).view(
-            np.dtype((np.void, a.dtype.itemsize * a.shape[1]))
-        )
-        _, idx, inv, cts = np.unique(
-            b, return_index=True, return_inverse=True, return_counts=True
-        )
+        a_unique, inv, cts = unique_rows(a)
+        inv = inv.astype(self.index_dtype)
 
         # No face has more than 2 cells. This assertion fails, for example, if cells are
         # listed twice.
@@ -67,7 +170,7 @@ class MeshTetra(_SimplexMesh):
         self.is_boundary_facet_local = (cts[inv] == 1).reshape(s[2:])
         self.is_boundary_facet = cts == 1
 
-        self.faces = {"points": a[idx]}
+        self.faces = {"points": a_unique}
 
         # cell->faces relationship
         num_cells = len(self.cells["points"])
@@ -80,31 +183,41 @@ class MeshTetra(_SimplexMesh):
         # save for create_edge_cells
         self._inv_faces = inv
 
+    def create_edges(self):
+        """Set up the edge->point relations (via the faces)."""
+        if "faces" not in self.cells:
+            self.create_cell_face_relationships()
+        self.create_face_edge_relationships()
+
     def create_face_edge_relationships(self):
-        a = np.vstack(
-            [
-                self.faces["points"][:, [1, 2]],
-                self.faces["points"][:, [2, 0]],
-                self.faces["points"][:, [0, 1]],
-            ]
+        # Edge k is opposite of point k in each face. Sort the rows such that `unique()`
+        # finds edges which appear in different orientations in different faces.
+        a = np.sort(
+            np.vstack(
+                [
+                    self.faces["points"][:, [1, 2]],
+                    self.faces["points"][:, [2, 0]],
+                    self.faces["points"][:, [0, 1]],
+                ]
+            ),
+            axis=1,
         )
 
         # Find the unique edges
-        b = np.ascontiguousarray(a).view(
-            np.dtype((np.void, a.dtype.itemsize * a.shape[1]))
-        )
-        _, idx, inv = np.unique(b, return_index=True, return_inverse=True)
-        edge_points = a[idx]
+        edge_points, inv, _ = unique_rows(a)
+        inv = inv.astype(self.index_dtype)
 
         self.edges = {"points": edge_points}
+        self._points_edges = None
+        self._points_points = None
 
         # face->edge relationship
         num_faces = len(self.faces["points"])
         face_edges = inv.reshape([3, num_faces]).T
         self.faces["edges"] = face_edges
 
-    def _compute_cell_circumcenters(self):
-        """Computes the center of the circumsphere of each cell."""
+    def _compute_cell_circumcenters(self, zeta, idx):
+        """Computes the center of the circumsphere of the cells `idx`."""
         # Just like for triangular cells, tetrahedron circumcenters are most easily
         # computed with the quadrilateral coordinates available.
         # Luckily, we have the circumcenter-face distances (cfd):
@@ -128,11 +241,8 @@ class MeshTetra(_SimplexMesh):
         #
         # TODO See <https://math.stackexchange.com/a/2864770/36678> for another
         #      interesting approach.
-        alpha = self._zeta / np.sum(self._zeta, axis=0)
-
-        self._circumcenters = np.sum(
-            alpha[None].T * self.points[self.cells["points"]], axis=1
-        )
+        alpha = zeta / np.sum(zeta, axis=0)
+        return np.sum(alpha[None].T * self.points[self.cells["points"][idx]], axis=1)
 
     # Question:
     # We're looking for an explicit expression for the algebraic c/e ratios. Might it be
@@ -159,8 +269,9 @@ class MeshTetra(_SimplexMesh):
     #     A = A ** 2
 
     #     # Compute the RHS  cell_volume * <edge, edge>.
-    #     # The dot product <edge, edge> is also on the diagonals of A (before squaring),
-    #     # but simply computing it again is cheaper than extracting it from A.
+    #     # The dot product <edge, edge> is also on the diagonals of A (before
+    #     # squaring), but simply computing it again is cheaper than extracting it
+    #     # from A.
     #     edge_dot_edge = np.einsum("...i,...j->...", half_edges, half_edges)
     #     # TODO cell_volumes
     #     self.cell_volumes = np.random.rand(2951)
@@ -177,6 +288,19 @@ class MeshTetra(_SimplexMesh):
     #     return ce_ratios
 
     def _compute_ce_ratios_geometric(self):
+        """Compute and cache the covolume/edge length ratios together with the cell
+        volumes and the circumcenter-face distances for all cells.
+        """
+        (
+            self._zeta,
+            self._cell_volumes,
+            self._ce_ratios,
+            self._circumcenter_face_distances,
+        ) = self._compute_geometric(self.ei_dot_ej)
+        return self._ce_ratios
+
+    @staticmethod
+    def _compute_geometric(ei_dot_ej):
         # For triangles, the covolume/edgelength ratios are
         #
         #   [1]   ce_ratios = -<ei, ej> / cell_volume / 4;
@@ -244,8 +368,8 @@ class MeshTetra(_SimplexMesh):
         # (which is the square of the face area). It's funny that there should be no
         # further simplification in zeta/alpha, but nothing has been found here yet.
         #
-        ee = self.ei_dot_ej
-        self._zeta = (
+        ee = ei_dot_ej
+        zeta = (
             -ee[2, [1, 2, 3, 0]] * ee[1] * ee[2]
             - ee[1, [2, 3, 0, 1]] * ee[2] * ee[0]
             - ee[0, [3, 0, 1, 2]] * ee[0] * ee[1]
@@ -254,45 +378,60 @@ class MeshTetra(_SimplexMesh):
 
         # From base.py, but spelled out here since we can avoid one sqrt when computing
         # the c/e ratios for the faces.
-        alpha = (
-            +self.ei_dot_ej[2] * self.ei_dot_ej[0]
-            + self.ei_dot_ej[0] * self.ei_dot_ej[1]
-            + self.ei_dot_ej[1] * self.ei_dot_ej[2]
-        )
-        # face_ce_ratios = -self.ei_dot_ej * 0.25 / face_areas[None]
-        face_ce_ratios_div_face_areas = -self.ei_dot_ej / alpha
+        alpha = ee[2] * ee[0] + ee[0] * ee[1] + ee[1] * ee[2]
+        # face_ce_ratios = -ei_dot_ej * 0.25 / face_areas[None]
+        face_ce_ratios_div_face_areas = -ee / alpha
 
         # TODO Check out the Cayley-Menger determinant
         # <http://mathworld.wolfram.com/Cayley-MengerDeterminant.html
         #
-        # sum(self.circumcenter_face_distances * face_areas / 3) = cell_volumes
+        # sum(circumcenter_face_distances * face_areas / 3) = cell_volumes
         # =>
         # cell_volumes = np.sqrt(sum(zeta / 72))
-        self.cell_volumes = np.sqrt(np.sum(self._zeta, axis=0) / 72.0)
+        cell_volumes = np.sqrt(np.sum(zeta, axis=0) / 72.0)
 
         #
-        # self.circumcenter_face_distances =
-        #    zeta / (24.0 * face_areas) / self.cell_volumes[None]
+        # circumcenter_face_distances =
+        #    zeta / (24.0 * face_areas) / cell_volumes[None]
         # ce_ratios = \
-        #     0.5 * face_ce_ratios * self.circumcenter_face_distances[None],
+        #     0.5 * face_ce_ratios * circumcenter_face_distances[None],
         #
         # so
-        ce_ratios = (
-            self._zeta / 48.0 * face_ce_ratios_div_face_areas / self.cell_volumes[None]
-        )
+        ce_ratios = zeta / 48.0 * face_ce_ratios_div_face_areas / cell_volumes[None]
 
         # Distances of the cell circumcenter to the faces.
         face_areas = 0.5 * np.sqrt(alpha)
-        self.circumcenter_face_distances = (
-            self._zeta / (24.0 * face_areas) / self.cell_volumes[None]
-        )
+        circumcenter_face_distances = zeta / (24.0 * face_areas) / cell_volumes[None]
+
+        return zeta, cell_volumes, ce_ratios, circumcenter_face_distances
+
+    @property
+    def ce_ratios(self):
+        if self._ce_ratios is None:
+            self._compute_ce_ratios_geometric()
+            # self._compute_ce_ratios_algebraic()
+        return self._ce_ratios
 
-        return ce_ratios
+    @property
+    def cell_volumes(self):
+        if self._cell_volumes is None:
+            self._compute_ce_ratios_geometric()
+        return self._cell_volumes
+
+    @property
+    def circumcenter_face_distances(self):
+        if self._circumcenter_face_distances is None:
+            self._compute_ce_ratios_geometric()
+        return self._circumcenter_face_distances
 
     @property
     def cell_circumcenters(self):
         if self._circumcenters is None:
-            self._compute_cell_circumcenters()
+            if self._zeta is None:
+                self._compute_ce_ratios_geometric()
+            self._circumcenters = self._compute_cell_circumcenters(
+                self._zeta, slice(None)
+            )
         return self._circumcenters
 
     @property
@@ -353,10 +492,20 @@ class MeshTetra(_SimplexMesh):
         tetrahedron, times a scaling factor that makes sure the value is 1 for the
         equilateral tetrahedron.
         """
+        out = np.empty(self.cells["points"].shape[0], dtype=self.float_dtype)
+
+        def _compute(blk):
+            out[blk] = self._compute_q_min_sin_dihedral_angles(blk)
+
+        # fa, H2, J2, K2, and the six-term cosines/sines are the temporaries.
+        self._run_cell_blocks(_compute, 32 * self.points.itemsize)
+        return out
+
+    def _compute_q_min_sin_dihedral_angles(self, idx):
         # https://math.stackexchange.com/a/49340/36678
-        fa = compute_tri_areas(self.ei_dot_ej)
+        fa = compute_tri_areas(self.ei_dot_ej[..., idx])
 
-        el2 = self.ei_dot_ei
+        el2 = self.ei_dot_ei[..., idx]
         a = el2[0][0]
         b = el2[1][0]
         c = el2[2][0]
@@ -412,37 +561,39 @@ class MeshTetra(_SimplexMesh):
     def control_volumes(self):
         """Compute the control volumes of all points in the mesh."""
         if self._control_volumes is None:
-            #   1/3. * (0.5 * edge_length) * covolume
-            # = 1/6 * edge_length**2 * ce_ratio_edge_ratio
-            v = self.ei_dot_ei * self.ce_ratios / 6
-            # Explicitly sum up contributions per cell first. Makes np.add.at faster.
-            # For every point k (range(4)), check for which edges k appears in local_idx,
-            # and sum() up the v's from there.
-            vals = np.array(
-                [
-                    v[0, 2] + v[1, 1] + v[2, 3] + v[0, 1] + v[1, 3] + v[2, 2],
-                    v[0, 3] + v[1, 2] + v[2, 0] + v[0, 2] + v[1, 0] + v[2, 3],
-                    v[0, 0] + v[1, 3] + v[2, 1] + v[0, 3] + v[1, 1] + v[2, 0],
-                    v[0, 1] + v[1, 0] + v[2, 2] + v[0, 0] + v[1, 2] + v[2, 1],
-                ]
-            ).T
-            #
+            vals = self._compute_cv_contributions(slice(None))
+            # bincount always sums up in float64
             self._control_volumes = np.bincount(
                 self.cells["points"].reshape(-1),
                 vals.reshape(-1),
                 minlength=len(self.points),
-            )
+            ).astype(self.float_dtype, copy=False)
 
         return self._control_volumes
 
+    def _compute_cv_contributions(self, idx):
+        """The contributions of the cells `idx` to the control volumes of their four
+        points, shape `(num_cells, 4)`.
+        """
+        #   1/3. * (0.5 * edge_length) * covolume
+        # = 1/6 * edge_length**2 * ce_ratio_edge_ratio
+        v = self.ei_dot_ei[..., idx] * self.ce_ratios[..., idx] / 6
+        # Explicitly sum up contributions per cell first. Makes np.add.at faster.
+        # For every point k (range(4)), check for which edges k appears in local_idx,
+        # and sum() up the v's from there.
+        return np.array(
+            [
+                v[0, 2] + v[1, 1] + v[2, 3] + v[0, 1] + v[1, 3] + v[2, 2],
+                v[0, 3] + v[1, 2] + v[2, 0] + v[0, 2] + v[1, 0] + v[2, 3],
+                v[0, 0] + v[1, 3] + v[2, 1] + v[0, 3] + v[1, 1] + v[2, 0],
+                v[0, 1] + v[1, 0] + v[2, 2] + v[0, 0] + v[1, 2] + v[2, 1],
+            ]
+        ).T
+
     def num_delaunay_violations(self):
         # Delaunay violations are present exactly on the interior faces where the sum of
         # the signed distances between face circumcenter and tetrahedron circumcenter is
         # negative.
-        if self.circumcenter_face_distances is None:
-            self._compute_ce_ratios_geometric()
-            # self._compute_ce_ratios_algebraic()
-
         if "faces" not in self.cells:
             self.create_cell_face_relationships()
 
@@ -469,12 +620,9 @@ class MeshTetra(_SimplexMesh):
         # "It is not currently possible to manually set the aspect on 3D axes"
         # plt.axis("equal")
 
-        if self._circumcenters is None:
-            self._compute_cell_circumcenters()
-
         X = self.points
         for cell_id in range(len(self.cells["points"])):
-            cc = self._circumcenters[cell_id]
+            cc = self.cell_circumcenters[cell_id]
             #
             x = X[self.point_face_cells[..., [cell_id]]]
             # TODO replace `self.ei_dot_ei * self.ei_dot_ej` with cell_partitions
@@ -557,7 +705,7 @@ class MeshTetra(_SimplexMesh):
         # circumcenters
         X = self.points
         for cell_id in adj_cell_ids:
-            cc = self._circumcenters[cell_id]
+            cc = self.cell_circumcenters[cell_id]
             #
             x = X[self.point_face_cells[..., [cell_id]]]
             # TODO replace `self.ei_dot_ei * self.ei_dot_ej` with cell_partitions
@@ -582,7 +730,7 @@ class MeshTetra(_SimplexMesh):
                 )
 
         # draw the cell circumcenters
-        cc = self._circumcenters[adj_cell_ids]
+        cc = self.cell_circumcenters[adj_cell_ids]
         ax.plot(cc[:, 0], cc[:, 1], cc[:, 2], "ro")
         return
 
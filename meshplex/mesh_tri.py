@@ -8,6 +8,7 @@ from .helpers import (
     compute_ce_ratios,
     compute_tri_areas,
     compute_triangle_circumcenters,
+    csr_update,
     grp_start_len,
     unique_rows,
 )
@@ -18,9 +19,55 @@ __all__ = ["MeshTri"]
 class MeshTri(_SimplexMesh):
     """Class for handling triangular meshes."""
 
-    def __init__(self, points, cells, sort_cells=False):
-        """Initialization."""
-        super().__init__(points, cells, sort_cells=sort_cells)
+    _topology_attributes = _SimplexMesh._topology_attributes + (
+        "edges",
+        "_is_interior_point",
+        "_is_boundary_point",
+        "_is_boundary_edge_local",
+        "_is_boundary_edge",
+        "_is_boundary_cell",
+        "_edges_cells",
+        "_edges_cells_idx",
+        "_boundary_edges",
+        "_interior_edges",
+        "_is_point_used",
+    )
+    _geometry_attributes = (
+        "_half_edge_coords",
+        "_edge_lengths",
+        "_ei_dot_ei",
+        "_ei_dot_ej",
+        "_cell_volumes",
+        "_ce_ratios",
+        "_cell_circumcenters",
+        "_interior_ce_ratios",
+        "_control_volumes",
+        "_cv_cell_mask",
+        "_cell_partitions",
+        "_cv_centroids",
+        "_cvc_cell_mask",
+        "_signed_cell_areas",
+        "_cell_centroids",
+    )
+
+    def __init__(
+        self, points, cells, sort_cells=False, index_dtype=None, float_dtype=None
+    ):
+        """Initialization.
+
+        The connectivity is stored with the integer type `index_dtype`, by default
+        int32 if the indices fit and int64 otherwise. Memory-mapped cells (e.g., from
+        `np.load(..., mmap_mode="r")` or `load_state()`) keep their integer type by
+        default, so they aren't read into memory. The geometric quantities are computed
+        in `float_dtype`, by default float64.
+        """
+        super().__init__(
+            points,
+            cells,
+            sort_cells=sort_cells,
+            index_dtype=index_dtype,
+            float_dtype=float_dtype,
+        )
 
         # reset all data that changes when point coordinates change
         self._reset_point_data()
@@ -39,9 +86,17 @@ class MeshTri(_SimplexMesh):
         self._interior_edges = None
         self._is_point_used = None
 
+        self._num_dead_cells = 0
+        # The number of (non-removed) cells each point belongs to. Only needed for
+        # updating the point flags in remove_cells().
+        self._num_point_cells = None
+        # Removed cells are only marked as such until their fraction exceeds this value
+        # or compact_cells() is called. The default 0.0 compacts right away.
+        self.max_dead_fraction = 0.0
+
     def __repr__(self):
-        num_points = len(self.points)
-        num_cells = len(self.cells["points"])
+        num_points = self.points.shape[-2]
+        num_cells = len(self.cells["points"]) - self._num_dead_cells
         string = f"<meshplex triangle mesh, {num_points} points, {num_cells} cells>"
         return string
 
@@ -61,17 +116,18 @@ class MeshTri(_SimplexMesh):
         self._cvc_cell_mask = None
         self._signed_cell_areas = None
         self._cell_centroids = None
+        self._cell_grid = None
 
     @property
     def euler_characteristic(self):
         # number of vertices - number of edges + number of faces
         if "edges" not in self.cells:
             self.create_edges()
-        return (
-            self.points.shape[0]
-            - self.edges["points"].shape[0]
-            + self.cells["points"].shape[0]
-        )
+        num_edges = self.edges["points"].shape[0]
+        if self._is_edge_dead is not None:
+            num_edges -= np.sum(self._is_edge_dead)
+        num_cells = self.cells["points"].shape[0] - self._num_dead_cells
+        return self.points.shape[-2] - num_edges + num_cells
 
     @property
     def genus(self):
@@ -81,149 +137,298 @@ class MeshTri(_SimplexMesh):
     @property
     def cell_volumes(self):
         if self._cell_volumes is None:
-            self._cell_volumes = compute_tri_areas(self.ei_dot_ej)
+            e = self.ei_dot_ej
+            out = np.empty(e.shape[1:], dtype=e.dtype)
+
+            def _compute(blk):
+                out[..., blk] = compute_tri_areas(e[..., blk])
+
+            self._run_cell_blocks(_compute, 2 * 3 * e.itemsize)
+            self._cell_volumes = out
         return self._cell_volumes
 
     @property
     def ce_ratios(self):
         if self._ce_ratios is None:
-            self._ce_ratios = compute_ce_ratios(self.ei_dot_ej, self.cell_volumes)
+            e = self.ei_dot_ej
+            vols = self.cell_volumes
+            out = np.empty_like(e)
+
+            def _compute(blk):
+                out[..., blk] = compute_ce_ratios(e[..., blk], vols[..., blk])
+
+            self._run_cell_blocks(_compute, 3 * e.itemsize)
+            self._ce_ratios = out
         return self._ce_ratios
 
     def remove_cells(self, remove_array):
         """Remove cells and take care of all the dependent data structures. The input
         argument `remove_array` can be a boolean array or a list of indices.
+
+        The cells are first only marked as removed; all mesh queries disregard them
+        from then on. They are actually taken out of the arrays (and the cells and
+        edges renumbered) by `compact_cells()`, which happens automatically as soon as
+        the fraction of removed cells exceeds `max_dead_fraction`.
+        """
+        assert self.points.ndim == 2, "remove_cells() does not support batched points"
+        num_removed = self._remove_cells(remove_array)
+        self._compact_cells_if_needed()
+        return num_removed
+
+    def _compact_cells_if_needed(self):
+        num_cells = len(self.cells["points"])
+        if self._num_dead_cells > self.max_dead_fraction * num_cells:
+            self.compact_cells()
+
+    def _remove_cells(self, remove_array):
+        """Mark cells as removed and update the boundary data and the edge->cells
+        relations accordingly. The cost is proportional to the number of removed cells
+        (plus the number of boundary edges), not to the size of the mesh.
         """
-        # Although this method doesn't compute anything new, the reorganization of the
-        # data structure is fairly expensive. This is mostly due to the fact that mask
-        # copies like `a[mask]` take long if `a` is large, even if `mask` is True almost
-        # everywhere.
-        # Keep an eye on <https://stackoverflow.com/q/65035280/353337> for possible
-        # workarounds.
         remove_array = np.asarray(remove_array)
         if len(remove_array) == 0:
             return 0
 
-        if remove_array.dtype == int:
-            keep = np.ones(len(self.cells["points"]), dtype=bool)
-            keep[remove_array] = False
+        num_cells = len(self.cells["points"])
+        if np.issubdtype(remove_array.dtype, np.integer):
+            cell_ids = np.unique(remove_array)
         else:
             assert remove_array.dtype == bool
-            keep = ~remove_array
-
-        assert len(keep) == len(self.cells["points"]), "Wrong length of index array."
+            assert len(remove_array) == num_cells, "Wrong length of index array."
+            cell_ids = np.where(remove_array)[0]
 
-        if np.all(keep):
+        if self._is_cell_dead is not None:
+            # skip cells which have been removed before
+            cell_ids = cell_ids[~self._is_cell_dead[cell_ids]]
+        if len(cell_ids) == 0:
             return 0
 
-        # handle edges; this is a bit messy
+        # The contributions of the removed cells to the control volumes must be taken
+        # before the cells are marked.
+        old_contribs = self._get_cv_contributions(cell_ids)
+
+        if self._cells_neighbors is not None:
+            neighbor_ids = np.unique(self._cells_neighbors[cell_ids])
+            neighbor_ids = neighbor_ids[neighbor_ids >= 0]
+
         if "edges" in self.cells:
-            # updating the boundary data is a lot easier with edges_cells
+            # updating the boundary data is a lot easier with edges_cells; make sure
+            # it's there before any cells are marked
             if self._edges_cells is None:
                 self._compute_edges_cells()
+            ec_idx = self.edges_cells_idx
 
-            # Set edge to is_boundary_edge_local=True if it is adjacent to a removed
-            # cell.
-            edge_ids = self.cells["edges"][~keep].flatten()
-            # only consider interior edges
-            edge_ids = edge_ids[self.is_interior_edge[edge_ids]]
-            idx = self.edges_cells_idx[edge_ids]
-            cell_id = self.edges_cells["interior"][1:3, idx].T
-            local_edge_id = self.edges_cells["interior"][3:5, idx].T
-            self._is_boundary_edge_local[local_edge_id, cell_id] = True
-            # now remove the entries corresponding to the removed cells
-            self._is_boundary_edge_local = self._is_boundary_edge_local[:, keep]
+        if self._is_cell_dead is None:
+            self._is_cell_dead = np.zeros(num_cells, dtype=bool)
+        self._is_cell_dead[cell_ids] = True
+        self._num_dead_cells += len(cell_ids)
+
+        # handle edges; this is a bit messy
+        if "edges" in self.cells:
+            ec = self._edges_cells
+            edge_gids, counts = np.unique(
+                self.cells["edges"][cell_ids], return_counts=True
+            )
+            idx = ec_idx[edge_gids]
+            is_boundary = self._is_boundary_edge[edge_gids]
+            # An interior edge with one removed cell becomes a boundary edge. All other
+            # edges adjacent to removed cells (boundary edges, interior edges with two
+            # removed cells) are removed.
+            is_new_boundary = ~is_boundary & (counts == 1)
+
+            # find the remaining cell of the new boundary edges
+            ec_new = ec["interior"][:, idx[is_new_boundary]]
+            is_first_removed = self._is_cell_dead[ec_new[1]]
+            cell_id = np.where(is_first_removed, ec_new[2], ec_new[1])
+            local_edge_id = np.where(is_first_removed, ec_new[4], ec_new[3])
 
+            self._is_boundary_edge_local[local_edge_id, cell_id] = True
+            self._is_boundary_edge_local[:, cell_ids] = False
             if self._is_boundary_cell is not None:
                 self._is_boundary_cell[cell_id] = True
-                self._is_boundary_cell = self._is_boundary_cell[keep]
-
-            # update edges_cells
-            keep_b_ec = keep[self.edges_cells["boundary"][1]]
-            keep_i_ec0, keep_i_ec1 = keep[self.edges_cells["interior"][1:3]]
-            # move ec from interior to boundary if exactly one of the two adjacent cells
-            # was removed
+                self._is_boundary_cell[cell_ids] = False
 
-            keep_i_0 = keep_i_ec0 & ~keep_i_ec1
-            keep_i_1 = keep_i_ec1 & ~keep_i_ec0
-            self._edges_cells["boundary"] = np.array(
+            # update edges_cells: drop the removed boundary edges and append the new
+            # ones
+            keep_b = np.ones(ec["boundary"].shape[1], dtype=bool)
+            keep_b[idx[is_boundary]] = False
+            ec["boundary"] = np.concatenate(
                 [
-                    # edge id
-                    np.concatenate(
-                        [
-                            self._edges_cells["boundary"][0, keep_b_ec],
-                            self._edges_cells["interior"][0, keep_i_0],
-                            self._edges_cells["interior"][0, keep_i_1],
-                        ]
-                    ),
-                    # cell id
-                    np.concatenate(
-                        [
-                            self._edges_cells["boundary"][1, keep_b_ec],
-                            self._edges_cells["interior"][1, keep_i_0],
-                            self._edges_cells["interior"][2, keep_i_1],
-                        ]
-                    ),
-                    # local edge id
-                    np.concatenate(
-                        [
-                            self._edges_cells["boundary"][2, keep_b_ec],
-                            self._edges_cells["interior"][3, keep_i_0],
-                            self._edges_cells["interior"][4, keep_i_1],
-                        ]
-                    ),
-                ]
+                    ec["boundary"][:, keep_b],
+                    np.array([edge_gids[is_new_boundary], cell_id, local_edge_id]),
+                ],
+                axis=1,
+            )
+            ec_idx[ec["boundary"][0]] = np.arange(ec["boundary"].shape[1])
+            self._remove_interior_edges_cells(idx[~is_boundary])
+
+            is_edge_removed = ~is_new_boundary
+            self._is_boundary_edge[edge_gids[is_new_boundary]] = True
+            self._is_boundary_edge[edge_gids[is_edge_removed]] = False
+            if self._is_edge_dead is None:
+                self._is_edge_dead = np.zeros(len(self._is_boundary_edge), dtype=bool)
+            self._is_edge_dead[edge_gids[is_edge_removed]] = True
+            removed_edge_gids = edge_gids[is_edge_removed]
+            self._update_points_edges(
+                removed_edge_gids, self.edges["points"][removed_edge_gids], None
             )
 
-            keep_i = keep_i_ec0 & keep_i_ec1
-
-            # this memory copy isn't too fast
-            self._edges_cells["interior"] = self._edges_cells["interior"][:, keep_i]
+            # simply set those to None; their reset is cheap
+            self._boundary_edges = None
+            self._interior_edges = None
 
-            num_edges_old = len(self.edges["points"])
-            adjacent_edges, counts = np.unique(
-                self.cells["edges"][~keep].flat, return_counts=True
-            )
-            # remove edge entirely either if 2 adjacent cells are removed or if it is a
-            # boundary edge and 1 adjacent cells are removed
-            is_edge_removed = (counts == 2) | (
-                (counts == 1) & self._is_boundary_edge[adjacent_edges]
+        self._update_points_cells(cell_ids, self.cells["points"][cell_ids], None)
+
+        # The point location grid skips removed cells, but the cached transfer()
+        # matrices would still interpolate from them.
+        if self._cell_grid is not None:
+            self._cell_grid.pop("transfer", None)
+
+        if self._cells_neighbors is not None:
+            self._cells_neighbors[cell_ids] = -1
+            neighbor_ids = neighbor_ids[~self._is_cell_dead[neighbor_ids]]
+            self._update_cells_neighbors(neighbor_ids)
+
+        # The removed cells are disregarded in the control volumes from now on; take
+        # their contributions out.
+        if self._cv_cell_mask is not None:
+            self._cv_cell_mask[cell_ids] = True
+        if self._cvc_cell_mask is not None:
+            self._cvc_cell_mask[cell_ids] = True
+        # (The point flags come first; they keep the number of cells per point which
+        # the control volume update needs.)
+        self._update_point_flags(cell_ids)
+        self._update_control_volumes(old_contribs, self._get_cv_contributions(cell_ids))
+
+        return len(cell_ids)
+
+    def _update_point_flags(self, cell_ids):
+        """Update the cached point flags (and the number of cells per point) after the
+        removal of the cells `cell_ids`.
+        """
+        if (
+            self._is_point_used is None
+            and self._is_boundary_point is None
+            and self._is_interior_point is None
+            and self._control_volumes is None
+        ):
+            return
+
+        point_ids = self.cells["points"][cell_ids].reshape(-1)
+        if self._num_point_cells is None:
+            self._num_point_cells = np.bincount(
+                self._live_cells("points").reshape(-1), minlength=self.points.shape[-2]
             )
+        else:
+            np.subtract.at(self._num_point_cells, point_ids, 1)
+        is_used = self._num_point_cells[point_ids] > 0
+
+        if self._is_point_used is not None:
+            self._is_point_used[point_ids[~is_used]] = False
+        # The points of the removed cells are either not used anymore or on the
+        # boundary: Each point which still has adjacent cells now has a boundary edge
+        # between one of those and a removed cell.
+        if self._is_boundary_point is not None:
+            self._is_boundary_point[point_ids] = is_used
+        if self._is_interior_point is not None:
+            self._is_interior_point[point_ids] = False
+
+    def _remove_interior_edges_cells(self, idx):
+        """Remove the columns `idx` from edges_cells["interior"] (and the interior
+        ce-ratios) by moving the last columns into the gaps. As opposed to a mask copy,
+        this doesn't touch the other columns.
+        """
+        ec = self._edges_cells["interior"]
+        n = ec.shape[1]
+        m = n - len(idx)
+        gaps = idx[idx < m]
+        fill = np.setdiff1d(np.arange(m, n), idx, assume_unique=True)
+        ec[:, gaps] = ec[:, fill]
+        self._edges_cells["interior"] = ec[:, :m]
+        self._edges_cells_idx[ec[0, gaps]] = gaps
+        if self._interior_ce_ratios is not None:
+            self._interior_ce_ratios[gaps] = self._interior_ce_ratios[fill]
+            self._interior_ce_ratios = self._interior_ce_ratios[:m]
 
-            # set the new boundary edges
-            self._is_boundary_edge[adjacent_edges[~is_edge_removed]] = True
-            # Now actually remove the edges. This includes a reindexing.
-            assert self._is_boundary_edge is not None
-            keep_edges = np.ones(len(self._is_boundary_edge), dtype=bool)
-            keep_edges[adjacent_edges[is_edge_removed]] = False
+    def compact_cells(self):
+        """Take the cells (and edges) which were marked by remove_cells() out of the
+        arrays. This renumbers the cells and edges.
+        """
+        # Although this method doesn't compute anything new, the reorganization of the
+        # data structure is fairly expensive. This is mostly due to the fact that mask
+        # copies like `a[mask]` take long if `a` is large, even if `mask` is True almost
+        # everywhere.
+        # Keep an eye on <https://stackoverflow.com/q/65035280/353337> for possible
+        # workarounds.
+        if self._is_cell_dead is None:
+            return
+
+        keep = ~self._is_cell_dead
+        num_cells_old = len(keep)
+        new_index_cells = np.arange(num_cells_old, dtype=self.index_dtype) - np.cumsum(
+            ~keep, dtype=self.index_dtype
+        )
+
+        if "edges" in self.cells:
+            ec = self._edges_cells
+            if self._is_edge_dead is None:
+                keep_edges = np.ones(len(self._is_boundary_edge), dtype=bool)
+            else:
+                keep_edges = ~self._is_edge_dead
+
+            # Restore the order of the interior edges in edges_cells (and the interior
+            # ce-ratios), i.e., sort them by edge id.
+            perm = self.edges_cells_idx[np.where(self.is_interior_edge)[0]]
+            ec["interior"] = ec["interior"][:, perm]
+            if self._interior_ce_ratios is not None:
+                self._interior_ce_ratios = self._interior_ce_ratios[perm]
 
             # make sure there is only edges["points"], not edges["cells"] etc.
             assert self.edges is not None
             assert len(self.edges) == 1
             self.edges["points"] = self.edges["points"][keep_edges]
             self._is_boundary_edge = self._is_boundary_edge[keep_edges]
+            self._is_boundary_edge_local = self._is_boundary_edge_local[:, keep]
+            if self._is_boundary_cell is not None:
+                self._is_boundary_cell = self._is_boundary_cell[keep]
 
             # update edge and cell indices
-            self.cells["edges"] = self.cells["edges"][keep]
-            new_index_edges = np.arange(num_edges_old) - np.cumsum(~keep_edges)
-            self.cells["edges"] = new_index_edges[self.cells["edges"]]
-            num_cells_old = len(self.cells["points"])
-            new_index_cells = np.arange(num_cells_old) - np.cumsum(~keep)
+            num_edges_old = len(keep_edges)
+            new_index_edges = np.arange(
+                num_edges_old, dtype=self.index_dtype
+            ) - np.cumsum(~keep_edges, dtype=self.index_dtype)
+            self.cells["edges"] = new_index_edges[self.cells["edges"][keep]]
 
             # this takes fairly long
-            ec = self._edges_cells
             ec["boundary"][0] = new_index_edges[ec["boundary"][0]]
             ec["boundary"][1] = new_index_cells[ec["boundary"][1]]
             ec["interior"][0] = new_index_edges[ec["interior"][0]]
             ec["interior"][1:3] = new_index_cells[ec["interior"][1:3]]
 
+            if self._points_edges is not None:
+                ids = self._points_edges["ids"]
+                is_set = ids >= 0
+                ids[is_set] = new_index_edges[ids[is_set]]
+
             # simply set those to None; their reset is cheap
             self._edges_cells_idx = None
             self._boundary_edges = None
             self._interior_edges = None
 
         self.cells["points"] = self.cells["points"][keep]
-        self.idx_hierarchy = self.idx_hierarchy[..., keep]
+        if self._idx_hierarchy is not None:
+            self._idx_hierarchy = self._idx_hierarchy[..., keep]
+
+        if self._points_cells is not None:
+            ids = self._points_cells["ids"]
+            is_set = ids >= 0
+            ids[is_set] = new_index_cells[ids[is_set]]
+
+        if self._cells_neighbors is not None:
+            neighbors = self._cells_neighbors[keep]
+            is_set = neighbors >= 0
+            neighbors[is_set] = new_index_cells[neighbors[is_set]]
+            self._cells_neighbors = neighbors
 
         if self._cell_volumes is not None:
             self._cell_volumes = self._cell_volumes[keep]
@@ -240,6 +445,9 @@ class MeshTri(_SimplexMesh):
         if self._ei_dot_ei is not None:
             self._ei_dot_ei = self._ei_dot_ei[:, keep]
 
+        if self._edge_lengths is not None:
+            self._edge_lengths = self._edge_lengths[:, keep]
+
         if self._cell_centroids is not None:
             self._cell_centroids = self._cell_centroids[keep]
 
@@ -252,17 +460,21 @@ class MeshTri(_SimplexMesh):
         if self._signed_cell_areas is not None:
             self._signed_cell_areas = self._signed_cell_areas[keep]
 
-        # TODO These could also be updated, but let's implement it when needed
-        self._interior_ce_ratios = None
-        self._control_volumes = None
-        self._cv_cell_mask = None
-        self._cv_centroids = None
-        self._cvc_cell_mask = None
-        self._is_point_used = None
-        self._is_interior_point = None
-        self._is_boundary_point = None
+        # The control volumes don't change; the removed cells are part of the cell
+        # masks they were computed with.
+        if self._cv_cell_mask is not None:
+            self._cv_cell_mask = self._cv_cell_mask[keep]
 
-        return np.sum(~keep)
+        if self._cvc_cell_mask is not None:
+            self._cvc_cell_mask = self._cvc_cell_mask[keep]
+
+        # the cell ids in the point location grid and the Laplacian are outdated
+        self._cell_grid = None
+        self._matrix_pattern = None
+
+        self._is_cell_dead = None
+        self._is_edge_dead = None
+        self._num_dead_cells = 0
 
     def remove_boundary_cells(self, criterion):
         """Helper method for removing cells along the boundary.
@@ -281,14 +493,317 @@ class MeshTri(_SimplexMesh):
                 break
             idx = self.is_boundary_cell.copy()
             idx[idx] = crit
-            n = self.remove_cells(idx)
+            # Don't compact the arrays after every layer of cells, but only once at
+            # the end.
+            n = self._remove_cells(idx)
             num_removed += n
             if n == 0:
                 break
+        self._compact_cells_if_needed()
         return num_removed
 
+    def add_points(self, new_points):
+        """Append points to the mesh and return their indices. The points don't belong
+        to any cell yet; see add_cells().
+        """
+        assert self.points.ndim == 2, "add_points() does not support batched points"
+        new_points = np.asarray(new_points, dtype=self.float_dtype)
+        assert new_points.shape[1:] == self.points.shape[1:]
+        n = len(self.points)
+        k = len(new_points)
+
+        points = self._grow("points", self._points, k)
+        points[n:] = new_points
+        points.setflags(write=False)
+        self._points = points
+        self._points_version += 1
+
+        # the new points don't have a control volume yet (which gives NaN centroids)
+        for name, value in [
+            ("_control_volumes", 0.0),
+            ("_cv_centroids", np.nan),
+            ("_is_point_used", False),
+            ("_is_boundary_point", False),
+            ("_is_interior_point", False),
+            ("_num_point_cells", 0),
+        ]:
+            a = getattr(self, name)
+            if a is not None:
+                a = self._grow(name, a, k)
+                a[n:] = value
+                setattr(self, name, a)
+
+        # The subdomains are point masks; simply mark them again when needed. Likewise
+        # for the point adjacency and the matrix pattern.
+        self.subdomains = {}
+        self._points_cells = None
+        self._points_edges = None
+        self._points_points = None
+        self._matrix_pattern = None
+
+        return np.arange(n, n + k, dtype=self.index_dtype)
+
+    def add_cells(self, new_cells):
+        """Append cells to the mesh and return their indices. The cells may only
+        consist of existing points (see add_points()) and only share edges with the
+        boundary of the mesh. All data which is already computed is updated in place.
+        The arrays are allocated with spare capacity, so repeated insertions don't
+        reallocate every time.
+        """
+        assert self.points.ndim == 2, "add_cells() does not support batched points"
+        new_cells = np.asarray(new_cells, dtype=self.index_dtype)
+        assert (
+            len(new_cells.shape) == 2 and new_cells.shape[1] == 3
+        ), f"Illegal cells shape {new_cells.shape}"
+        assert np.all((new_cells >= 0) & (new_cells < len(self.points)))
+        n = len(self.cells["points"])
+        k = len(new_cells)
+        cell_ids = np.arange(n, n + k, dtype=self.index_dtype)
+        if k == 0:
+            return cell_ids
+
+        if "edges" in self.cells:
+            # updating the boundary data is a lot easier with edges_cells; make sure
+            # it's there before anything is changed
+            if self._edges_cells is None:
+                self._compute_edges_cells()
+            assert self.edges_cells_idx is not None
+
+        # The control volume contributions of the new cells are added below. Take the
+        # (empty) contributions here to get the cached centroids checked.
+        old_contribs = self._get_cv_contributions(cell_ids[:0])
+
+        self.cells["points"] = self._grow("cells:points", self.cells["points"], k)
+        self.cells["points"][n:] = new_cells
+        # idx_hierarchy and all other cell data are set by _update_cell_values()
+        if self._idx_hierarchy is not None:
+            self._idx_hierarchy = self._grow(
+                "idx_hierarchy", self._idx_hierarchy, k, -1
+            )
+        for name, axis in [
+            ("_half_edge_coords", 1),
+            ("_ei_dot_ei", 1),
+            ("_ei_dot_ej", 1),
+            ("_edge_lengths", 1),
+            ("_cell_volumes", 0),
+            ("_ce_ratios", 1),
+            ("_cell_partitions", 1),
+            ("_cell_circumcenters", 0),
+            ("_cell_centroids", 0),
+            ("_signed_cell_areas", 0),
+            ("_is_boundary_cell", 0),
+        ]:
+            a = getattr(self, name)
+            if a is not None:
+                setattr(self, name, self._grow(name, a, k, axis))
+        for name, value in [
+            ("_is_cell_dead", False),
+            ("_cv_cell_mask", False),
+            ("_cvc_cell_mask", False),
+            ("_cells_neighbors", -1),
+        ]:
+            a = getattr(self, name)
+            if a is not None:
+                a = self._grow(name, a, k)
+                a[n:] = value
+                setattr(self, name, a)
+
+        if "edges" in self.cells:
+            self._add_cells_edges(cell_ids)
+            self._update_cells_neighbors(cell_ids)
+
+        # simply set those to None; they're recomputed when needed
+        self._points_cells = None
+        self._points_edges = None
+        self._points_points = None
+        self._cell_grid = None
+        self._matrix_pattern = None
+
+        # The control volume update needs the number of cells per point.
+        point_ids = new_cells.reshape(-1)
+        if self._num_point_cells is not None:
+            np.add.at(self._num_point_cells, point_ids, 1)
+
+        self._update_cell_values(cell_ids)
+        self._update_control_volumes(old_contribs, self._get_cv_contributions(cell_ids))
+
+        # update the point flags
+        if self._is_point_used is not None:
+            self._is_point_used[point_ids] = True
+        if self._is_boundary_point is not None or self._is_interior_point is not None:
+            # The points of the new cells are on the boundary if they're part of a
+            # boundary edge.
+            boundary_points = self.edges["points"][self.edges_cells["boundary"][0]]
+            is_boundary = np.isin(point_ids, boundary_points)
+            if self._is_boundary_point is not None:
+                self._is_boundary_point[point_ids] = is_boundary
+            if self._is_interior_point is not None:
+                self._is_interior_point[point_ids] = ~is_boundary
+
+        return cell_ids
+
+    def _add_cells_edges(self, cell_ids):
+        """Set up the edges of the new cells `cell_ids` and update the edge->cells
+        relations and the boundary flags. The edges of the new cells are matched
+        against the boundary edges; the cost doesn't depend on the size of the mesh
+        otherwise.
+        """
+        n = cell_ids[0]
+        k = len(cell_ids)
+        num_points = len(self.points)
+        num_edges = len(self.edges["points"])
+        ec = self._edges_cells
+
+        # the local edges of the new cells (edge j opposite of point j)
+        a = np.sort(self.cells["points"][cell_ids][:, self.local_idx.T], axis=2)
+        a_unique, inv, cts = unique_rows(a.reshape(-1, 2))
+        assert np.all(cts < 3), "No edge has more than 2 cells."
+
+        # Find the edges which already exist. Only boundary edges can be shared with
+        # the new cells. Compare the edges via (unique) integer keys.
+        b = np.sort(self.edges["points"][ec["boundary"][0]], axis=1)
+        b_keys = b[:, 0].astype(np.int64) * num_points + b[:, 1]
+        keys = a_unique[:, 0].astype(np.int64) * num_points + a_unique[:, 1]
+        is_existing = np.zeros(len(keys), dtype=bool)
+        b_idx = np.zeros(len(keys), dtype=int)
+        if len(b_keys) > 0:
+            b_order = np.argsort(b_keys)
+            pos = np.searchsorted(b_keys, keys, sorter=b_order)
+            b_idx = b_order[np.minimum(pos, len(b_keys) - 1)]
+            is_existing = b_keys[b_idx] == keys
+        b_idx = b_idx[is_existing]
+        assert np.all(cts[is_existing] == 1), "No edge has more than 2 cells."
+
+        # The new cells mustn't share interior edges with the mesh. Only edges between
+        # two points which already belong to cells can be interior edges; the point
+        # flags aren't updated for the new cells yet.
+        is_candidate = ~is_existing
+        if self._is_point_used is not None:
+            is_candidate &= np.all(self._is_point_used[a_unique], axis=1)
+        elif self._num_point_cells is not None:
+            is_candidate &= np.all(self._num_point_cells[a_unique] > 0, axis=1)
+        if np.any(is_candidate):
+            c = np.sort(self.edges["points"][ec["interior"][0]], axis=1)
+            c_keys = c[:, 0].astype(np.int64) * num_points + c[:, 1]
+            assert not np.any(
+                np.isin(keys[is_candidate], c_keys)
+            ), "New cells can only share boundary edges with the mesh."
+
+        num_new_edges = len(keys) - np.sum(is_existing)
+        edge_gids = np.empty(len(keys), dtype=self.index_dtype)
+        edge_gids[is_existing] = ec["boundary"][0, b_idx]
+        edge_gids[~is_existing] = np.arange(num_edges, num_edges + num_new_edges)
+        is_boundary = ~is_existing & (cts == 1)
+
+        # cell->edges relationship
+        self.cells["edges"] = self._grow("cells:edges", self.cells["edges"], k)
+        self.cells["edges"][n:] = edge_gids[inv].reshape(k, 3)
+
+        # the new edges
+        assert len(self.edges) == 1
+        self.edges["points"] = self._grow(
+            "edges:points", self.edges["points"], num_new_edges
+        )
+        self.edges["points"][num_edges:] = a_unique[~is_existing]
+        self._is_boundary_edge = self._grow(
+            "_is_boundary_edge", self._is_boundary_edge, num_new_edges
+        )
+        self._is_boundary_edge[num_edges:] = is_boundary[~is_existing]
+        # the existing boundary edges are interior edges now
+        self._is_boundary_edge[edge_gids[is_existing]] = False
+        if self._is_edge_dead is not None:
+            self._is_edge_dead = self._grow(
+                "_is_edge_dead", self._is_edge_dead, num_new_edges
+            )
+            self._is_edge_dead[num_edges:] = False
+
+        # the boundary flags of the cells
+        self._is_boundary_edge_local = self._grow(
+            "_is_boundary_edge_local", self._is_boundary_edge_local, k, 1
+        )
+        self._is_boundary_edge_local[:, n:] = is_boundary[inv].reshape(k, 3).T
+        adj_cell_ids = ec["boundary"][1, b_idx]
+        self._is_boundary_edge_local[ec["boundary"][2, b_idx], adj_cell_ids] = False
+        if self._is_boundary_cell is not None:
+            self._is_boundary_cell[adj_cell_ids] = np.any(
+                self._is_boundary_edge_local[:, adj_cell_ids], axis=0
+            )
+
+        # For each edge, find the first and the last of the new cells it belongs to
+        # (and its local index there).
+        j = np.arange(3 * k)
+        first = np.empty(len(keys), dtype=int)
+        first[inv[::-1]] = j[::-1]
+        last = np.empty(len(keys), dtype=int)
+        last[inv] = j
+
+        # update edges_cells
+        is_new_interior = ~is_existing & (cts == 2)
+        num_interior_old = ec["interior"].shape[1]
+        new_interior = np.array(
+            [
+                np.concatenate([edge_gids[is_existing], edge_gids[is_new_interior]]),
+                np.concatenate(
+                    [adj_cell_ids, n + first[is_new_interior] // 3],
+                ),
+                np.concatenate(
+                    [n + first[is_existing] // 3, n + last[is_new_interior] // 3],
+                ),
+                np.concatenate(
+                    [ec["boundary"][2, b_idx], first[is_new_interior] % 3],
+                ),
+                np.concatenate(
+                    [first[is_existing] % 3, last[is_new_interior] % 3],
+                ),
+            ],
+            dtype=self.index_dtype,
+        )
+        num_new_interior = new_interior.shape[1]
+        ec["interior"] = self._grow(
+            "edges_cells:interior", ec["interior"], num_new_interior, 1
+        )
+        ec["interior"][:, num_interior_old:] = new_interior
+
+        keep_b = np.ones(ec["boundary"].shape[1], dtype=bool)
+        keep_b[b_idx] = False
+        ec["boundary"] = np.concatenate(
+            [
+                ec["boundary"][:, keep_b],
+                np.array(
+                    [
+                        edge_gids[is_boundary],
+                        n + first[is_boundary] // 3,
+                        first[is_boundary] % 3,
+                    ],
+                    dtype=self.index_dtype,
+                ),
+            ],
+            axis=1,
+        )
+
+        self._edges_cells_idx = self._grow(
+            "_edges_cells_idx", self._edges_cells_idx, num_new_edges
+        )
+        self._edges_cells_idx[ec["boundary"][0]] = np.arange(ec["boundary"].shape[1])
+        self._edges_cells_idx[new_interior[0]] = np.arange(
+            num_interior_old, num_interior_old + num_new_interior
+        )
+
+        # the values are set in _update_cell_values()
+        if self._interior_ce_ratios is not None:
+            self._interior_ce_ratios = self._grow(
+                "_interior_ce_ratios", self._interior_ce_ratios, num_new_interior
+            )
+
+        # simply set those to None; their reset is cheap
+        self._boundary_edges = None
+        self._interior_edges = None
+
     @property
     def ce_ratios_per_interior_edge(self):
+        assert (
+            self.points.ndim == 2
+        ), "ce_ratios_per_interior_edge does not support batched points"
         if self._interior_ce_ratios is None:
             if "edges" not in self.cells:
                 self.create_edges()
@@ -300,7 +815,15 @@ class MeshTri(_SimplexMesh):
                 minlength=n,
             )
 
-            self._interior_ce_ratios = ce_ratios[~self._is_boundary_edge]
+            # Keep the sums in float64 (as returned by bincount), even if the mesh
+            # works in lower precision: The Delaunay test in flip_until_delaunay()
+            # looks at their signs.
+            if self._edges_cells is None:
+                self._interior_ce_ratios = ce_ratios[~self._is_boundary_edge]
+            else:
+                # Take the order of edges_cells["interior"]. This also takes care of
+                # removed cells: They only contribute to removed and boundary edges.
+                self._interior_ce_ratios = ce_ratios[self._edges_cells["interior"][0]]
 
             # # sum up from self.ce_ratios
             # if self._edges_cells is None:
@@ -325,20 +848,34 @@ class MeshTri(_SimplexMesh):
         optimization.
         """
         if cell_mask is None:
-            cell_mask = np.zeros(self.cell_partitions.shape[1], dtype=bool)
+            cell_mask = np.zeros(self.cell_partitions.shape[-1], dtype=bool)
+        if self._is_cell_dead is not None:
+            cell_mask = cell_mask | self._is_cell_dead
 
         if self._control_volumes is None or np.any(cell_mask != self._cv_cell_mask):
             # Summing up the arrays first makes the work on bincount a bit lighter.
-            v = self.cell_partitions[:, ~cell_mask]
+            v = self.cell_partitions[..., ~cell_mask]
             vals = np.array([v[1] + v[2], v[2] + v[0], v[0] + v[1]])
             # sum all the vals into self._control_volumes at ids
-            self.cells["points"][~cell_mask].T.reshape(-1)
-            self._control_volumes = np.bincount(
-                self.cells["points"][~cell_mask].T.reshape(-1),
-                weights=vals.reshape(-1),
-                minlength=len(self.points),
+            ids = self.cells["points"][~cell_mask].T
+            num_points = self.points.shape[-2]
+            if self.num_batches is not None:
+                # One bincount for all states: Offset the point ids of state b by
+                # b * num_points.
+                offsets = num_points * np.arange(self.num_batches)
+                ids = ids[:, None] + offsets[:, None]
+            # bincount always sums up in float64
+            self._control_volumes = (
+                np.bincount(
+                    ids.reshape(-1),
+                    weights=vals.reshape(-1),
+                    minlength=self.points[..., 0].size,
+                )
+                .reshape(self.points.shape[:-1])
+                .astype(self.float_dtype, copy=False)
             )
-            self._cv_cell_mask = cell_mask
+            # copy; remove_cells() updates the mask in place
+            self._cv_cell_mask = cell_mask.copy()
         return self._control_volumes
 
     @property
@@ -361,31 +898,51 @@ class MeshTri(_SimplexMesh):
         for example, for temporarily disregarding flat cells on the boundary when
         performing Lloyd mesh optimization.
         """
+        assert (
+            self.points.ndim == 2
+        ), "get_control_volume_centroids() does not support batched points"
         if cell_mask is None:
             cell_mask = np.zeros(self.cell_partitions.shape[1], dtype=bool)
+        if self._is_cell_dead is not None:
+            cell_mask = cell_mask | self._is_cell_dead
 
         if self._cv_centroids is None or np.any(cell_mask != self._cvc_cell_mask):
-            _, v = self._compute_integral_x()
-            v = v[:, :, ~cell_mask, :]
-
-            # Again, make use of the fact that edge k is opposite of point k in every
-            # cell. Adding the arrays first makes the work for bincount lighter.
-            ids = self.cells["points"][~cell_mask].T
-            vals = np.array([v[1, 1] + v[0, 2], v[1, 2] + v[0, 0], v[1, 0] + v[0, 1]])
-            # add it all up
-            n = len(self.points)
-            self._cv_centroids = np.array(
-                [
-                    np.bincount(ids.reshape(-1), vals[..., k].reshape(-1), minlength=n)
-                    for k in range(vals.shape[-1])
-                ]
-            ).T
-
-            # Divide by the control volume
+            n, dim = self.points.shape
+            sums = np.zeros((dim, n))
+            # The temporaries in _compute_integral_x() are a few arrays of shape (2, 3,
+            # dim) per cell. The sums depend on the partition into blocks, so don't
+            # let it depend on num_workers.
+            bytes_per_cell = 4 * 6 * dim * self.points.itemsize
+            for blk in self._cell_blocks(bytes_per_cell, concurrent=False):
+                is_active = ~cell_mask[blk]
+                _, v = self._compute_integral_x(blk)
+                v = v[:, :, is_active, :]
+
+                # Again, make use of the fact that edge k is opposite of point k in
+                # every cell. Adding the arrays first makes the work for bincount
+                # lighter.
+                ids = self.cells["points"][blk][is_active].T.reshape(-1)
+                if len(ids) == 0:
+                    continue
+                vals = np.array(
+                    [v[1, 1] + v[0, 2], v[1, 2] + v[0, 0], v[1, 0] + v[0, 1]]
+                )
+                # Add it all up. Only bincount over the range of point indices that
+                # appear in the block.
+                offset = ids.min()
+                ids = ids - offset
+                for k in range(dim):
+                    b = np.bincount(ids, vals[..., k].reshape(-1))
+                    sums[k, offset : offset + len(b)] += b
+            self._cv_centroids = sums.T.astype(self.float_dtype, copy=False)
+
+            # Divide by the control volume. Points without control volume (e.g., not
+            # part of any cell) get NaN centroids.
             cv = self.get_control_volumes(cell_mask=cell_mask)[:, None]
             # self._cv_centroids /= np.where(cv > 0.0, cv, 1.0)
-            self._cv_centroids /= cv
-            self._cvc_cell_mask = cell_mask
+            with np.errstate(invalid="ignore"):
+                self._cv_centroids /= cv
+            self._cvc_cell_mask = cell_mask.copy()
             assert np.all(cell_mask == self._cv_cell_mask)
 
         return self._cv_centroids
@@ -394,6 +951,86 @@ class MeshTri(_SimplexMesh):
     def control_volume_centroids(self):
         return self.get_control_volume_centroids()
 
+    def _get_cv_contributions(self, cell_ids):
+        """The contributions of the cells `cell_ids` to the cached control volumes and
+        (not yet normalized) control volume centroids, together with the point ids they
+        belong to. Returns None if the control volumes aren't cached.
+        """
+        if self._control_volumes is None:
+            return None
+
+        if self._cv_centroids is not None and np.any(
+            self._cvc_cell_mask != self._cv_cell_mask
+        ):
+            # The centroids were computed with another cell mask; they'll be recomputed
+            # on the next access anyway.
+            self._cv_centroids = None
+
+        cell_ids = cell_ids[~self._cv_cell_mask[cell_ids]]
+        ids = self.cells["points"][cell_ids].T
+
+        v = self.cell_partitions[:, cell_ids]
+        cv_vals = np.array([v[1] + v[2], v[2] + v[0], v[0] + v[1]])
+
+        cvc_vals = None
+        if self._cv_centroids is not None:
+            _, v = self._compute_integral_x(cell_ids)
+            cvc_vals = np.array(
+                [v[1, 1] + v[0, 2], v[1, 2] + v[0, 0], v[1, 0] + v[0, 1]]
+            )
+        return ids, cv_vals, cvc_vals
+
+    def _update_control_volumes(self, old_contribs, new_contribs):
+        """Replace the contributions `old_contribs` in the cached control volumes and
+        control volume centroids by `new_contribs` (see `_get_cv_contributions()`).
+        """
+        if old_contribs is None:
+            return
+
+        old_ids, old_cv, old_cvc = old_contribs
+        new_ids, new_cv, new_cvc = new_contribs
+        pt_ids = np.unique(np.concatenate([old_ids.reshape(-1), new_ids.reshape(-1)]))
+
+        if old_cvc is not None:
+            dim = self._cv_centroids.shape[1]
+            # Undo the division by the control volume for the affected points, replace
+            # the contributions, and divide again. (Points without control volume have
+            # NaN centroids.)
+            cv = self._control_volumes[pt_ids]
+            is_zero = cv == 0.0
+            self._cv_centroids[pt_ids[~is_zero]] *= cv[~is_zero, None]
+            self._cv_centroids[pt_ids[is_zero]] = 0.0
+            np.subtract.at(
+                self._cv_centroids, old_ids.reshape(-1), old_cvc.reshape(-1, dim)
+            )
+            np.add.at(self._cv_centroids, new_ids.reshape(-1), new_cvc.reshape(-1, dim))
+
+        np.subtract.at(self._control_volumes, old_ids.reshape(-1), old_cv.reshape(-1))
+        np.add.at(self._control_volumes, new_ids.reshape(-1), new_cv.reshape(-1))
+        if self._num_point_cells is not None:
+            # Points without cells (e.g., after remove_cells()) are left with round-off;
+            # make their control volumes exactly zero like in a fresh computation.
+            is_orphan = self._num_point_cells[pt_ids] == 0
+            self._control_volumes[pt_ids[is_orphan]] = 0.0
+
+        if old_cvc is not None:
+            cv = self._control_volumes[pt_ids]
+            is_zero = cv == 0.0
+            self._cv_centroids[pt_ids[~is_zero]] /= cv[~is_zero, None]
+            self._cv_centroids[pt_ids[is_zero]] = np.nan
+
+    def _update_point_data(self, new_points, idx, cell_ids):
+        """Set the points `idx` to `new_points` and update all cached data of the
+        adjacent cells `cell_ids` in place.
+        """
+        assert (
+            self.points.ndim == 2
+        ), "set_points() with idx does not support batched points"
+        old_contribs = self._get_cv_contributions(cell_ids)
+        self._write_points(new_points, idx)
+        self._update_cell_values(cell_ids)
+        self._update_control_volumes(old_contribs, self._get_cv_contributions(cell_ids))
+
     @property
     def signed_cell_areas(self):
         """Signed area of a triangle in 2D."""
@@ -402,6 +1039,9 @@ class MeshTri(_SimplexMesh):
         return self._signed_cell_areas
 
     def compute_signed_cell_areas(self, idx=slice(None)):
+        assert (
+            self.points.ndim == 2
+        ), "compute_signed_cell_areas() does not support batched points"
         assert (
             self.points.shape[1] == 2
         ), "Signed areas only make sense for triangles in 2D."
@@ -411,10 +1051,45 @@ class MeshTri(_SimplexMesh):
         x = self.half_edge_coords
         return (x[0, idx, 1] * x[2, idx, 0] - x[0, idx, 0] * x[2, idx, 1]) / 2
 
+    def compute_barycentric_coordinates(self, x, cell_ids):
+        """The barycentric coordinates of the points `x` with respect to the cells
+        `cell_ids` (one cell per point), shape `(len(x), 3)`.
+        """
+        # Coordinate k is the signed area of the triangle of x and the edge opposite of
+        # point k, relative to the area of the cell.
+        e = self.half_edge_coords[:, cell_ids]
+        d = self.points[self.idx_hierarchy[0][:, cell_ids]] - x
+        areas = (d[..., 0] * e[..., 1] - d[..., 1] * e[..., 0]) / 2
+        return (areas / self.signed_cell_areas[cell_ids]).T
+
+    def compute_stiffness_matrices(self, idx=None):
+        """The element stiffness matrices of linear (P1) finite elements, i.e., the
+        integrals of `dot(grad(phi_i), grad(phi_j))` over the cells `idx` (default: all
+        cells).
+        """
+        assert (
+            self.points.ndim == 2
+        ), "compute_stiffness_matrices() does not support batched points"
+        if idx is None:
+            idx = slice(None)
+        # The gradient of phi_k is the edge opposite of point k, rotated by 90 degrees
+        # and divided by twice the area. Hence, the entries are the dot products of the
+        # edges divided by four times the area.
+        vols4 = 4 * self.cell_volumes[idx]
+        out = np.empty((len(vols4), 3, 3), dtype=vols4.dtype)
+        for k in range(3):
+            out[:, k, k] = self.ei_dot_ei[k, idx] / vols4
+            k1 = (k + 1) % 3
+            k2 = (k + 2) % 3
+            out[:, k1, k2] = self.ei_dot_ej[k, idx] / vols4
+            out[:, k2, k1] = out[:, k1, k2]
+        return out
+
     def mark_boundary(self):
         warnings.warn(
             "mark_boundary() does nothing. "
-            "Boundary entities are computed on the fly."
+            "Boundary entities are computed on the fly.",
+            stacklevel=2,
         )
 
     @property
@@ -440,7 +1115,9 @@ class MeshTri(_SimplexMesh):
 
     @property
     def is_interior_edge(self):
-        return ~self._is_boundary_edge
+        if self._is_edge_dead is None:
+            return ~self._is_boundary_edge
+        return ~(self._is_boundary_edge | self._is_edge_dead)
 
     @property
     def boundary_edges(self):
@@ -450,14 +1127,22 @@ class MeshTri(_SimplexMesh):
 
     @property
     def interior_edges(self):
+        """The interior edges, aligned with ce_ratios_per_interior_edge."""
         if self._interior_edges is None:
-            self._interior_edges = np.where(~self.is_boundary_edge)[0]
+            assert self.is_boundary_edge is not None
+            if self._edges_cells is None:
+                self._interior_edges = np.where(self.is_interior_edge)[0]
+            else:
+                # Take the order of edges_cells["interior"] (like
+                # ce_ratios_per_interior_edge). It isn't sorted after lazy
+                # remove_cells() or add_cells().
+                self._interior_edges = self._edges_cells["interior"][0].copy()
         return self._interior_edges
 
     @property
     def is_boundary_point(self):
         if self._is_boundary_point is None:
-            self._is_boundary_point = np.zeros(len(self.points), dtype=bool)
+            self._is_boundary_point = np.zeros(self.points.shape[-2], dtype=bool)
             self._is_boundary_point[
                 self.idx_hierarchy[..., self.is_boundary_edge_local]
             ] = True
@@ -471,6 +1156,9 @@ class MeshTri(_SimplexMesh):
 
     def create_edges(self):
         """Set up edge->point and edge->cell relations."""
+        # The edges are created from scratch; take the removed cells out first.
+        self.compact_cells()
+
         # Reshape into individual edges.
         # Sort the columns to make it possible for `unique()` to identify
         # individual edges.
@@ -486,10 +1174,12 @@ class MeshTri(_SimplexMesh):
         self.edges = {"points": a_unique}
 
         # cell->edges relationship
-        self.cells["edges"] = inv.reshape(3, -1).T
+        self.cells["edges"] = inv.astype(self.index_dtype).reshape(3, -1).T
 
         self._edges_cells = None
         self._edges_cells_idx = None
+        self._points_edges = None
+        self._points_points = None
 
     @property
     def edges_cells(self):
@@ -510,7 +1200,7 @@ class MeshTri(_SimplexMesh):
 
         # <https://stackoverflow.com/a/50395231/353337>
         edges_flat = self.cells["edges"].flat
-        idx_sort = np.argsort(edges_flat)
+        idx_sort = np.argsort(edges_flat).astype(self.index_dtype)
         sorted_edges = edges_flat[idx_sort]
         idx_start, count = grp_start_len(sorted_edges)
 
@@ -555,7 +1245,7 @@ class MeshTri(_SimplexMesh):
             assert self.is_boundary_edge is not None
             # For each edge, store the index into the respective edge array.
             num_edges = len(self.edges["points"])
-            self._edges_cells_idx = np.empty(num_edges, dtype=int)
+            self._edges_cells_idx = np.empty(num_edges, dtype=self.index_dtype)
             num_b = np.sum(self.is_boundary_edge)
             num_i = np.sum(self.is_interior_edge)
             self._edges_cells_idx[self.edges_cells["boundary"][0]] = np.arange(num_b)
@@ -570,16 +1260,36 @@ class MeshTri(_SimplexMesh):
             #   0.5 * (0.5 * edge_length) * covolume
             # = 0.25 * edge_length ** 2 * ce_ratio_edge_ratio
             #
-            self._cell_partitions = self.ei_dot_ei * self.ce_ratios / 4
+            e = self.ei_dot_ei
+            ce = self.ce_ratios
+            out = np.empty_like(e)
+
+            def _compute(blk):
+                out[..., blk] = e[..., blk] * ce[..., blk] / 4
+
+            self._run_cell_blocks(_compute, 3 * e.itemsize)
+            self._cell_partitions = out
         return self._cell_partitions
 
     @property
     def cell_circumcenters(self):
+        assert (
+            self.points.ndim == 2
+        ), "cell_circumcenters does not support batched points"
         if self._cell_circumcenters is None:
             point_cells = self.cells["points"].T
-            self._cell_circumcenters = compute_triangle_circumcenters(
-                self.points[point_cells], self.cell_partitions
-            )
+            cp = self.cell_partitions
+            out = np.empty((cp.shape[1], self.points.shape[1]), dtype=cp.dtype)
+
+            def _compute(blk):
+                out[blk] = compute_triangle_circumcenters(
+                    self.points[point_cells[:, blk]], cp[:, blk]
+                )
+
+            # point coordinates, the (normalized) partitions, and their products
+            bytes_per_cell = 3 * (2 * self.points.shape[1] + 3) * cp.itemsize
+            self._run_cell_blocks(_compute, bytes_per_cell)
+            self._cell_circumcenters = out
         return self._cell_circumcenters
 
     @property
@@ -605,7 +1315,8 @@ class MeshTri(_SimplexMesh):
     @property
     def cell_quality(self):
         warnings.warn(
-            "Use `q_radius_ratio`. This method will be removed in a future release."
+            "Use `q_radius_ratio`. This method will be removed in a future release.",
+            stacklevel=2,
         )
         return self.q_radius_ratio
 
@@ -617,8 +1328,15 @@ class MeshTri(_SimplexMesh):
         #
         # where r_in is the incircle radius and r_out the circumcircle radius
         # and a, b, c are the edge lengths.
-        a, b, c = self.edge_lengths
-        return (-a + b + c) * (a - b + c) * (a + b - c) / (a * b * c)
+        el = self.edge_lengths
+        out = np.empty(el.shape[1:], dtype=el.dtype)
+
+        def _compute(blk):
+            a, b, c = el[..., blk]
+            out[..., blk] = (-a + b + c) * (a - b + c) * (a + b - c) / (a * b * c)
+
+        self._run_cell_blocks(_compute, 2 * 3 * el.itemsize)
+        return out
 
     @property
     def angles(self):
@@ -626,16 +1344,24 @@ class MeshTri(_SimplexMesh):
         # The cosines of the angles are the negative dot products of the normalized
         # edges adjacent to the angle.
         norms = self.edge_lengths
-        normalized_ei_dot_ej = np.array(
-            [
-                self.ei_dot_ej[0] / norms[1] / norms[2],
-                self.ei_dot_ej[1] / norms[2] / norms[0],
-                self.ei_dot_ej[2] / norms[0] / norms[1],
-            ]
-        )
-        return np.arccos(-normalized_ei_dot_ej)
+        e = self.ei_dot_ej
+        out = np.empty_like(e)
+
+        def _compute(blk):
+            n = norms[:, blk]
+            normalized_ei_dot_ej = np.array(
+                [
+                    e[0, blk] / n[1] / n[2],
+                    e[1, blk] / n[2] / n[0],
+                    e[2, blk] / n[0] / n[1],
+                ]
+            )
+            np.arccos(-normalized_ei_dot_ej, out=out[:, blk])
+
+        self._run_cell_blocks(_compute, 3 * 3 * e.itemsize)
+        return out
 
-    def _compute_integral_x(self):
+    def _compute_integral_x(self, idx):
         # Computes the integral of x,
         #
         #   \\int_V x,
@@ -646,13 +1372,13 @@ class MeshTri(_SimplexMesh):
         # The integral of any linear function over a triangle is the average of the
         # values of the function in each of the three corners, times the area of the
         # triangle.
-        right_triangle_vols = self.cell_partitions
+        right_triangle_vols = self.cell_partitions[:, idx]
 
-        point_edges = self.idx_hierarchy
+        point_edges = self.idx_hierarchy[..., idx]
 
         corner = self.points[point_edges]
         edge_midpoints = 0.5 * (corner[0] + corner[1])
-        cc = self.cell_circumcenters
+        cc = self.cell_circumcenters[idx]
 
         average = (corner + edge_midpoints[None] + cc[None, None]) / 3.0
 
@@ -660,13 +1386,13 @@ class MeshTri(_SimplexMesh):
         return point_edges, contribs
 
     # def _compute_surface_areas(self, cell_ids):
-    #     # For each edge, one half of the the edge goes to each of the end points. Used
-    #     # for Neumann boundary conditions if on the boundary of the mesh and transition
-    #     # conditions if in the interior.
+    #     # For each edge, one half of the the edge goes to each of the end points.
+    #     # Used for Neumann boundary conditions if on the boundary of the mesh and
+    #     # transition conditions if in the interior.
     #     #
     #     # Each of the three edges may contribute to the surface areas of all three
-    #     # vertices. Here, only the two adjacent points receive a contribution, but other
-    #     # approaches, may contribute to all three points.
+    #     # vertices. Here, only the two adjacent points receive a contribution, but
+    #     # other approaches, may contribute to all three points.
     #     cn = self.cells["points"][cell_ids]
     #     ids = np.stack([cn, cn, cn], axis=1)
 
@@ -929,8 +1655,10 @@ class MeshTri(_SimplexMesh):
             plt.tripcolor(
                 self.points[:, 0],
                 self.points[:, 1],
-                self.cells["points"],
-                self.q_radius_ratio,
+                self._live_cells("points"),
+                self.q_radius_ratio
+                if self._is_cell_dead is None
+                else self.q_radius_ratio[~self._is_cell_dead],
                 shading="flat",
                 cmap=cmap,
                 vmin=cmin,
@@ -958,9 +1686,13 @@ class MeshTri(_SimplexMesh):
 
         # Get edges, cut off z-component.
         e = self.points[self.edges["points"]][:, :, :2]
+        # don't show removed edges
+        is_live = np.ones(len(e), dtype=bool)
+        if self._is_edge_dead is not None:
+            is_live = ~self._is_edge_dead
 
         if nondelaunay_edge_color is None:
-            line_segments0 = LineCollection(e, color=mesh_color)
+            line_segments0 = LineCollection(e[is_live], color=mesh_color)
             ax.add_collection(line_segments0)
         else:
             # Plot regular edges, mark those with negative ce-ratio red.
@@ -977,7 +1709,9 @@ class MeshTri(_SimplexMesh):
             line_segments0 = LineCollection(e[is_pos], color=mesh_color)
             ax.add_collection(line_segments0)
             #
-            line_segments1 = LineCollection(e[~is_pos], color=nondelaunay_edge_color)
+            line_segments1 = LineCollection(
+                e[~is_pos & is_live], color=nondelaunay_edge_color
+            )
             ax.add_collection(line_segments1)
 
         if mark_edges is not None:
@@ -1064,7 +1798,9 @@ class MeshTri(_SimplexMesh):
             self.create_edges()
 
         # Find the edges that contain the vertex
-        edge_gids = np.where((self.edges["points"] == point_id).any(axis=1))[0]
+        pe = self.points_edges
+        k = pe["offsets"][point_id]
+        edge_gids = pe["ids"][k : k + pe["counts"][point_id]]
         # ... and plot them
         for point_ids in self.edges["points"][edge_gids]:
             x = self.points[point_ids]
@@ -1073,7 +1809,9 @@ class MeshTri(_SimplexMesh):
         # Highlight ce_ratios.
         if show_ce_ratio:
             # Find the cells that contain the vertex
-            cell_ids = np.where((self.cells["points"] == point_id).any(axis=1))[0]
+            pc = self.points_cells
+            k = pc["offsets"][point_id]
+            cell_ids = pc["ids"][k : k + pc["counts"][point_id]]
 
             for cell_id in cell_ids:
                 for edge_gid in self.cells["edges"][cell_id]:
@@ -1099,8 +1837,16 @@ class MeshTri(_SimplexMesh):
 
     def flip_until_delaunay(self, tol=0.0, max_steps=100):
         """Flip edges until the mesh is fully Delaunay (up to `tol`)."""
+        assert (
+            self.points.ndim == 2
+        ), "flip_until_delaunay() does not support batched points"
         num_flips = 0
         assert tol >= 0.0
+        if self.float_dtype != np.float64:
+            # In lower precision, the ce-ratios of (almost) cocircular cells are only
+            # accurate up to a few eps and would get flipped back and forth. Don't
+            # consider those violations.
+            tol = max(tol, 10 * np.finfo(self.float_dtype).eps)
         # If all coedge/edge ratios are positive, all cells are Delaunay.
         if np.all(self.ce_ratios > -0.5 * tol):
             return num_flips
@@ -1111,50 +1857,103 @@ class MeshTri(_SimplexMesh):
         if np.all(self.ce_ratios[~self.is_boundary_edge_local] > -0.5 * tol):
             return num_flips
 
+        # Keep a worklist of the interior edges which violate the Delaunay condition.
+        # A flip only changes the ce_ratios of the edges of the two adjacent cells, so
+        # only those need to be tested again. Each round then costs time proportional
+        # to the number of flips, not to the number of edges.
+        ce_ratios = self.ce_ratios_per_interior_edge
+        candidates = np.where(ce_ratios < -tol)[0]
         step = 0
-
-        while np.any(self.ce_ratios_per_interior_edge < -tol):
+        while len(candidates) > 0:
             step += 1
             if step > max_steps:
-                m = np.min(self.ce_ratios_per_interior_edge)
+                m = np.min(ce_ratios[candidates])
                 warnings.warn(
-                    f"Maximum number of edge flips reached. Smallest ce-ratio: {m:.3e}."
+                    "Maximum number of edge flips reached. "
+                    f"Smallest ce-ratio: {m:.3e}.",
+                    stacklevel=2,
                 )
                 break
-            is_flip_interior_edge = self.ce_ratios_per_interior_edge < -tol
-
-            interior_edges_cells = self.edges_cells["interior"][1:3].T
-            adj_cells = interior_edges_cells[is_flip_interior_edge].T
-
-            # Check if there are cells for which more than one edge needs to be flipped.
-            # For those, only flip one edge, namely that with the smaller (more
-            # negative) ce_ratio.
-            cell_gids, num_flips_per_cell = np.unique(adj_cells, return_counts=True)
-            critical_cell_gids = cell_gids[num_flips_per_cell > 1]
-            while np.any(num_flips_per_cell > 1):
-                for cell_gid in critical_cell_gids:
-                    edge_gids = self.cells["edges"][cell_gid]
-                    is_interior_edge = self.is_interior_edge[edge_gids]
-                    idx = self.edges_cells_idx[edge_gids[is_interior_edge]]
-                    k = np.argmin(self.ce_ratios_per_interior_edge[idx])
-                    is_flip_interior_edge[idx] = False
-                    is_flip_interior_edge[idx[k]] = True
-
-                adj_cells = interior_edges_cells[is_flip_interior_edge].T
-                cell_gids, num_flips_per_cell = np.unique(adj_cells, return_counts=True)
-                critical_cell_gids = cell_gids[num_flips_per_cell > 1]
-
-            self.flip_interior_edges(is_flip_interior_edge)
-            num_flips += np.sum(is_flip_interior_edge)
+            flip_ids = self._select_flip_edges(candidates)
+            self.flip_interior_edges(flip_ids)
+            num_flips += len(flip_ids)
+
+            adj_cells = self.edges_cells["interior"][1:3, flip_ids]
+            edge_gids = self.cells["edges"][adj_cells].reshape(-1)
+            edge_gids = edge_gids[~self.is_boundary_edge[edge_gids]]
+            retest = np.unique(self.edges_cells_idx[edge_gids])
+            candidates = np.union1d(
+                np.setdiff1d(candidates, retest, assume_unique=True),
+                retest[ce_ratios[retest] < -tol],
+            )
 
         return num_flips
 
+    def _select_flip_edges(self, candidates):
+        """Given the indices of interior edges to be flipped, select a subset such that
+        no cell is adjacent to more than one of them. Among conflicting edges, those
+        with the smaller (more negative) ce_ratio are preferred.
+        """
+        # This is a greedy maximal independent set in the graph where the edges are
+        # nodes and two of them are connected if they share a cell. Instead of going
+        # through the edges one by one, select in every pass all edges which have the
+        # smallest ce_ratio among the candidates in both of their adjacent cells. Those
+        # cannot conflict. Then drop them and all edges sharing a cell with them from
+        # the candidates, and repeat. Every pass selects at least one edge.
+        #
+        # Only work with the cells adjacent to the candidates, renumbered, such that
+        # the cost doesn't depend on the size of the mesh.
+        _, adj_cells = np.unique(
+            self.edges_cells["interior"][1:3, candidates], return_inverse=True
+        )
+        adj_cells = adj_cells.reshape(2, -1)
+        num_cells = np.max(adj_cells, initial=-1) + 1
+        n = len(candidates)
+
+        # A strict order of the candidates: ce_ratio, then edge index
+        order = np.argsort(self.ce_ratios_per_interior_edge[candidates], kind="stable")
+        rank = np.empty(n, dtype=int)
+        rank[order] = np.arange(n)
+
+        cell_min_rank = np.full(num_cells, n)
+        is_blocked = np.zeros(num_cells, dtype=bool)
+        is_selected = np.zeros(n, dtype=bool)
+        is_active = np.ones(n, dtype=bool)
+        while np.any(is_active):
+            a = adj_cells[:, is_active]
+            r = rank[is_active]
+            cell_min_rank[a] = n
+            np.minimum.at(cell_min_rank, a[0], r)
+            np.minimum.at(cell_min_rank, a[1], r)
+            is_min = (cell_min_rank[a[0]] == r) & (cell_min_rank[a[1]] == r)
+
+            idx = np.where(is_active)[0][is_min]
+            is_selected[idx] = True
+            is_blocked[adj_cells[:, idx]] = True
+            is_active &= ~(is_blocked[adj_cells[0]] | is_blocked[adj_cells[1]])
+
+        return candidates[is_selected]
+
     def flip_interior_edges(self, is_flip_interior_edge):
+        assert (
+            self.points.ndim == 2
+        ), "flip_interior_edges() does not support batched points"
         edges_cells_flip = self.edges_cells["interior"][:, is_flip_interior_edge]
         edge_gids = edges_cells_flip[0]
         adj_cells = edges_cells_flip[1:3]
         lids = edges_cells_flip[3:5]
 
+        # The cells whose data needs to be updated. Their contributions to the control
+        # volumes must be taken before the cells are changed.
+        update_cell_ids = np.unique(adj_cells.T.flat)
+        old_contribs = self._get_cv_contributions(update_cell_ids)
+        old_cell_points = self.cells["points"][update_cell_ids]
+        old_edge_points = self.edges["points"][edge_gids]
+        if self._num_point_cells is not None:
+            np.subtract.at(
+                self._num_point_cells, self.cells["points"][update_cell_ids].flat, 1
+            )
+
         #        3                   3
         #        A                   A
         #       /|\                 / \
@@ -1275,89 +2074,160 @@ class MeshTri(_SimplexMesh):
             self.edges_cells["interior"][2, idx_secnd] = new__adjacent[~is_first]
             self.edges_cells["interior"][4, idx_secnd] = new_local_edge_index
 
-        # Schedule the cell ids for data updates
-        update_cell_ids = np.unique(adj_cells.T.flat)
-        # Same for edge ids
-        update_edge_gids = self.cells["edges"][update_cell_ids].flat
-        edge_cell_idx = self.edges_cells_idx[update_edge_gids]
-        update_interior_edge_ids = np.unique(
-            edge_cell_idx[self.is_interior_edge[update_edge_gids]]
+        if self._num_point_cells is not None:
+            np.add.at(
+                self._num_point_cells, self.cells["points"][update_cell_ids].flat, 1
+            )
+        self._update_cell_values(update_cell_ids)
+        self._update_control_volumes(
+            old_contribs, self._get_cv_contributions(update_cell_ids)
         )
+        self._update_points_cells(
+            update_cell_ids, old_cell_points, self.cells["points"][update_cell_ids]
+        )
+        self._update_points_edges(
+            edge_gids, old_edge_points, self.edges["points"][edge_gids]
+        )
+        self._update_cells_neighbors(update_cell_ids)
+        self._cell_grid = None
+        self._matrix_pattern = None
+        # The subdomains only hold point masks; edge flips don't change those. (Flips
+        # don't change the boundary either.)
+
+    def _update_cells_neighbors(self, cell_ids):
+        """Set the neighbors of the cells `cell_ids` (and the cells' entries in the
+        neighbors) from edges_cells.
+        """
+        if self._cells_neighbors is None:
+            return
+        neighbors = self._cells_neighbors
+        edge_gids = self.cells["edges"][cell_ids]
+        neighbors[cell_ids] = -1
+        is_interior = ~self._is_boundary_edge[edge_gids]
+        ec = self.edges_cells["interior"][
+            :, self.edges_cells_idx[edge_gids[is_interior]]
+        ]
+        neighbors[ec[1], ec[3]] = ec[2]
+        neighbors[ec[2], ec[4]] = ec[1]
 
-        self._update_cell_values(update_cell_ids, update_interior_edge_ids)
-
-    def _update_cell_values(self, cell_ids, interior_edge_ids):
-        """Updates all sorts of cell information for the given cell IDs."""
+    def _update_points_cells(self, cell_ids, old_cell_points, new_cell_points):
+        """Update points_cells after the points of the cells `cell_ids` changed from
+        `old_cell_points` to `new_cell_points` (None for removed cells).
+        """
+        if self._points_cells is None:
+            return
+        pc = self._points_cells
+        cell_ids = np.repeat(cell_ids, 3)
+        if new_cell_points is None:
+            new_cell_points = np.zeros((0, 3), dtype=old_cell_points.dtype)
+            add_ids = cell_ids[:0]
+        else:
+            add_ids = cell_ids
+        is_updated = csr_update(
+            pc["offsets"],
+            pc["counts"],
+            [pc["ids"]],
+            old_cell_points.reshape(-1),
+            cell_ids,
+            new_cell_points.reshape(-1),
+            [add_ids],
+        )
+        if not is_updated:
+            # some point ran out of room; recompute when needed
+            self._points_cells = None
+
+    def _update_points_edges(self, edge_ids, old_edge_points, new_edge_points):
+        """Update points_edges and points_points after the points of the edges
+        `edge_ids` changed from `old_edge_points` to `new_edge_points` (None for
+        removed edges).
+        """
+        if self._points_edges is None:
+            return
+        pe = self._points_edges
+        pp = self._points_points
+        edge_ids = np.repeat(edge_ids, 2)
+        if new_edge_points is None:
+            new_edge_points = np.zeros((0, 2), dtype=old_edge_points.dtype)
+            add_ids = edge_ids[:0]
+        else:
+            add_ids = edge_ids
+        is_updated = csr_update(
+            pe["offsets"],
+            pe["counts"],
+            [pe["ids"], pp["ids"]],
+            old_edge_points.reshape(-1),
+            edge_ids,
+            new_edge_points.reshape(-1),
+            [add_ids, new_edge_points[:, ::-1].reshape(-1)],
+        )
+        if not is_updated:
+            # some point ran out of room; recompute when needed
+            self._points_edges = None
+            self._points_points = None
+
+    def _update_cell_values(self, cell_ids):
+        """Updates all sorts of cell information for the given cell IDs. Only values
+        which are already cached are updated.
+        """
         # update idx_hierarchy
         nds = self.cells["points"][cell_ids].T
-        self.idx_hierarchy[..., cell_ids] = nds[self.local_idx]
-
-        # update self.half_edge_coords
-        self.half_edge_coords[:, cell_ids, :] = np.moveaxis(
-            self.points[self.idx_hierarchy[1, ..., cell_ids]]
-            - self.points[self.idx_hierarchy[0, ..., cell_ids]],
-            0,
-            1,
-        )
+        idx = nds[self.local_idx]
+        if self._idx_hierarchy is not None:
+            self._idx_hierarchy[..., cell_ids] = idx
 
-        # update self.ei_dot_ei
-        e = self.half_edge_coords[:, cell_ids]
-        self.ei_dot_ei[:, cell_ids] = np.einsum("...k,...k->...", e, e)
+        p = self.points[idx]
+        half_edge_coords = p[1] - p[0]
+        ei_dot_ei = np.einsum("...k, ...k->...", half_edge_coords, half_edge_coords)
+        ei_dot_ej = ei_dot_ei - np.sum(ei_dot_ei, axis=0) / 2
 
-        # update self.ei_dot_ej
-        self._ei_dot_ej[:, cell_ids] = (
-            self.ei_dot_ei[:, cell_ids]
-            - np.sum(self.ei_dot_ei[:, cell_ids], axis=0) / 2
-        )
+        if self._half_edge_coords is not None:
+            self._half_edge_coords[:, cell_ids] = half_edge_coords
 
-        # update cell_volumes, ce_ratios_per_half_edge
-        cv = compute_tri_areas(self.ei_dot_ej[:, cell_ids])
-        self.cell_volumes[cell_ids] = cv
+        if self._ei_dot_ei is not None:
+            self._ei_dot_ei[:, cell_ids] = ei_dot_ei
 
-        if self._ce_ratios is not None:
-            ce = compute_ce_ratios(self.ei_dot_ej[:, cell_ids], cv)
-            self._ce_ratios[:, cell_ids] = ce
+        if self._ei_dot_ej is not None:
+            self._ei_dot_ej[:, cell_ids] = ei_dot_ej
 
-        if self._interior_ce_ratios is not None:
-            self._interior_ce_ratios[interior_edge_ids] = 0.0
-            edge_gids = self.interior_edges[interior_edge_ids]
-            adj_cells = self.edges_cells["interior"][1:3, interior_edge_ids].T
+        if self._edge_lengths is not None:
+            self._edge_lengths[:, cell_ids] = np.sqrt(ei_dot_ei)
 
-            is_edge = np.array(
-                [
-                    self.cells["edges"][adj_cells[:, 0]][:, k] == edge_gids
-                    for k in range(3)
-                ]
+        if self._cell_volumes is not None:
+            cv = compute_tri_areas(ei_dot_ej)
+            self._cell_volumes[cell_ids] = cv
+
+            if self._ce_ratios is not None:
+                ce = compute_ce_ratios(ei_dot_ej, cv)
+                self._ce_ratios[:, cell_ids] = ce
+
+                if self._cell_partitions is not None:
+                    self._cell_partitions[:, cell_ids] = ei_dot_ei * ce / 4
+
+        if self._cell_circumcenters is not None:
+            self._cell_circumcenters[cell_ids] = compute_triangle_circumcenters(
+                self.points[nds], self._cell_partitions[:, cell_ids]
             )
-            assert np.all(np.sum(is_edge, axis=0) == 1)
-            for k in range(3):
-                self._interior_ce_ratios[
-                    interior_edge_ids[is_edge[k]]
-                ] += self.ce_ratios[k, adj_cells[is_edge[k], 0]]
 
-            is_edge = np.array(
-                [
-                    self.cells["edges"][adj_cells[:, 1]][:, k] == edge_gids
-                    for k in range(3)
-                ]
+        if self._cell_centroids is not None:
+            self._cell_centroids[cell_ids] = self.compute_centroids(cell_ids)
+
+        if self._signed_cell_areas is not None:
+            self._signed_cell_areas[cell_ids] = self.compute_signed_cell_areas(cell_ids)
+
+        if self._interior_ce_ratios is not None:
+            # The ce_ratio of an interior edge is the sum of the contributions from its
+            # two adjacent cells.
+            edge_gids = self.cells["edges"][cell_ids].reshape(-1)
+            edge_gids = edge_gids[~self.is_boundary_edge[edge_gids]]
+            interior_edge_ids = np.unique(self.edges_cells_idx[edge_gids])
+            ec = self.edges_cells["interior"][:, interior_edge_ids]
+            self._interior_ce_ratios[interior_edge_ids] = np.add(
+                self.ce_ratios[ec[3], ec[1]],
+                self.ce_ratios[ec[4], ec[2]],
+                dtype=self._interior_ce_ratios.dtype,
             )
-            assert np.all(np.sum(is_edge, axis=0) == 1)
-            for k in range(3):
-                self._interior_ce_ratios[
-                    interior_edge_ids[is_edge[k]]
-                ] += self.ce_ratios[k, adj_cells[is_edge[k], 1]]
 
         if self._is_boundary_cell is not None:
             self._is_boundary_cell[cell_ids] = np.any(
                 self.is_boundary_edge_local[:, cell_ids], axis=0
             )
-
-        # TODO update those values
-        self._cell_centroids = None
-        self._edge_lengths = None
-        self._cell_circumcenters = None
-        self._control_volumes = None
-        self._cell_partitions = None
-        self._cv_centroids = None
-        self._signed_cell_areas = None
-        self.subdomains = {}
@@ -4,6 +4,12 @@ formats.
 
 .. moduleauthor:: Nico Schlömer <nico.schloemer@gmail.com>
 """
+import hashlib
+import os
+import pathlib
+import tempfile
+import time
+
 import meshio
 import numpy as np
 
@@ -14,36 +20,130 @@ __all__ = ["read"]
 
 
 def _sanitize(points, cells):
-    uvertices, uidx = np.unique(cells, return_inverse=True)
-    cells = uidx.reshape(cells.shape)
-    points = points[uvertices]
-    return points, cells
+    # Renumber the used points in O(n); np.unique() would sort all point references
+    # of the cells.
+    is_used = np.bincount(cells.reshape(-1), minlength=len(points)) > 0
+    if np.all(is_used):
+        return points, cells
+    new_index = np.cumsum(is_used) - 1
+    return points[is_used], new_index[cells]
 
 
-def from_meshio(mesh):
+def from_meshio(mesh, sanitize=True):
     """Transform from meshio to meshplex format.
 
     :param mesh: The meshio mesh object.
     :type mesh: meshio.Mesh
+    :param sanitize: Remove the points which aren't part of any cell. Set to `False`
+        if the mesh is known to have no such points; this saves a sort of all cells.
+    :type sanitize: bool
     :returns mesh{2,3}d: The mesh data.
     """
-    # make sure to include the used nodes only
     tetra = mesh.get_cells_type("tetra")
     if len(tetra) > 0:
-        points, cells = _sanitize(mesh.points, tetra)
-        return MeshTetra(points, cells)
+        mesh_class, cells = MeshTetra, tetra
+    else:
+        mesh_class, cells = MeshTri, mesh.get_cells_type("triangle")
+        assert len(cells) > 0
 
-    tri = mesh.get_cells_type("triangle")
-    assert len(tri) > 0
-    points, cells = _sanitize(mesh.points, tri)
-    return MeshTri(points, cells)
+    points = mesh.points
+    if sanitize:
+        # make sure to include the used nodes only
+        points, cells = _sanitize(points, cells)
+    return mesh_class(points, cells)
 
 
-def read(filename):
+def read(filename, cache=False, cache_dir=None, max_cache_size=2 ** 32, sanitize=True):
     """Reads an unstructured mesh into meshplex format.
 
+    With `cache=True`, the mesh (sanitized points and cells, edges, faces, their
+    relations to the cells, and the boundary flags) is stored in `cache_dir`, keyed
+    on the path, size, and modification time of the file. Subsequent reads of the
+    same file skip parsing and the computation of the topology and memory-map the
+    arrays (copy-on-write) instead. The least recently used entries are removed as
+    soon as the cache exceeds `max_cache_size` bytes. `cache_dir` defaults to
+    `$MESHPLEX_CACHE_DIR` or `~/.cache/meshplex`. For `sanitize`, see
+    `from_meshio()`.
+
     :param filenames: The files to read from.
     :type filenames: str
     :returns mesh{2,3}d: The mesh data.
     """
-    return from_meshio(meshio.read(filename))
+    if not cache:
+        return from_meshio(meshio.read(filename), sanitize)
+
+    cache_dir = pathlib.Path(_get_cache_dir() if cache_dir is None else cache_dir)
+    filename = pathlib.Path(filename).resolve()
+    stat = filename.stat()
+    key = hashlib.sha1(
+        f"{filename}:{stat.st_size}:{stat.st_mtime_ns}:{sanitize}".encode()
+    ).hexdigest()
+    cache_file = cache_dir / f"{key}.npz"
+
+    try:
+        _touch(cache_file)
+        with np.load(cache_file) as data:
+            class_name = str(data["class"])
+        mesh_class = {"MeshTri": MeshTri, "MeshTetra": MeshTetra}[class_name]
+        return mesh_class.load_state(cache_file, mmap_mode="c")
+    except FileNotFoundError:
+        pass
+
+    mesh = from_meshio(meshio.read(filename), sanitize)
+    mesh.create_edges()
+    if isinstance(mesh, MeshTri):
+        mesh.edges_cells
+        mesh.is_boundary_point
+    else:
+        mesh.mark_boundary()
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first such that concurrent readers never see an
+    # incomplete entry.
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=cache_dir)
+    with os.fdopen(fd, "wb") as f:
+        mesh.save_state(f)
+    os.replace(tmp, cache_file)
+    _touch(cache_file)
+    _evict_cache(cache_dir, max_cache_size)
+    return mesh
+
+
+def _get_cache_dir():
+    if "MESHPLEX_CACHE_DIR" in os.environ:
+        return os.environ["MESHPLEX_CACHE_DIR"]
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME", pathlib.Path.home() / ".cache")
+    return pathlib.Path(xdg_cache_home) / "meshplex"
+
+
+def _touch(path):
+    """Mark a cache entry as recently used. (Set the time explicitly; the clock the
+    file system uses for the modification time may be coarse.)
+    """
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+def _evict_cache(cache_dir, max_cache_size):
+    """Remove the least recently used entries until the cache fits into
+    `max_cache_size` bytes.
+    """
+    entries = []
+    for path in cache_dir.glob("*.npz"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            # removed by another process in the meantime
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+    entries.sort()
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total_size <= max_cache_size:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total_size -= size
@@ -54,3 +54,62 @@ def assert_norms(x, ref, tol):
         f"Expected: [{ref[0]:.16e}, {ref[1]:.16e}, {ref[2]:.16e}]\n"
         f"Computed: [{val[0]:.16e}, {val[1]:.16e}, {val[2]:.16e}]\n"
     )
+
+
+def assert_points_adjacency(mesh):
+    """Check points_cells, points_edges, and points_points against the cells and
+    edges.
+    """
+    # creates the edges if necessary
+    points_cells = mesh.points_cells
+    points_edges = mesh.points_edges
+    points_points = mesh.points_points
+
+    cell_ids = np.arange(len(mesh.cells["points"]))
+    if mesh._is_cell_dead is not None:
+        cell_ids = cell_ids[~mesh._is_cell_dead]
+    edge_ids = np.arange(len(mesh.edges["points"]))
+    if mesh._is_edge_dead is not None:
+        edge_ids = edge_ids[~mesh._is_edge_dead]
+
+    def get_row(csr, k):
+        i = csr["offsets"][k]
+        return csr["ids"][i : i + csr["counts"][k]]
+
+    for k in range(len(mesh.points)):
+        ref = cell_ids[np.any(mesh.cells["points"][cell_ids] == k, axis=1)]
+        assert np.array_equal(np.sort(get_row(points_cells, k)), ref)
+
+        ref = edge_ids[np.any(mesh.edges["points"][edge_ids] == k, axis=1)]
+        adj_edges = get_row(points_edges, k)
+        assert np.array_equal(np.sort(adj_edges), ref)
+        # the neighbors are aligned with the edges
+        neighbors = get_row(points_points, k)
+        assert np.array_equal(
+            np.sort(np.column_stack([neighbors, np.full(len(neighbors), k)]), axis=1),
+            np.sort(mesh.edges["points"][adj_edges], axis=1),
+        )
+
+
+def assert_cells_neighbors(mesh):
+    """Check cells_neighbors against the cells."""
+    neighbors = mesh.cells_neighbors
+
+    cells = mesh.cells["points"]
+    is_live = np.ones(len(cells), dtype=bool)
+    if mesh._is_cell_dead is not None:
+        is_live = ~mesh._is_cell_dead
+    assert neighbors.shape == cells.shape
+    assert np.all(neighbors[~is_live] == -1)
+
+    facets_cells = {}
+    for i in np.where(is_live)[0]:
+        for k in range(cells.shape[1]):
+            facet = tuple(sorted(np.delete(cells[i], k)))
+            facets_cells.setdefault(facet, []).append(i)
+
+    for i in np.where(is_live)[0]:
+        for k in range(cells.shape[1]):
+            facet = tuple(sorted(np.delete(cells[i], k)))
+            others = [j for j in facets_cells[facet] if j != i]
+            assert neighbors[i, k] == (others[0] if others else -1)
@@ -0,0 +1,126 @@
+import meshzoo
+import numpy as np
+import pytest
+
+import meshplex
+
+from .helpers import (
+    assert_mesh_consistency,
+    assert_mesh_equality_up_to_edges,
+    compute_all_entities,
+)
+
+
+def get_mesh():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.random.seed(0)
+    points = points[:, :2] + 0.02 * (2 * np.random.rand(len(points), 2) - 1)
+    return points, cells
+
+
+def test_add_cells():
+    points, cells = get_mesh()
+    m = 2 * len(cells) // 3
+    mesh0 = meshplex.MeshTri(points, cells[:m])
+    compute_all_entities(mesh0)
+
+    for idx in np.array_split(np.arange(m, len(cells)), 3):
+        cell_ids = mesh0.add_cells(cells[idx])
+        assert np.all(cell_ids == idx)
+
+    assert_mesh_consistency(mesh0)
+
+    mesh1 = meshplex.MeshTri(points, cells)
+    mesh1.create_edges()
+    assert_mesh_equality_up_to_edges(mesh0, mesh1)
+
+
+def test_add_points():
+    points, cells = get_mesh()
+    mesh0 = meshplex.MeshTri(points, cells)
+    compute_all_entities(mesh0)
+
+    # attach a strip of cells on the right
+    is_right = points[:, 0] > 0.95
+    r = np.where(is_right)[0]
+    r = r[np.argsort(points[r, 1])]
+    new_points = points[r] + [0.1, 0.0]
+    q = mesh0.add_points(new_points)
+    assert np.all(q == np.arange(len(points), len(points) + len(r)))
+    new_cells = np.concatenate(
+        [
+            np.column_stack([r[:-1], q[:-1], r[1:]]),
+            np.column_stack([r[1:], q[:-1], q[1:]]),
+        ]
+    )
+    mesh0.add_cells(new_cells)
+    assert_mesh_consistency(mesh0)
+
+    mesh1 = meshplex.MeshTri(
+        np.concatenate([points, new_points]), np.concatenate([cells, new_cells])
+    )
+    mesh1.create_edges()
+    assert_mesh_equality_up_to_edges(mesh0, mesh1)
+
+
+@pytest.mark.parametrize("max_dead_fraction", [0.0, 1.0])
+def test_remove_add_cells(max_dead_fraction):
+    points, cells = get_mesh()
+    mesh0 = meshplex.MeshTri(points, cells)
+    mesh0.max_dead_fraction = max_dead_fraction
+    compute_all_entities(mesh0)
+
+    # remove a corner and some interior cells, then put them back
+    is_removed = (np.linalg.norm(mesh0.cell_centroids - 1.0, axis=1) < 0.3) | (
+        np.linalg.norm(mesh0.cell_centroids - 0.6, axis=1) < 0.1
+    )
+    mesh0.remove_cells(is_removed)
+    mesh0.add_cells(cells[is_removed])
+    mesh0.compact_cells()
+    assert_mesh_consistency(mesh0)
+
+    mesh1 = meshplex.MeshTri(
+        points, np.concatenate([cells[~is_removed], cells[is_removed]])
+    )
+    mesh1.create_edges()
+    assert_mesh_equality_up_to_edges(mesh0, mesh1)
+
+
+@pytest.mark.parametrize("cache_point_flags", [False, True])
+def test_add_cells_interior_edge(cache_point_flags):
+    points, cells = get_mesh()
+    mesh = meshplex.MeshTri(points, cells)
+    mesh.create_edges()
+    if cache_point_flags:
+        mesh.is_point_used
+
+    # a new cell on an interior edge would give that edge three cells
+    p0, p1 = mesh.edges["points"][mesh.interior_edges[0]]
+    (q,) = mesh.add_points([[2.0, 2.0]])
+    with pytest.raises(AssertionError, match="only share boundary edges"):
+        mesh.add_cells([[p0, p1, q]])
+
+
+def test_add_cells_growth():
+    # a strip of cells, added one by one
+    n = 100
+    k = np.arange(n + 2)
+    points = np.column_stack([k / n, k % 2])
+    mesh = meshplex.MeshTri(points, [[0, 1, 2]])
+    compute_all_entities(mesh)
+
+    buffers = [mesh.cells["points"].base]
+    for k in range(1, n):
+        mesh.add_cells([[k, k + 1, k + 2]])
+        if mesh.cells["points"].base is not buffers[-1]:
+            buffers.append(mesh.cells["points"].base)
+
+    # The arrays are allocated with spare capacity, so they're reallocated only
+    # every now and then.
+    assert len(mesh.cells["points"]) == n
+    assert len(buffers) <= 1 + np.ceil(np.log2(n))
+    assert_mesh_consistency(mesh)
+
+    mesh1 = meshplex.MeshTri(points, mesh.cells["points"])
+    mesh1.create_edges()
+    assert_mesh_equality_up_to_edges(mesh, mesh1)
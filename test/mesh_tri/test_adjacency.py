@@ -0,0 +1,59 @@
+import meshzoo
+import numpy as np
+
+import meshplex
+
+from ..helpers import assert_cells_neighbors, assert_points_adjacency
+
+
+def get_mesh():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.random.seed(0)
+    points = points[:, :2] + 0.04 * (2 * np.random.rand(len(points), 2) - 1)
+    return meshplex.MeshTri(points, cells)
+
+
+def test_adjacency_flip():
+    mesh = get_mesh()
+    assert_points_adjacency(mesh)
+    assert_cells_neighbors(mesh)
+    num_flips = mesh.flip_until_delaunay()
+    assert num_flips > 0
+    # the adjacency has been updated, not recomputed
+    assert_points_adjacency(mesh)
+    assert_cells_neighbors(mesh)
+
+
+def test_adjacency_remove_cells():
+    mesh = get_mesh()
+    mesh.max_dead_fraction = 1.0
+    assert_points_adjacency(mesh)
+    assert_cells_neighbors(mesh)
+
+    is_removed = np.linalg.norm(mesh.cell_centroids - 0.5, axis=1) < 0.2
+    mesh.remove_cells(is_removed)
+    assert_points_adjacency(mesh)
+    assert_cells_neighbors(mesh)
+
+    mesh.compact_cells()
+    assert_points_adjacency(mesh)
+    assert_cells_neighbors(mesh)
+
+    mesh.max_dead_fraction = 0.0
+    mesh.remove_cells(np.linalg.norm(mesh.cell_centroids, axis=1) < 0.3)
+    assert_points_adjacency(mesh)
+    assert_cells_neighbors(mesh)
+    mesh.flip_until_delaunay()
+    assert_points_adjacency(mesh)
+    assert_cells_neighbors(mesh)
+
+
+def test_adjacency_add_cells():
+    mesh = get_mesh()
+    cells = mesh.cells["points"].copy()
+    mesh.remove_cells(np.arange(10))
+    assert_points_adjacency(mesh)
+    assert_cells_neighbors(mesh)
+    mesh.add_cells(cells[:10])
+    assert_points_adjacency(mesh)
+    assert_cells_neighbors(mesh)
@@ -0,0 +1,71 @@
+import meshzoo
+import numpy as np
+import pytest
+
+import meshplex
+from meshplex.base import _SimplexMesh
+
+
+def get_mesh():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.random.seed(0)
+    points = points[:, :2]
+    is_interior = np.all((points > 0.0) & (points < 1.0), axis=1)
+    points[is_interior] += 0.03 * (2 * np.random.rand(np.sum(is_interior), 2) - 1)
+    return meshplex.MeshTri(points, cells)
+
+
+def test_stiffness_matrix():
+    mesh = get_mesh()
+    K = mesh.get_stiffness_matrix()
+    assert abs(K - K.T).max() < 1.0e-14
+    assert np.all(np.abs(K @ np.ones(len(mesh.points))) < 1.0e-13)
+    # the integral of |grad(u)|^2 for a linear function u
+    u = mesh.points @ [1.0, 2.0]
+    assert abs(u @ K @ u - 5.0) < 1.0e-13
+
+    # The P1 stiffness matrix equals the finite-volume Laplacian (cotangent formula)
+    # and the generic stiffness matrices.
+    assert abs(K - mesh.get_laplacian()).max() < 1.0e-13
+    ref = mesh.assemble(_SimplexMesh.compute_stiffness_matrices(mesh))
+    assert abs(K - ref).max() < 1.0e-13
+
+
+def test_mass_matrix():
+    mesh = get_mesh()
+    M = mesh.get_mass_matrix()
+    ones = np.ones(len(mesh.points))
+    x = mesh.points[:, 0]
+    assert abs(ones @ M @ ones - 1.0) < 1.0e-14
+    assert abs(x @ M @ ones - 0.5) < 1.0e-14
+    assert abs(x @ M @ x - 1.0 / 3.0) < 1.0e-2
+
+    ML = mesh.get_mass_matrix(lumped=True)
+    assert np.all(np.abs(ML.diagonal() - M @ ones) < 1.0e-14)
+    assert ML.nnz == len(mesh.points)
+
+
+@pytest.mark.parametrize("max_dead_fraction", [0.0, 1.0])
+def test_assemble_update(max_dead_fraction):
+    mesh = get_mesh()
+    mesh.max_dead_fraction = max_dead_fraction
+    mesh.get_mass_matrix()
+    pattern = mesh._matrix_pattern
+
+    # the scatter map is reused after moving points
+    points = mesh.points.copy()
+    points[60] += [0.01, 0.02]
+    mesh.set_points(points)
+    M = mesh.get_mass_matrix()
+    assert mesh._matrix_pattern is pattern
+    ref = meshplex.MeshTri(mesh.points, mesh.cells["points"]).get_mass_matrix()
+    assert abs(M - ref).max() < 1.0e-14
+
+    # removed cells don't contribute
+    mesh.remove_cells(np.linalg.norm(mesh.cell_centroids - 0.5, axis=1) < 0.2)
+    M = mesh.get_mass_matrix()
+    K = mesh.get_stiffness_matrix()
+    mesh.compact_cells()
+    mesh1 = meshplex.MeshTri(mesh.points, mesh.cells["points"])
+    assert abs(M - mesh1.get_mass_matrix()).max() < 1.0e-14
+    assert abs(K - mesh1.get_stiffness_matrix()).max() < 1.0e-13
@@ -0,0 +1,97 @@
+import re
+
+import meshzoo
+import numpy as np
+import pytest
+
+import meshplex
+
+
+@pytest.mark.parametrize("memory_budget", [None, 2 ** 12])
+def test_batched(memory_budget):
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.random.seed(0)
+    points = np.array(
+        [
+            points[:, :2] + 0.02 * (2 * np.random.rand(len(points), 2) - 1)
+            for _ in range(4)
+        ]
+    )
+
+    mesh = meshplex.MeshTri(points, cells)
+    mesh.memory_budget = memory_budget
+    assert mesh.num_batches == 4
+    assert mesh.half_edge_coords.shape == (3, 4, len(cells), 2)
+    assert mesh.cell_volumes.shape == (4, len(cells))
+    assert mesh.control_volumes.shape == (4, points.shape[1])
+
+    for b, pts in enumerate(points):
+        ref = meshplex.MeshTri(pts, cells)
+        tol = 1.0e-14
+        assert np.all(mesh.half_edge_coords[:, b] == ref.half_edge_coords)
+        assert np.allclose(mesh.ei_dot_ej[:, b], ref.ei_dot_ej, rtol=tol, atol=tol)
+        assert np.allclose(mesh.cell_volumes[b], ref.cell_volumes, rtol=tol, atol=tol)
+        assert np.allclose(mesh.ce_ratios[:, b], ref.ce_ratios, rtol=tol, atol=tol)
+        assert np.allclose(
+            mesh.control_volumes[b], ref.control_volumes, rtol=tol, atol=tol
+        )
+        assert np.allclose(
+            mesh.q_radius_ratio[b], ref.q_radius_ratio, rtol=tol, atol=tol
+        )
+        assert np.allclose(mesh.cell_inradius[b], ref.cell_inradius, rtol=tol, atol=tol)
+        assert np.allclose(
+            mesh.cell_circumradius[b], ref.cell_circumradius, rtol=tol, atol=tol
+        )
+
+    # update all states at once
+    mesh.points = points[::-1]
+    assert np.allclose(mesh.control_volumes[0], ref.control_volumes, rtol=tol, atol=tol)
+
+
+def test_batched_topology():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 5, 5)
+    ref = meshplex.MeshTri(points[:, :2], cells)
+    mesh = meshplex.MeshTri(np.array([points[:, :2], points[:, :2]]), cells)
+
+    # the topology doesn't care about the batch axis
+    assert np.all(mesh.is_boundary_point == ref.is_boundary_point)
+    assert np.all(mesh.is_interior_point == ref.is_interior_point)
+    assert np.all(mesh.is_point_used == ref.is_point_used)
+    assert mesh.euler_characteristic == ref.euler_characteristic
+    for key in ["offsets", "counts", "ids"]:
+        assert np.all(mesh.points_cells[key] == ref.points_cells[key])
+        assert np.all(mesh.points_points[key] == ref.points_points[key])
+
+
+@pytest.mark.parametrize(
+    "name, call",
+    [
+        ("get_control_volume_centroids()", lambda m: m.control_volume_centroids),
+        ("cell_circumcenters", lambda m: m.cell_circumcenters),
+        ("compute_centroids()", lambda m: m.cell_centroids),
+        ("ce_ratios_per_interior_edge", lambda m: m.ce_ratios_per_interior_edge),
+        ("compute_signed_cell_areas()", lambda m: m.signed_cell_areas),
+        ("get_laplacian()", lambda m: m.get_laplacian()),
+        ("compute_stiffness_matrices()", lambda m: m.get_stiffness_matrix()),
+        ("get_mass_matrix()", lambda m: m.get_mass_matrix(lumped=True)),
+        ("flip_until_delaunay()", lambda m: m.flip_until_delaunay()),
+        (
+            "set_points() with idx",
+            lambda m: m.set_points(m.points[:, :1] + 0.01, [0]),
+        ),
+        ("add_points()", lambda m: m.add_points([[1.1, 0.5]])),
+        ("add_cells()", lambda m: m.add_cells([[0, 1, 6]])),
+        ("remove_cells()", lambda m: m.remove_cells([0])),
+        ("locate()", lambda m: m.locate([[0.5, 0.5]])),
+        ("interpolate()", lambda m: m.interpolate(np.zeros(25), [[0.5, 0.5]])),
+        ("reorder()", lambda m: m.reorder()),
+        ("compact_points()", lambda m: m.compact_points()),
+    ],
+)
+def test_batched_unsupported(name, call):
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 5, 5)
+    mesh = meshplex.MeshTri(np.array([points[:, :2], points[:, :2]]), cells)
+    # this only works for a single point set
+    msg = re.escape(f"{name} does not support batched points")
+    with pytest.raises(AssertionError, match=msg):
+        call(mesh)
@@ -1,7 +1,9 @@
 import pathlib
 
 import meshio
+import meshzoo
 import numpy as np
+import pytest
 
 import meshplex
 
@@ -265,6 +267,113 @@ def test_flip_interior_to_boundary():
     assert np.all(mesh.is_boundary_cell)
 
 
+@pytest.mark.parametrize("float_dtype", [np.float64, np.float32])
+def test_flip_delaunay_float_dtype(float_dtype):
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 21, 21)
+    np.random.seed(1)
+    points += 3.0e-2 * np.random.rand(*points.shape)
+
+    mesh = meshplex.MeshTri(points, cells, float_dtype=float_dtype)
+    compute_all_entities(mesh)
+    assert mesh.num_delaunay_violations() == 217
+
+    assert mesh.flip_until_delaunay() == 217
+    assert mesh.num_delaunay_violations() == 0
+    assert_mesh_consistency(mesh)
+
+
+def test_select_flip_edges():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 21, 21)
+    np.random.seed(2)
+    points += 4.0e-2 * np.random.rand(*points.shape)
+    mesh = meshplex.MeshTri(points, cells)
+    mesh.create_edges()
+
+    ce = mesh.ce_ratios_per_interior_edge
+    is_candidate = ce < 0.0
+    is_selected = np.zeros(len(ce), dtype=bool)
+    is_selected[mesh._select_flip_edges(np.where(is_candidate)[0])] = True
+
+    # at most one flip per cell
+    adj_cells = mesh.edges_cells["interior"][1:3]
+    _, counts = np.unique(adj_cells[:, is_selected], return_counts=True)
+    assert np.all(counts == 1)
+
+    # Every candidate which isn't selected shares a cell with a selected edge with a
+    # smaller ce_ratio (i.e., the selection is maximal).
+    selected_ce = np.full(len(mesh.cells["points"]), np.inf)
+    selected_ce[adj_cells[:, is_selected]] = ce[is_selected]
+    is_skipped = is_candidate & ~is_selected
+    assert np.sum(is_skipped) > 0
+    min_selected_ce = np.min(selected_ce[adj_cells[:, is_skipped]], axis=0)
+    assert np.all(min_selected_ce <= ce[is_skipped])
+
+
+def test_flip_delaunay_local():
+    """Only a few violations in a larger mesh; only the edges around the flipped cells
+    are tested again."""
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 31, 31)
+    np.random.seed(3)
+    idx = np.random.choice(np.where(~np.any(points % 1.0 == 0.0, axis=1))[0], 5)
+    points[idx] += 1.0e-2 * (2 * np.random.rand(len(idx), 2) - 1)
+    mesh = meshplex.MeshTri(points, cells)
+    compute_all_entities(mesh)
+    assert mesh.num_delaunay_violations() > 0
+
+    mesh.flip_until_delaunay()
+    assert mesh.num_delaunay_violations() == 0
+    assert_mesh_consistency(mesh)
+
+    # the ce_ratios per interior edge have been kept up to date
+    ref = mesh.ce_ratios_per_interior_edge.copy()
+    mesh._interior_ce_ratios = None
+    assert np.all(np.abs(mesh.ce_ratios_per_interior_edge - ref) < 1.0e-14)
+
+
+def test_flip_keep_caches():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.random.seed(4)
+    points += 3.0e-2 * np.random.rand(*points.shape)
+    mesh = meshplex.MeshTri(points, cells)
+    compute_all_entities(mesh)
+
+    class Subdomain:
+        is_boundary_only = False
+
+        def is_inside(self, x):
+            return x[0] < 0.5
+
+    sd = Subdomain()
+    mesh.get_cell_mask(sd)
+    mesh.edge_lengths
+
+    assert mesh.flip_until_delaunay() > 0
+
+    # nothing has been reset
+    assert sd in mesh.subdomains
+    assert mesh._control_volumes is not None
+    assert mesh._cv_centroids is not None
+    assert mesh._cell_centroids is not None
+    assert mesh._signed_cell_areas is not None
+    assert mesh._cell_circumcenters is not None
+    assert mesh._edge_lengths is not None
+
+    mesh2 = meshplex.MeshTri(mesh.points.copy(), mesh.cells["points"].copy())
+    assert np.all(np.abs(mesh.cell_volumes - mesh2.cell_volumes) < 1.0e-14)
+    assert np.all(np.abs(mesh.cell_centroids - mesh2.cell_centroids) < 1.0e-14)
+    assert np.all(
+        np.abs(mesh.cell_circumcenters - mesh2.cell_circumcenters) < 1.0e-14
+    )
+    assert np.all(np.abs(mesh.signed_cell_areas - mesh2.signed_cell_areas) < 1.0e-14)
+    assert np.all(np.abs(mesh.edge_lengths - mesh2.edge_lengths) < 1.0e-14)
+    assert np.all(np.abs(mesh.control_volumes - mesh2.control_volumes) < 1.0e-14)
+    assert np.all(
+        np.abs(mesh.control_volume_centroids - mesh2.control_volume_centroids)
+        < 1.0e-14
+    )
+    assert np.all(mesh.get_cell_mask(sd) == mesh2.get_cell_mask(sd))
+
+
 def test_flip_delaunay():
     np.random.seed(123)
     mesh0 = meshio.read(this_dir / ".." / "meshes" / "pacman.vtk")
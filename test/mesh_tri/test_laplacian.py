@@ -0,0 +1,82 @@
+import meshzoo
+import numpy as np
+
+import meshplex
+
+
+def get_mesh():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    return meshplex.MeshTri(points[:, :2], cells)
+
+
+def test_laplacian():
+    mesh = get_mesh()
+    L = mesh.get_laplacian()
+    assert L.shape == (len(mesh.points), len(mesh.points))
+    assert abs(L - L.T).max() < 1.0e-14
+    assert np.all(np.abs(L @ np.ones(len(mesh.points))) < 1.0e-14)
+
+    # linear functions are in the kernel (at interior points), and for quadratic ones,
+    # the approximation of -Δu is exact
+    x = mesh.points
+    is_interior = mesh.is_interior_point
+    assert np.all(np.abs(L @ x[:, 0])[is_interior] < 1.0e-14)
+    u = np.sum(x ** 2, axis=1)
+    ref = -4.0 * mesh.control_volumes
+    assert np.all(np.abs((L @ u) - ref)[is_interior] < 1.0e-14)
+
+
+def test_laplacian_update():
+    mesh = get_mesh()
+    mesh.get_laplacian()
+    pattern = mesh._matrix_pattern
+
+    # move the interior points; only the values are recomputed
+    np.random.seed(0)
+    is_interior = mesh.is_interior_point
+    step = np.median(mesh.cell_inradius)
+    points = mesh.points[is_interior]
+    points += step * (2 * np.random.rand(len(points), 2) - 1)
+    mesh.set_points(points, is_interior)
+    L = mesh.get_laplacian()
+    assert mesh._matrix_pattern is pattern
+    ref = meshplex.MeshTri(mesh.points, mesh.cells["points"]).get_laplacian()
+    assert abs(L - ref).max() < 1.0e-14
+
+    # flips change the sparsity pattern
+    assert mesh.flip_until_delaunay() > 0
+    L = mesh.get_laplacian()
+    ref = meshplex.MeshTri(mesh.points, mesh.cells["points"]).get_laplacian()
+    assert abs(L - ref).max() < 1.0e-14
+
+    # removed cells don't contribute
+    mesh.max_dead_fraction = 1.0
+    mesh.remove_cells(np.linalg.norm(mesh.cell_centroids - 0.5, axis=1) < 0.2)
+    L = mesh.get_laplacian()
+    mesh.compact_cells()
+    ref = meshplex.MeshTri(mesh.points, mesh.cells["points"]).get_laplacian()
+    assert abs(L - ref).max() < 1.0e-14
+
+
+def test_laplacian_add_points():
+    mesh = get_mesh()
+    mesh.get_laplacian()
+    mesh.get_stiffness_matrix()
+
+    # the new point isn't part of any cell yet; its rows are empty
+    mesh.add_points([[1.1, 0.5]])
+    n = len(mesh.points)
+    L = mesh.get_laplacian()
+    assert L.shape == (n, n)
+    assert abs(L[n - 1]).sum() == 0.0
+    assert mesh.get_stiffness_matrix().shape == (n, n)
+
+    # attach it to the boundary
+    is_right = np.abs(mesh.points[:-1, 0] - 1.0) < 1.0e-10
+    r = np.where(is_right)[0]
+    r = r[np.argsort(mesh.points[r, 1])]
+    k = np.argmin(np.abs(mesh.points[r, 1] - 0.5))
+    mesh.add_cells([[r[k], n - 1, r[k + 1]]])
+    L = mesh.get_laplacian()
+    ref = meshplex.MeshTri(mesh.points, mesh.cells["points"]).get_laplacian()
+    assert abs(L - ref).max() < 1.0e-14
@@ -0,0 +1,174 @@
+import meshzoo
+import numpy as np
+import pytest
+
+import meshplex
+
+
+def get_mesh():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.random.seed(0)
+    points = points[:, :2]
+    is_interior = np.all((points > 0.0) & (points < 1.0), axis=1)
+    points[is_interior] += 0.03 * (2 * np.random.rand(np.sum(is_interior), 2) - 1)
+    return meshplex.MeshTri(points, cells)
+
+
+def assert_located(mesh, x, cell_ids, bary):
+    is_found = cell_ids >= 0
+    assert np.all(np.isnan(bary[~is_found]))
+    assert np.all(bary[is_found] > -1.0e-12)
+    assert np.all(np.abs(np.sum(bary[is_found], axis=1) - 1.0) < 1.0e-12)
+    p = mesh.points[mesh.cells["points"][cell_ids[is_found]]]
+    x_ref = np.einsum("ij,ijk->ik", bary[is_found], p)
+    assert np.all(np.abs(x_ref - x[is_found]) < 1.0e-12)
+
+
+def test_locate():
+    mesh = get_mesh()
+    np.random.seed(1)
+    x = 1.2 * np.random.rand(1000, 2) - 0.1
+    cell_ids, bary = mesh.locate(x)
+    assert_located(mesh, x, cell_ids, bary)
+    is_inside = np.all((x >= 0.0) & (x <= 1.0), axis=1)
+    assert np.all((cell_ids >= 0) == is_inside)
+
+    # the barycentric coordinates agree with the generic ones
+    ref = meshplex.base._SimplexMesh.compute_barycentric_coordinates(
+        mesh, x[is_inside], cell_ids[is_inside]
+    )
+    assert np.all(np.abs(bary[is_inside] - ref) < 1.0e-12)
+
+    # the points of the mesh itself, including the corners
+    cell_ids, bary = mesh.locate(mesh.points)
+    assert np.all(cell_ids >= 0)
+    assert np.all(np.abs(np.max(bary, axis=1) - 1.0) < 1.0e-12)
+
+
+def test_locate_update():
+    mesh = get_mesh()
+    np.random.seed(1)
+    x = np.random.rand(1000, 2)
+    mesh.locate(x)
+
+    # move the interior points such that edges need to be flipped
+    is_interior = mesh.is_interior_point
+    step = np.median(mesh.cell_inradius)
+    points = mesh.points[is_interior]
+    points += step * (2 * np.random.rand(len(points), 2) - 1)
+    mesh.set_points(points, is_interior)
+    assert mesh.flip_until_delaunay() > 0
+    cell_ids, bary = mesh.locate(x)
+    assert_located(mesh, x, cell_ids, bary)
+    assert np.all(cell_ids >= 0)
+
+    # points in removed cells aren't found anymore
+    mesh.max_dead_fraction = 1.0
+    is_removed = np.linalg.norm(mesh.cell_centroids - 0.5, axis=1) < 0.2
+    mesh.remove_cells(is_removed)
+    cell_ids, bary = mesh.locate(x)
+    assert_located(mesh, x, cell_ids, bary)
+    assert not np.any(is_removed[cell_ids[cell_ids >= 0]])
+    assert np.all(cell_ids[np.linalg.norm(x - 0.5, axis=1) < 0.05] == -1)
+
+    mesh.compact_cells()
+    cell_ids2, bary2 = mesh.locate(x)
+    assert np.all((cell_ids >= 0) == (cell_ids2 >= 0))
+    assert_located(mesh, x, cell_ids2, bary2)
+
+
+def test_interpolate():
+    mesh = get_mesh()
+    np.random.seed(1)
+    x = 1.2 * np.random.rand(1000, 2) - 0.1
+    is_inside = np.all((x >= 0.0) & (x <= 1.0), axis=1)
+
+    # linear functions are interpolated exactly, several at once
+    def f(x):
+        return np.column_stack([1.0 + 2.0 * x[:, 0] - x[:, 1], 3.0 * x[:, 1]])
+
+    vals = mesh.interpolate(f(mesh.points), x)
+    assert vals.shape == (len(x), 2)
+    assert np.all(np.abs(vals[is_inside] - f(x[is_inside])) < 1.0e-12)
+    assert np.all(np.isnan(vals[~is_inside]))
+
+    vals0 = mesh.interpolate(f(mesh.points)[:, 0], x)
+    assert vals0.shape == (len(x),)
+    assert np.all(np.abs(vals0[is_inside] - vals[is_inside, 0]) < 1.0e-14)
+
+    A = mesh.get_interpolation_matrix(x)
+    assert A.shape == (len(x), len(mesh.points))
+    assert np.all(np.abs(A @ f(mesh.points) - vals)[is_inside] < 1.0e-14)
+    assert np.all(A[~is_inside].sum(axis=1) == 0.0)
+
+
+def test_transfer():
+    mesh = get_mesh()
+    points, cells = meshzoo.rectangle(-0.1, 0.7, 0.2, 1.1, 15, 12)
+    target = meshplex.MeshTri(points[:, :2], cells)
+    is_inside = np.all((target.points >= 0.0) & (target.points <= 1.0), axis=1)
+
+    def f(x):
+        return np.column_stack([1.0 + 2.0 * x[:, 0] - x[:, 1], 3.0 * x[:, 1]])
+
+    vals = mesh.transfer(f(mesh.points), target)
+    assert np.all(np.abs(vals[is_inside] - f(target.points[is_inside])) < 1.0e-12)
+    assert np.all(np.isnan(vals[~is_inside]))
+    matrix = mesh._cell_grid["transfer"][target][1]
+
+    # the interpolation matrix is reused ...
+    vals = mesh.transfer(f(mesh.points)[:, 1], target)
+    assert mesh._cell_grid["transfer"][target][1] is matrix
+    ref = 3.0 * target.points[is_inside, 1]
+    assert np.all(np.abs(vals[is_inside] - ref) < 1.0e-12)
+
+    # ... until the target points move
+    target.set_points(target.points[0] + [0.2, 0.0], [0])
+    vals = mesh.transfer(f(mesh.points), target)
+    assert mesh._cell_grid["transfer"][target][1] is not matrix
+    is_inside[0] = True
+    assert np.all(np.abs(vals[is_inside] - f(target.points[is_inside])) < 1.0e-12)
+
+
+def test_transfer_int():
+    mesh = get_mesh()
+    points, cells = meshzoo.rectangle(-0.1, 0.7, 0.2, 1.1, 15, 12)
+    target = meshplex.MeshTri(points[:, :2], cells)
+    is_inside = np.all((target.points >= 0.0) & (target.points <= 1.0), axis=1)
+
+    # integer data is interpolated in floating point
+    vals = mesh.transfer(np.full((len(mesh.points), 2), 3), target)
+    assert np.issubdtype(vals.dtype, np.floating)
+    assert vals.shape == (len(target.points), 2)
+    assert np.all(np.abs(vals[is_inside] - 3.0) < 1.0e-12)
+    assert np.all(np.isnan(vals[~is_inside]))
+
+
+@pytest.mark.parametrize("max_dead_fraction", [0.0, 0.5])
+def test_transfer_remove_add_cells(max_dead_fraction):
+    mesh = get_mesh()
+    mesh.max_dead_fraction = max_dead_fraction
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 15, 12)
+    target = meshplex.MeshTri(points[:, :2], cells)
+    data = 1.0 + mesh.points[:, 0] - 2.0 * mesh.points[:, 1]
+
+    # populate the cache
+    vals = mesh.transfer(data, target)
+    assert not np.any(np.isnan(vals))
+
+    # the transferred values must not come from removed cells ...
+    cells = mesh.cells["points"][:4].copy()
+    mesh.remove_cells([0, 1, 2, 3])
+    vals = mesh.transfer(data, target)
+    ref = mesh.interpolate(data, target.points)
+    assert np.any(np.isnan(ref))
+    assert np.array_equal(np.isnan(vals), np.isnan(ref))
+    is_inside = ~np.isnan(ref)
+    assert np.all(np.abs(vals[is_inside] - ref[is_inside]) < 1.0e-12)
+
+    # ... but from the added ones
+    mesh.add_cells(cells)
+    vals = mesh.transfer(data, target)
+    ref = mesh.interpolate(data, target.points)
+    assert not np.any(np.isnan(vals))
+    assert np.all(np.abs(vals - ref) < 1.0e-12)
@@ -2,14 +2,18 @@ import os
 import pathlib
 import platform
 import tempfile
+import tracemalloc
+from math import fsum
 
 import meshio
+import meshzoo
 import numpy as np
 import pytest
 
 import meshplex
 
 from ..helpers import assert_norms, is_near_equal, run
+from .helpers import assert_mesh_equality, compute_all_entities
 
 this_dir = pathlib.Path(__file__).resolve().parent
 
@@ -108,6 +112,66 @@ def test_unit_triangle(cells_dtype):
     os.remove(filename)
 
 
+@pytest.mark.parametrize(
+    "index_dtype,ref_dtype",
+    [(None, np.int32), (np.int64, np.int64), (np.int32, np.int32)],
+)
+def test_index_dtype(index_dtype, ref_dtype):
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 5, 5)
+    mesh = meshplex.MeshTri(points, cells.astype(np.int64), index_dtype=index_dtype)
+    mesh.create_edges()
+    assert mesh.index_dtype == ref_dtype
+    assert mesh.cells["points"].dtype == ref_dtype
+    assert mesh.idx_hierarchy.dtype == ref_dtype
+    assert mesh.cells["edges"].dtype == ref_dtype
+    assert mesh.edges["points"].dtype == ref_dtype
+    assert mesh.edges_cells["boundary"].dtype == ref_dtype
+    assert mesh.edges_cells["interior"].dtype == ref_dtype
+    assert mesh.edges_cells_idx.dtype == ref_dtype
+
+    mesh.remove_cells(np.array([0, 3], dtype=ref_dtype))
+    assert mesh.cells["edges"].dtype == ref_dtype
+    assert mesh.edges_cells["boundary"].dtype == ref_dtype
+    assert mesh.edges_cells["interior"].dtype == ref_dtype
+
+
+def test_memmap_input(tmp_path):
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.save(tmp_path / "points.npy", points[:, :2])
+    np.save(tmp_path / "cells.npy", cells.astype(np.int64))
+    points = np.load(tmp_path / "points.npy", mmap_mode="r")
+    cells = np.load(tmp_path / "cells.npy", mmap_mode="r")
+
+    mesh = meshplex.MeshTri(points, cells, index_dtype=cells.dtype)
+    # nothing is copied
+    assert np.shares_memory(mesh.points, points)
+    assert np.shares_memory(mesh.cells["points"], cells)
+    mesh.control_volumes
+    assert mesh._idx_hierarchy is None
+
+    ref = meshplex.MeshTri(np.array(points), np.array(cells))
+    assert np.all(mesh.control_volumes == ref.control_volumes)
+
+    # memory-mapped cells keep their integer type by default ...
+    mesh = meshplex.MeshTri(points, cells)
+    assert mesh.index_dtype == np.int64
+    assert np.shares_memory(mesh.cells["points"], cells)
+    # ... and so do those from load_state()
+    mesh.create_edges()
+    mesh.save_state(tmp_path / "mesh.npz")
+    mesh = meshplex.MeshTri.load_state(tmp_path / "mesh.npz")
+    assert mesh.index_dtype == np.int64
+    assert mesh.edges["points"].dtype == np.int64
+    # in-memory cells don't
+    assert ref.index_dtype == np.int32
+
+    # sort_cells works on read-only input, too
+    mesh = meshplex.MeshTri(points, cells, sort_cells=True)
+    ref = np.sort(cells, axis=1)
+    ref = ref[ref[:, 0].argsort()]
+    assert np.all(mesh.cells["points"] == ref)
+
+
 def test_regular_tri_additional_points():
     points = np.array(
         [
@@ -476,6 +540,112 @@ def test_pacman():
     assert mesh.num_delaunay_violations() == 0
 
 
+@pytest.mark.parametrize("n", [21, 101])
+def test_float_dtype(n):
+    """In single precision, the errors relative to the largest value of each
+    quantity are of the order of 1.0e-7 * (coordinate magnitude / edge length), so
+    they grow as the mesh is refined.
+    """
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, n, n)
+    np.random.seed(0)
+    points += 0.2 / (n - 1) * np.random.rand(*points.shape)
+    tol = 5.0e-7 * (n - 1)
+
+    mesh64 = meshplex.MeshTri(points, cells)
+    mesh32 = meshplex.MeshTri(points, cells, float_dtype=np.float32)
+    assert mesh32.float_dtype == np.float32
+    assert mesh32.points.dtype == np.float32
+
+    for name in [
+        "ei_dot_ej",
+        "cell_volumes",
+        "ce_ratios",
+        "cell_circumcenters",
+        "control_volumes",
+        "control_volume_centroids",
+    ]:
+        val32 = getattr(mesh32, name)
+        val64 = getattr(mesh64, name)
+        assert val32.dtype == np.float32
+        assert np.all(np.abs(val32 - val64) < tol * np.max(np.abs(val64)))
+
+    # the Delaunay test is done in float64
+    ce32 = mesh32.ce_ratios_per_interior_edge
+    ce64 = mesh64.ce_ratios_per_interior_edge
+    assert np.all(np.abs(ce32 - ce64) < tol * np.max(np.abs(ce64)))
+
+    vol = fsum(mesh64.cell_volumes)
+    assert abs(fsum(mesh32.cell_volumes) - vol) < 1.0e-6 * vol
+    assert abs(fsum(mesh32.control_volumes) - vol) < 1.0e-6 * vol
+
+
+def test_memory_budget():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 101, 101)
+    mesh0 = meshplex.MeshTri(points, cells)
+    mesh1 = meshplex.MeshTri(points, cells)
+    mesh1.memory_budget = 2 ** 16
+
+    tracemalloc.start()
+    half_edge_coords = mesh1.half_edge_coords
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # one output plus one block of temporaries
+    assert peak < half_edge_coords.nbytes + 2 * mesh1.memory_budget
+
+    assert np.array_equal(mesh0.half_edge_coords, half_edge_coords)
+    assert np.all(
+        np.abs(mesh0.control_volume_centroids - mesh1.control_volume_centroids)
+        < 1.0e-14
+    )
+
+    cell_mask = np.zeros(len(cells), dtype=bool)
+    cell_mask[::7] = True
+    assert np.all(
+        np.abs(
+            mesh0.get_control_volume_centroids(cell_mask)
+            - mesh1.get_control_volume_centroids(cell_mask)
+        )
+        < 1.0e-14
+    )
+
+
+def test_num_workers():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 51, 51)
+    np.random.seed(0)
+    points += 1.0e-3 * np.random.rand(*points.shape)
+    mesh0 = meshplex.MeshTri(points, cells)
+    mesh1 = meshplex.MeshTri(points, cells)
+    mesh1.num_workers = 3
+    # small blocks
+    mesh1.memory_budget = 2 ** 17
+    assert len(mesh1._cell_blocks(100)) > 1
+
+    for name in [
+        "half_edge_coords",
+        "ei_dot_ei",
+        "ei_dot_ej",
+        "edge_lengths",
+        "cell_volumes",
+        "ce_ratios",
+        "cell_partitions",
+        "cell_circumcenters",
+        "angles",
+        "q_radius_ratio",
+    ]:
+        assert np.array_equal(getattr(mesh0, name), getattr(mesh1, name))
+
+    # The sums over the cells depend on the blocks, but only via the memory budget.
+    mesh2 = meshplex.MeshTri(points, cells)
+    mesh2.memory_budget = mesh1.memory_budget
+    assert np.array_equal(
+        mesh1.control_volume_centroids, mesh2.control_volume_centroids
+    )
+    assert np.all(
+        np.abs(mesh0.control_volume_centroids - mesh1.control_volume_centroids)
+        < 1.0e-14
+    )
+
+
 def test_shell():
     points = np.array(
         [
@@ -694,6 +864,26 @@ def test_set_points():
     assert np.all(np.abs(ref - mesh2.cell_volumes) < 1.0e-10)
 
 
+def test_set_points_subset():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 8, 8)
+    mesh = meshplex.MeshTri(points, cells)
+    compute_all_entities(mesh)
+
+    np.random.seed(0)
+    idx = np.array([10, 20, 21, 35])
+    new_points = mesh.points[idx] + 1.0e-2 * np.random.rand(len(idx), 2)
+    mesh.set_points(new_points, idx)
+
+    # all cached values must still be there
+    assert mesh._half_edge_coords is not None
+    assert mesh._control_volumes is not None
+    assert mesh._cv_centroids is not None
+
+    mesh2 = meshplex.MeshTri(mesh.points.copy(), mesh.cells["points"].copy())
+    mesh2.create_edges()
+    assert_mesh_equality(mesh, mesh2)
+
+
 def test_reference_vals_pacman():
     mesh = meshplex.read(this_dir / ".." / "meshes" / "pacman.vtk")
     mesh = meshplex.MeshTri(mesh.points[:, :2], mesh.cells["points"])
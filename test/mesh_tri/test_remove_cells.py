@@ -1,11 +1,19 @@
 import pathlib
+import warnings
 
+import meshzoo
 import numpy as np
 import pytest
 
 import meshplex
 
-from .helpers import assert_mesh_consistency, assert_mesh_equality, compute_all_entities
+from ..helpers import assert_points_adjacency
+from .helpers import (
+    assert_interior_ce_ratios_equality,
+    assert_mesh_consistency,
+    assert_mesh_equality,
+    compute_all_entities,
+)
 
 
 def get_mesh0():
@@ -162,5 +170,199 @@ def test_reference(mesh0, remove_cells):
     assert_mesh_equality(mesh0, mesh1)
 
 
+def test_remove_cells_lazy():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    mesh0 = meshplex.MeshTri(points, cells)
+    mesh1 = meshplex.MeshTri(points, cells)
+    # only mark the cells as removed
+    mesh1.max_dead_fraction = 1.0
+    compute_all_entities(mesh0)
+    compute_all_entities(mesh1)
+    num_cells = len(mesh1.cells["points"])
+
+    for remove in [
+        lambda mesh: mesh.cell_centroids[:, 0] < 0.2,
+        lambda mesh: mesh.cell_centroids[:, 1] > 0.7,
+        # interior cells
+        lambda mesh: np.all(np.abs(mesh.cell_centroids - 0.5) < 0.1, axis=1),
+    ]:
+        n0 = mesh0.remove_cells(remove(mesh0))
+        n1 = mesh1.remove_cells(remove(mesh1))
+        assert n0 == n1
+        assert len(mesh1.cells["points"]) == num_cells
+
+        assert mesh0.euler_characteristic == mesh1.euler_characteristic
+        assert np.all(mesh0.is_point_used == mesh1.is_point_used)
+        assert np.all(mesh0.is_boundary_point == mesh1.is_boundary_point)
+        assert np.all(mesh0.is_interior_point == mesh1.is_interior_point)
+        assert np.sum(mesh0.is_boundary_cell) == np.sum(mesh1.is_boundary_cell)
+        assert np.all(np.abs(mesh0.control_volumes - mesh1.control_volumes) < 1.0e-14)
+        ipu = mesh0.is_point_used
+        assert np.all(
+            np.abs(
+                mesh0.control_volume_centroids[ipu]
+                - mesh1.control_volume_centroids[ipu]
+            )
+            < 1.0e-14
+        )
+        # the interior edges may be in a different order; compare by edge
+        assert_interior_ce_ratios_equality(mesh0, mesh1)
+
+    mesh1.compact_cells()
+    assert len(mesh1.cells["points"]) == len(mesh0.cells["points"])
+    assert_mesh_consistency(mesh1)
+    assert_mesh_equality(mesh0, mesh1)
+
+
+@pytest.mark.parametrize("max_dead_fraction", [0.0, 1.0])
+def test_remove_cells_keep_caches(max_dead_fraction):
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.random.seed(0)
+    points[:, :2] += 0.02 * (2 * np.random.rand(len(points), 2) - 1)
+    mesh0 = meshplex.MeshTri(points[:, :2], cells)
+    mesh0.max_dead_fraction = max_dead_fraction
+    compute_all_entities(mesh0)
+
+    mesh0.remove_cells(mesh0.cell_centroids[:, 0] < 0.2)
+    mesh0.flip_until_delaunay()
+    # remove a corner and some interior cells
+    mesh0.remove_cells(np.linalg.norm(mesh0.cell_centroids - 1.0, axis=1) < 0.3)
+    mesh0.remove_cells(np.linalg.norm(mesh0.cell_centroids - 0.6, axis=1) < 0.1)
+
+    # The cached values are updated, not recomputed
+    assert mesh0._control_volumes is not None
+    assert mesh0._cv_centroids is not None
+    assert mesh0._interior_ce_ratios is not None
+    assert mesh0._is_point_used is not None
+    assert mesh0._is_boundary_point is not None
+    assert mesh0._is_interior_point is not None
+
+    mesh0.compact_cells()
+    assert_mesh_consistency(mesh0)
+
+    # The edges were flipped, so their order is different from a fresh mesh. Only
+    # compare the point data.
+    mesh1 = meshplex.MeshTri(mesh0.points, mesh0.cells["points"])
+    assert np.all(mesh0.is_point_used == mesh1.is_point_used)
+    assert np.all(mesh0.is_boundary_point == mesh1.is_boundary_point)
+    assert np.all(mesh0.is_interior_point == mesh1.is_interior_point)
+    assert np.all(np.abs(mesh0.control_volumes - mesh1.control_volumes) < 1.0e-14)
+    ipu = mesh1.is_point_used
+    assert np.all(
+        np.abs(
+            mesh0.control_volume_centroids[ipu] - mesh1.control_volume_centroids[ipu]
+        )
+        < 1.0e-14
+    )
+    assert_interior_ce_ratios_equality(mesh0, mesh1)
+
+
+def test_remove_boundary_cells():
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    mesh0 = meshplex.MeshTri(points, cells)
+    mesh1 = meshplex.MeshTri(points, cells)
+    compute_all_entities(mesh0)
+    compute_all_entities(mesh1)
+
+    # peel off cells from the left until there are none left with x < 0.3
+    def criterion(mesh, is_boundary_cell):
+        return mesh.cell_centroids[is_boundary_cell, 0] < 0.3
+
+    num_removed = 0
+    while True:
+        idx = mesh0.is_boundary_cell.copy()
+        idx[idx] = criterion(mesh0, idx)
+        n = mesh0.remove_cells(idx)
+        if n == 0:
+            break
+        num_removed += n
+
+    assert mesh1.remove_boundary_cells(lambda is_bc: criterion(mesh1, is_bc)) == (
+        num_removed
+    )
+    assert_mesh_consistency(mesh1)
+    assert_mesh_equality(mesh0, mesh1)
+
+
+@pytest.mark.parametrize("max_dead_fraction", [0.0, 1.0])
+def test_remove_cells_orphaned_points(max_dead_fraction):
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.random.seed(0)
+    points = points[:, :2] + 0.02 * (2 * np.random.rand(len(points), 2) - 1)
+    mesh0 = meshplex.MeshTri(points, cells)
+    mesh0.max_dead_fraction = max_dead_fraction
+    mesh0.control_volumes
+    mesh0.control_volume_centroids
+
+    # the corner cells take their points with them
+    is_removed = np.linalg.norm(mesh0.cell_centroids - 1.0, axis=1) < 0.3
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        mesh0.remove_cells(is_removed)
+        mesh0.remove_boundary_cells(
+            lambda is_bc: mesh0.cell_centroids[is_bc, 1] < 0.05
+        )
+        cv0 = mesh0.control_volumes
+        cvc0 = mesh0.control_volume_centroids
+
+        live_cells = mesh0.cells["points"]
+        if mesh0._is_cell_dead is not None:
+            live_cells = live_cells[~mesh0._is_cell_dead]
+        mesh1 = meshplex.MeshTri(points, live_cells)
+        cv1 = mesh1.control_volumes
+        cvc1 = mesh1.control_volume_centroids
+
+    is_orphan = cv1 == 0.0
+    assert np.sum(is_orphan) > 0
+    assert np.all(cv0[is_orphan] == 0.0)
+    assert np.all(np.isnan(cvc0[is_orphan]))
+    assert np.all(np.isnan(cvc1[is_orphan]))
+    assert np.all(np.abs(cv0 - cv1) < 1.0e-14)
+    assert np.all(np.abs(cvc0[~is_orphan] - cvc1[~is_orphan]) < 1.0e-14)
+
+
+@pytest.mark.parametrize("max_dead_fraction", [0.0, 1.0])
+def test_compact_points(max_dead_fraction):
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.random.seed(0)
+    points = points[:, :2] + 0.02 * (2 * np.random.rand(len(points), 2) - 1)
+    mesh0 = meshplex.MeshTri(points, cells)
+    mesh0.max_dead_fraction = max_dead_fraction
+    compute_all_entities(mesh0)
+    mesh0.points_cells
+    mesh0.points_points
+
+    class Subdomain:
+        is_boundary_only = False
+
+        # pylint: disable=no-self-use
+        def is_inside(self, x):
+            return x[0] > 0.5
+
+    sd = Subdomain()
+    mesh0.get_vertex_mask(sd)
+
+    mesh0.remove_cells(np.linalg.norm(mesh0.cell_centroids - 1.0, axis=1) < 0.3)
+    is_used = mesh0.is_point_used.copy()
+    assert not np.all(is_used)
+
+    new_index = mesh0.compact_points()
+    assert np.all(new_index[~is_used] == -1)
+    assert np.all(new_index[is_used] == np.arange(np.sum(is_used)))
+    # the cached point data is kept
+    assert mesh0._control_volumes is not None
+    assert mesh0._is_boundary_point is not None
+    assert np.all(mesh0.subdomains[sd]["vertices"] == (mesh0.points[:, 0] > 0.5))
+    assert_mesh_consistency(mesh0)
+    assert_points_adjacency(mesh0)
+
+    mesh1 = meshplex.MeshTri(points[is_used], mesh0.cells["points"])
+    mesh1.create_edges()
+    assert_mesh_equality(mesh0, mesh1)
+
+    # nothing left to do
+    assert np.all(mesh0.compact_points() == np.arange(len(mesh0.points)))
+
+
 if __name__ == "__main__":
     test_remove_cells_boundary()
@@ -0,0 +1,49 @@
+import meshzoo
+import numpy as np
+import pytest
+
+import meshplex
+
+from ..helpers import assert_cells_neighbors
+from .helpers import (
+    assert_mesh_consistency,
+    assert_mesh_equality_up_to_edges,
+    compute_all_entities,
+)
+
+
+@pytest.mark.parametrize("method", ["morton", "rcm"])
+def test_reorder(method):
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.random.seed(0)
+    points = points[:, :2] + 0.02 * (2 * np.random.rand(len(points), 2) - 1)
+    # shuffle points and cells
+    p = np.random.permutation(len(points))
+    inv = np.empty_like(p)
+    inv[p] = np.arange(len(p))
+    points = points[p]
+    cells = inv[cells][np.random.permutation(len(cells))]
+
+    mesh0 = meshplex.MeshTri(points, cells)
+    compute_all_entities(mesh0)
+    mesh0.cells_neighbors
+    point_order, cell_order = mesh0.reorder(method)
+
+    assert np.all(np.sort(point_order) == np.arange(len(points)))
+    assert np.all(np.sort(cell_order) == np.arange(len(cells)))
+    assert_mesh_consistency(mesh0)
+    assert_cells_neighbors(mesh0)
+
+    # compare with a mesh created from the permuted data
+    new_index = np.empty_like(point_order)
+    new_index[point_order] = np.arange(len(point_order))
+    mesh1 = meshplex.MeshTri(points[point_order], new_index[cells[cell_order]])
+    mesh1.create_edges()
+    assert_mesh_equality_up_to_edges(mesh0, mesh1)
+
+    # the renumbering actually improves locality
+    def spread(mesh):
+        c = mesh.cells["points"]
+        return np.mean(np.max(c, axis=1) - np.min(c, axis=1))
+
+    assert spread(mesh0) < 0.5 * spread(meshplex.MeshTri(points, cells))
@@ -0,0 +1,43 @@
+import meshzoo
+import numpy as np
+import pytest
+
+import meshplex
+
+from .helpers import assert_mesh_equality, compute_all_entities
+
+
+@pytest.mark.parametrize("geometry", [False, True])
+def test_save_load_state(tmp_path, geometry):
+    points, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    np.random.seed(0)
+    points = points[:, :2] + 0.02 * (2 * np.random.rand(len(points), 2) - 1)
+    mesh0 = meshplex.MeshTri(points, cells)
+    compute_all_entities(mesh0)
+    mesh0.cells_neighbors
+
+    filename = tmp_path / "mesh.npz"
+    mesh0.save_state(filename, geometry=geometry)
+    mesh1 = meshplex.MeshTri.load_state(filename)
+
+    # the topology is read from the file, memory-mapped
+    for a in [mesh1.cells["edges"], mesh1.edges_cells["interior"]]:
+        assert isinstance(a.base, np.memmap)
+        assert not a.flags.writeable
+    assert mesh1._cells_neighbors is not None
+    assert (mesh1._control_volumes is not None) == geometry
+
+    assert_mesh_equality(mesh0, mesh1)
+    assert np.all(mesh0.edges_cells["interior"] == mesh1.edges_cells["interior"])
+    assert np.all(mesh0.edges_cells_idx == mesh1.edges_cells_idx)
+    assert np.all(mesh0.cells_neighbors == mesh1.cells_neighbors)
+
+    # copy-on-write allows modifications
+    mesh2 = meshplex.MeshTri.load_state(filename, mmap_mode="c")
+    mesh2.flip_until_delaunay()
+    mesh3 = meshplex.MeshTri(points, cells)
+    mesh3.flip_until_delaunay()
+    assert np.all(mesh2.cells["points"] == mesh3.cells["points"])
+
+    with pytest.raises(AssertionError):
+        meshplex.MeshTetra.load_state(filename)
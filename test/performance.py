@@ -9,7 +9,8 @@ from scipy.spatial import Delaunay
 import meshplex
 
 
-def setup(n):
+def create_disk_mesh(n):
+    """Delaunay mesh of random points in the unit disk with `n` boundary points."""
     radius = 1.0
     k = np.arange(n)
     boundary_pts = radius * np.column_stack(
@@ -25,7 +26,8 @@ def setup(n):
     # Euler:
     # 2 * num_points - num_boundary_edges - 2 = num_cells
     # <=>
-    # num_interior_points ~= 0.5 * (num_cells + num_boundary_edges) + 1 - num_boundary_points
+    # num_interior_points
+    #   ~= 0.5 * (num_cells + num_boundary_edges) + 1 - num_boundary_points
     m = int(0.5 * (target_num_cells + n) + 1 - n)
 
     # generate random points in circle;
@@ -44,11 +46,17 @@ def setup(n):
         tri = Delaunay(pts)
 
         # Make sure there are exactly `n` boundary points
-        mesh0 = meshplex.MeshTri(pts, tri.simplices)
-        mesh1 = meshplex.MeshTri(pts, tri.simplices)
-        if np.sum(mesh0.is_boundary_point) == n:
+        mesh = meshplex.MeshTri(pts, tri.simplices)
+        if np.sum(mesh.is_boundary_point) == n:
             break
 
+    return mesh
+
+
+def setup(n):
+    mesh0 = create_disk_mesh(n)
+    mesh1 = meshplex.MeshTri(mesh0.points.copy(), mesh0.cells["points"].copy())
+
     mesh0.create_edges()
     mesh1.create_edges()
 
@@ -73,11 +81,12 @@ def flip_new(data):
     mesh1.flip_interior_edges(idx)
 
 
-perfplot.show(
-    setup=setup,
-    kernels=[flip_old, flip_new],
-    n_range=[2 ** k for k in range(5, 13)],
-    equality_check=None,
-    # set target time to 0 to avoid more than one repetition
-    target_time_per_measurement=0.0,
-)
+if __name__ == "__main__":
+    perfplot.show(
+        setup=setup,
+        kernels=[flip_old, flip_new],
+        n_range=[2 ** k for k in range(5, 13)],
+        equality_check=None,
+        # set target time to 0 to avoid more than one repetition
+        target_time_per_measurement=0.0,
+    )
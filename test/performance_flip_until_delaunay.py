@@ -0,0 +1,67 @@
+"""
+Compare the selection of conflict-free edges in flip_until_delaunay(), i.e., at most one
+flip per cell, preferring the most negative ce_ratios. The previous implementation
+looped over the critical cells in Python; the new one is array-based.
+"""
+import numpy as np
+import perfplot
+from performance import create_disk_mesh
+
+
+def setup(n):
+    mesh = create_disk_mesh(n)
+    # Move the interior points a little bit such that we have edges to flip.
+    np.random.seed(0)
+    max_step = np.median(mesh.cell_inradius)
+    points = mesh.points.copy()
+    is_interior = ~mesh.is_boundary_point
+    points[is_interior] += max_step * (2 * np.random.rand(np.sum(is_interior), 2) - 1)
+    mesh.points = points
+
+    mesh.create_edges()
+    is_candidate = mesh.ce_ratios_per_interior_edge < 0.0
+    print(
+        f"{n} boundary points, {len(is_candidate)} interior edges, "
+        f"{np.sum(is_candidate)} Delaunay violations, "
+        f"{np.sum(select_loop(mesh, is_candidate))} (loop) / "
+        f"{np.sum(select_vectorized(mesh, is_candidate))} (vectorized) flips"
+    )
+    return mesh, is_candidate
+
+
+def select_loop(mesh, is_candidate):
+    is_flip_interior_edge = is_candidate.copy()
+    interior_edges_cells = mesh.edges_cells["interior"][1:3].T
+    adj_cells = interior_edges_cells[is_flip_interior_edge].T
+
+    cell_gids, num_flips_per_cell = np.unique(adj_cells, return_counts=True)
+    critical_cell_gids = cell_gids[num_flips_per_cell > 1]
+    while np.any(num_flips_per_cell > 1):
+        for cell_gid in critical_cell_gids:
+            edge_gids = mesh.cells["edges"][cell_gid]
+            is_interior_edge = mesh.is_interior_edge[edge_gids]
+            idx = mesh.edges_cells_idx[edge_gids[is_interior_edge]]
+            k = np.argmin(mesh.ce_ratios_per_interior_edge[idx])
+            is_flip_interior_edge[idx] = False
+            is_flip_interior_edge[idx[k]] = True
+
+        adj_cells = interior_edges_cells[is_flip_interior_edge].T
+        cell_gids, num_flips_per_cell = np.unique(adj_cells, return_counts=True)
+        critical_cell_gids = cell_gids[num_flips_per_cell > 1]
+    return is_flip_interior_edge
+
+
+def select_vectorized(mesh, is_candidate):
+    is_flip_interior_edge = np.zeros(len(is_candidate), dtype=bool)
+    is_flip_interior_edge[mesh._select_flip_edges(np.where(is_candidate)[0])] = True
+    return is_flip_interior_edge
+
+
+perfplot.show(
+    setup=setup,
+    kernels=[select_loop, select_vectorized],
+    n_range=[2 ** k for k in range(5, 12)],
+    # The selections needn't be the same.
+    equality_check=None,
+    xlabel="num boundary points",
+)
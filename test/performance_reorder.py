@@ -0,0 +1,51 @@
+"""
+Speed of the per-cell computations (half-edge coordinates, ce-ratios, circumcenters,
+control volumes and their centroids) before and after MeshTri.reorder(). The input
+points and cells are in random order.
+"""
+import numpy as np
+import perfplot
+from performance import create_disk_mesh
+
+import meshplex
+
+
+def setup(n):
+    mesh = create_disk_mesh(n)
+    np.random.seed(0)
+    p = np.random.permutation(len(mesh.points))
+    inv = np.empty_like(p)
+    inv[p] = np.arange(len(p))
+    points = mesh.points[p]
+    cells = inv[mesh.cells["points"]][np.random.permutation(len(mesh.cells["points"]))]
+
+    mesh0 = meshplex.MeshTri(points, cells)
+    mesh1 = meshplex.MeshTri(points, cells)
+    mesh1.reorder()
+    return mesh0, mesh1
+
+
+def compute_all(mesh):
+    mesh._reset_point_data()
+    mesh.control_volumes
+    mesh.control_volume_centroids
+    mesh.cell_circumcenters
+    return mesh.cell_volumes.sum()
+
+
+def random_order(data):
+    return compute_all(data[0])
+
+
+def reordered(data):
+    return compute_all(data[1])
+
+
+perfplot.show(
+    setup=setup,
+    kernels=[random_order, reordered],
+    n_range=[2 ** k for k in range(5, 14)],
+    # the sums are taken in different orders
+    equality_check=None,
+    xlabel="num boundary points",
+)
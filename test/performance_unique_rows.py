@@ -0,0 +1,44 @@
+"""
+Compare the edge deduplication with packed integer keys (`unique_rows()`) with the
+previous approach, sorting an np.void view of the rows.
+"""
+import numpy as np
+import perfplot
+from scipy.spatial import Delaunay
+
+from meshplex.helpers import unique_rows
+
+
+def setup(n):
+    np.random.seed(0)
+    pts = np.random.rand(n, 2)
+    cells = Delaunay(pts).simplices
+    # all half-edges of the mesh, sorted per row
+    a = np.sort(np.concatenate([cells[:, [1, 2]], cells[:, [2, 0]], cells[:, [0, 1]]]))
+    return a
+
+
+def void_view(a):
+    b = np.ascontiguousarray(a).view(np.dtype((np.void, a.dtype.itemsize * a.shape[1])))
+    a_unique, inv, cts = np.unique(b, return_inverse=True, return_counts=True)
+    a_unique = a_unique.view(a.dtype).reshape(-1, a.shape[1])
+    return a_unique, inv, cts
+
+
+def packed_keys(a):
+    return unique_rows(a)
+
+
+def equality_check(a, b):
+    # The void view sorts byte-wise, so the order of the unique rows may differ. Just
+    # check that both reproduce the input.
+    return np.array_equal(a[0][a[1]], b[0][b[1]]) and len(a[0]) == len(b[0])
+
+
+perfplot.show(
+    setup=setup,
+    kernels=[void_view, packed_keys],
+    n_range=[2 ** k for k in range(5, 21)],
+    equality_check=equality_check,
+    xlabel="num points",
+)
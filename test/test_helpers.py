@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from meshplex.helpers import csr_from_rows, csr_update, unique_rows
+
+
+@pytest.mark.parametrize(
+    "max_value,num_cols",
+    [
+        (10, 2),
+        (1000, 3),
+        # The packed keys don't fit into 64 bits anymore
+        (2 ** 30, 3),
+    ],
+)
+def test_unique_rows(max_value, num_cols):
+    np.random.seed(0)
+    a = np.random.randint(0, max_value, size=(1000, num_cols))
+    # make sure there are duplicates
+    a = np.concatenate([a, a[::3]])
+    a = np.sort(a, axis=1)
+
+    a_unique, inv, cts = unique_rows(a)
+
+    ref_unique, ref_inv, ref_cts = np.unique(
+        a, axis=0, return_inverse=True, return_counts=True
+    )
+    assert np.array_equal(a_unique, ref_unique)
+    assert np.array_equal(inv, ref_inv.reshape(-1))
+    assert np.array_equal(cts, ref_cts)
+    assert a_unique.dtype == a.dtype
+
+
+def test_csr_update():
+    np.random.seed(0)
+    num_rows = 50
+    rows = np.random.randint(0, num_rows, size=500)
+    keys = np.arange(len(rows))
+    offsets, counts, (ids,) = csr_from_rows(rows, num_rows, [keys])
+    assert np.array_equal(counts, np.bincount(rows, minlength=num_rows))
+
+    # remove some entries, add others
+    is_removed = np.random.rand(len(rows)) < 0.2
+    add_rows = np.random.randint(0, num_rows, size=50)
+    add_keys = np.arange(len(rows), len(rows) + len(add_rows))
+    assert csr_update(
+        offsets, counts, [ids], rows[is_removed], keys[is_removed], add_rows, [add_keys]
+    )
+
+    ref_rows = np.concatenate([rows[~is_removed], add_rows])
+    ref_keys = np.concatenate([keys[~is_removed], add_keys])
+    for k in range(num_rows):
+        row = ids[offsets[k] : offsets[k] + counts[k]]
+        assert np.array_equal(np.sort(row), np.sort(ref_keys[ref_rows == k]))
+        # the spare room is marked
+        assert np.all(ids[offsets[k] + counts[k] : offsets[k + 1]] == -1)
+
+    # Adding too many entries to a row fails without changing anything.
+    ids_ref = ids.copy()
+    assert not csr_update(
+        offsets, counts, [ids], [], [], np.zeros(1000, dtype=int), [np.arange(1000)]
+    )
+    assert np.array_equal(ids, ids_ref)
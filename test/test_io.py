@@ -22,6 +22,40 @@ def test_io_2d():
     assert np.all(mesh.cells["points"] == mesh2.cells["points"])
 
 
+def test_read_cache(tmp_path):
+    vertices, cells = meshzoo.rectangle(0.0, 1.0, 0.0, 1.0, 11, 11)
+    mesh = meshplex.MeshTri(vertices, cells)
+    mesh.write(tmp_path / "a.vtk")
+    cache_dir = tmp_path / "cache"
+
+    mesh0 = meshplex.read(tmp_path / "a.vtk", cache=True, cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("*.npz"))) == 1
+    mesh1 = meshplex.read(tmp_path / "a.vtk", cache=True, cache_dir=cache_dir)
+    # read from the cache, with the topology
+    assert isinstance(mesh1.cells["points"].base, np.memmap)
+    assert mesh1._edges_cells is not None
+    assert np.all(mesh0.points == mesh1.points)
+    assert np.all(mesh0.cells["points"] == mesh1.cells["points"])
+    assert np.all(mesh0.edges["points"] == mesh1.edges["points"])
+    assert np.all(mesh0.edges_cells["interior"] == mesh1.edges_cells["interior"])
+    assert np.all(mesh0.is_boundary_point == mesh1.is_boundary_point)
+    # copy-on-write
+    mesh1.flip_until_delaunay()
+
+    # the least recently used entry is evicted
+    size = next(cache_dir.glob("*.npz")).stat().st_size
+    mesh.write(tmp_path / "b.vtk")
+    meshplex.read(tmp_path / "b.vtk", cache=True, cache_dir=cache_dir)
+    meshplex.read(tmp_path / "a.vtk", cache=True, cache_dir=cache_dir)
+    mesh.write(tmp_path / "c.vtk")
+    meshplex.read(
+        tmp_path / "c.vtk", cache=True, cache_dir=cache_dir, max_cache_size=2 * size
+    )
+    assert len(list(cache_dir.glob("*.npz"))) == 2
+    mesh2 = meshplex.read(tmp_path / "b.vtk", cache=True, cache_dir=cache_dir)
+    assert not isinstance(mesh2.cells["points"].base, np.memmap)
+
+
 # def test_io_3d(self):
 #     vertices, cells = meshzoo.cube(
 #             0.0, 1.0, 0.0, 1.0, 0.0, 1.0,
@@ -1,12 +1,13 @@
 import pathlib
 from math import fsum
 
+import meshzoo
 import numpy as np
 import pytest
 
 import meshplex
 
-from .helpers import is_near_equal, run
+from .helpers import assert_cells_neighbors, assert_points_adjacency, is_near_equal, run
 
 this_dir = pathlib.Path(__file__).resolve().parent
 
@@ -366,7 +367,10 @@ def test_cubesmall():
     run(mesh, 10.0, cv_norms, [28.095851618771825, 1.25], cellvol_norms)
 
 
-def test_arrow3d():
+@pytest.mark.parametrize(
+    "float_dtype,tol", [(np.float64, 1.0e-12), (np.float32, 1.0e-6)]
+)
+def test_arrow3d(float_dtype, tol):
     points = np.array(
         [
             [+0.0, +0.0, +0.0],
@@ -378,7 +382,9 @@ def test_arrow3d():
         ]
     )
     cellsNodes = np.array([[1, 2, 4, 5], [2, 3, 4, 5], [0, 1, 4, 5], [0, 3, 4, 5]])
-    mesh = meshplex.MeshTetra(points, cellsNodes)
+    mesh = meshplex.MeshTetra(points, cellsNodes, float_dtype=float_dtype)
+    assert mesh.cell_volumes.dtype == float_dtype
+    assert mesh.control_volumes.dtype == float_dtype
 
     run(
         mesh,
@@ -386,11 +392,57 @@ def test_arrow3d():
         [0.58276428453480922, 0.459],
         [0.40826901831985885, 0.2295],
         [np.sqrt(0.45), 0.45],
+        tol=tol,
     )
 
     assert mesh.num_delaunay_violations() == 2
 
 
+@pytest.mark.parametrize("num_workers", [None, 3])
+def test_memory_budget(num_workers):
+    points, cells = meshzoo.cube(0.0, 1.0, 0.0, 1.0, 0.0, 1.0, 6, 6, 6)
+    mesh0 = meshplex.MeshTetra(points, cells)
+    mesh1 = meshplex.MeshTetra(points, cells)
+    mesh1.memory_budget = 1000
+    mesh1.num_workers = num_workers
+
+    assert np.array_equal(mesh0.half_edge_coords, mesh1.half_edge_coords)
+    assert np.array_equal(
+        mesh0.q_min_sin_dihedral_angles, mesh1.q_min_sin_dihedral_angles
+    )
+
+
+def test_set_points():
+    points, cells = meshzoo.cube(0.0, 1.0, 0.0, 1.0, 0.0, 1.0, 4, 4, 4)
+    mesh = meshplex.MeshTetra(points.copy(), cells)
+    mesh.ce_ratios
+    mesh.cell_circumcenters
+    mesh.cell_centroids
+    mesh.control_volumes
+
+    np.random.seed(0)
+    idx = np.array([5, 21, 22])
+    new_points = mesh.points[idx] + 1.0e-2 * np.random.rand(len(idx), 3)
+    mesh.set_points(new_points, idx)
+
+    mesh2 = meshplex.MeshTetra(mesh.points.copy(), mesh.cells["points"])
+    tol = 1.0e-14
+    assert is_near_equal(mesh.ei_dot_ei, mesh2.ei_dot_ei, tol)
+    assert is_near_equal(mesh.cell_volumes, mesh2.cell_volumes, tol)
+    assert is_near_equal(mesh.ce_ratios, mesh2.ce_ratios, tol)
+    assert is_near_equal(
+        mesh.circumcenter_face_distances, mesh2.circumcenter_face_distances, tol
+    )
+    assert is_near_equal(mesh.cell_circumcenters, mesh2.cell_circumcenters, tol)
+    assert is_near_equal(mesh.cell_centroids, mesh2.cell_centroids, tol)
+    assert is_near_equal(mesh.control_volumes, mesh2.control_volumes, tol)
+
+    # set all points
+    mesh.points = points
+    assert abs(fsum(mesh.cell_volumes) - 1.0) < tol
+    assert abs(fsum(mesh.control_volumes) - 1.0) < tol
+
+
 def test_tetrahedron():
     mesh = meshplex.read(this_dir / "meshes" / "tetrahedron.vtk")
 
@@ -520,6 +572,139 @@ def test_show_cell(render=False):
     )
 
 
+def test_adjacency():
+    points, cells = meshzoo.cube(0.0, 1.0, 0.0, 1.0, 0.0, 1.0, 4, 4, 4)
+    mesh = meshplex.MeshTetra(points, cells)
+    assert_points_adjacency(mesh)
+    assert_cells_neighbors(mesh)
+
+
+def test_locate():
+    points, cells = meshzoo.cube(0.0, 1.0, 0.0, 1.0, 0.0, 1.0, 5, 5, 5)
+    mesh = meshplex.MeshTetra(points, cells)
+    np.random.seed(0)
+    x = 1.2 * np.random.rand(1000, 3) - 0.1
+    cell_ids, bary = mesh.locate(x)
+
+    is_inside = np.all((x >= 0.0) & (x <= 1.0), axis=1)
+    assert np.all((cell_ids >= 0) == is_inside)
+    assert np.all(np.isnan(bary[~is_inside]))
+    assert np.all(bary[is_inside] > -1.0e-12)
+    p = mesh.points[mesh.cells["points"][cell_ids[is_inside]]]
+    assert np.all(
+        np.abs(np.einsum("ij,ijk->ik", bary[is_inside], p) - x[is_inside]) < 1.0e-12
+    )
+
+    # linear functions are interpolated exactly
+    a = np.array([1.0, -2.0, 3.0])
+    vals = mesh.interpolate(1.0 + mesh.points @ a, x)
+    assert np.all(np.abs(vals[is_inside] - 1.0 - x[is_inside] @ a) < 1.0e-12)
+    assert np.all(np.isnan(vals[~is_inside]))
+
+
+def test_reorder():
+    points, cells = meshzoo.cube(0.0, 1.0, 0.0, 1.0, 0.0, 1.0, 5, 5, 5)
+    np.random.seed(0)
+    cells = cells[np.random.permutation(len(cells))]
+    mesh0 = meshplex.MeshTetra(points, cells)
+    mesh0.control_volumes
+    mesh0.cell_circumcenters
+    mesh0.cell_centroids
+    mesh0.mark_boundary()
+    # cached
+    assert mesh0.point_face_cells is mesh0.point_face_cells
+    point_order, cell_order = mesh0.reorder()
+
+    new_index = np.empty_like(point_order)
+    new_index[point_order] = np.arange(len(point_order))
+    mesh1 = meshplex.MeshTetra(points[point_order], new_index[cells[cell_order]])
+    mesh1.mark_boundary()
+    assert np.all(mesh0.cells["points"] == mesh1.cells["points"])
+    assert np.all(mesh0.point_face_cells == mesh1.point_face_cells)
+    assert np.all(mesh0.is_boundary_point == mesh1.is_boundary_point)
+    assert np.all(np.abs(mesh0.cell_volumes - mesh1.cell_volumes) < 1.0e-14)
+    assert np.all(np.abs(mesh0.ce_ratios - mesh1.ce_ratios) < 1.0e-14)
+    assert np.all(np.abs(mesh0.control_volumes - mesh1.control_volumes) < 1.0e-14)
+    assert np.all(
+        np.abs(mesh0.cell_circumcenters - mesh1.cell_circumcenters) < 1.0e-14
+    )
+    assert np.all(np.abs(mesh0.cell_centroids - mesh1.cell_centroids) < 1.0e-14)
+    assert_cells_neighbors(mesh0)
+
+
+def test_laplacian():
+    points, cells = meshzoo.cube(0.0, 1.0, 0.0, 1.0, 0.0, 1.0, 5, 5, 5)
+    mesh = meshplex.MeshTetra(points, cells)
+    L = mesh.get_laplacian()
+    assert abs(L - L.T).max() < 1.0e-14
+
+    x = mesh.points
+    is_interior = ~np.any((x == 0.0) | (x == 1.0), axis=1)
+    assert np.all(np.abs(L @ x[:, 0])[is_interior] < 1.0e-14)
+    u = np.sum(x ** 2, axis=1)
+    ref = -6.0 * mesh.control_volumes
+    assert np.all(np.abs((L @ u) - ref)[is_interior] < 1.0e-13)
+
+
+def test_stiffness_mass_matrix():
+    points, cells = meshzoo.cube(0.0, 1.0, 0.0, 1.0, 0.0, 1.0, 5, 5, 5)
+    mesh = meshplex.MeshTetra(points, cells)
+    K = mesh.get_stiffness_matrix()
+    assert abs(K - K.T).max() < 1.0e-14
+    u = mesh.points @ [1.0, 2.0, -1.0]
+    assert abs(u @ K @ u - 6.0) < 1.0e-13
+
+    M = mesh.get_mass_matrix()
+    ones = np.ones(len(mesh.points))
+    assert abs(ones @ M @ ones - 1.0) < 1.0e-14
+    assert abs(u @ M @ ones - 1.0) < 1.0e-14
+    ML = mesh.get_mass_matrix(lumped=True)
+    assert np.all(np.abs(ML.diagonal() - M @ ones) < 1.0e-14)
+
+
+def test_save_load_state(tmp_path):
+    points, cells = meshzoo.cube(0.0, 1.0, 0.0, 1.0, 0.0, 1.0, 5, 5, 5)
+    mesh0 = meshplex.MeshTetra(points, cells)
+    mesh0.mark_boundary()
+    mesh0.create_edges()
+    mesh0.control_volumes
+
+    filename = tmp_path / "mesh.npz"
+    mesh0.save_state(filename, geometry=True)
+    mesh1 = meshplex.MeshTetra.load_state(filename)
+    assert isinstance(mesh1.cells["faces"].base, np.memmap)
+    assert mesh1._control_volumes is not None
+
+    assert np.all(mesh0.cells["points"] == mesh1.cells["points"])
+    assert np.all(mesh0.cells["faces"] == mesh1.cells["faces"])
+    assert np.all(mesh0.faces["points"] == mesh1.faces["points"])
+    assert np.all(mesh0.edges["points"] == mesh1.edges["points"])
+    assert np.all(mesh0.is_boundary_point == mesh1.is_boundary_point)
+    assert np.all(mesh0.is_boundary_facet == mesh1.is_boundary_facet)
+    assert np.all(mesh0.control_volumes == mesh1.control_volumes)
+    assert np.all(np.abs(mesh0.ce_ratios - mesh1.ce_ratios) < 1.0e-14)
+
+
+def test_compact_points():
+    points, cells = meshzoo.cube(0.0, 1.0, 0.0, 1.0, 0.0, 1.0, 5, 5, 5)
+    # add some dangling points
+    points = np.concatenate([[[2.0, 0.0, 0.0]], points, [[3.0, 0.0, 0.0]]])
+    mesh0 = meshplex.MeshTetra(points, cells + 1)
+    mesh0.mark_boundary()
+    mesh0.control_volumes
+
+    new_index = mesh0.compact_points()
+    assert new_index[0] == -1 and new_index[-1] == -1
+    assert np.all(new_index[1:-1] == np.arange(len(points) - 2))
+
+    mesh1 = meshplex.MeshTetra(points[1:-1], cells)
+    mesh1.mark_boundary()
+    assert np.all(mesh0.cells["points"] == mesh1.cells["points"])
+    assert np.all(mesh0.faces["points"] == mesh1.faces["points"])
+    assert np.all(mesh0.is_boundary_point == mesh1.is_boundary_point)
+    assert np.all(np.abs(mesh0.control_volumes - mesh1.control_volumes) < 1.0e-14)
+
+
 if __name__ == "__main__":
     test_show_cell(render=True)
     # test_regular_tet0(0.5)